@@ -0,0 +1,185 @@
+# Author: Erik van Gorsel
+# Engine and backup benchmark harness
+#
+# Generates synthetic projects (see synthproject.py) at several sizes and
+# times, per engine, the analysis that run_cleanup performs and then the
+# backup and revert of its removal set in every backup layout. Nothing is
+# prompted: the harness calls the same functions run_cleanup and the
+# revert mode use, and restores the project after each round so all
+# engines see identical input.
+#
+# Usage:
+#   python run_benchmarks.py                          run 100, 1k and 10k JARs
+#   python run_benchmarks.py --sizes 100 1000 --repeat 5
+#   python run_benchmarks.py --save-baseline          write baselines.json
+#   python run_benchmarks.py --compare [--tolerance 1.0]
+#                                                     exit 1 on a regression
+#   python run_benchmarks.py --output results.json
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core"), BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import utils
+import backup
+import scancache
+from project import ProjectContext
+import synthproject
+
+ENGINES = ("clean_userlib_mx7", "clean_userlib_mx8", "clean_userlib_mx9", "clean_userlib_mx10", "clean_userlib_mx11")
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_REPEAT = 3
+# Allowed slowdown before --compare fails: 1.0 means up to 2x the baseline
+DEFAULT_TOLERANCE = 1.0
+# Baselines below this are dominated by timer noise and are not compared
+MIN_COMPARED_SECONDS = 0.05
+BASELINE_FILE = os.path.join(BENCH_DIR, "baselines.json")
+
+
+def timed(func, repeat):
+    """Runs func `repeat` times with stdout silenced. Returns (median seconds, last result)."""
+    samples, result = [], None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def bench_backup(userlib_path, to_remove, mode, repeat):
+    """Times create_backup and restore_backup for one layout; the userlib is restored each round."""
+    backup_folder = backup.get_backup_folder(userlib_path)
+    backup_times, revert_times = [], []
+    for i in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            path = backup.create_backup(to_remove, userlib_path, f"bench-{mode}-{i}", mode=mode)
+            backup_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            backup.restore_backup(backup_folder, os.path.basename(path), userlib_path)
+            revert_times.append(time.perf_counter() - start)
+    shutil.rmtree(backup_folder, ignore_errors=True)
+    return statistics.median(backup_times), statistics.median(revert_times)
+
+
+def fresh_context(project_root, use_cache=False):
+    """A new context, so every round scans the userlib again (and reads the deep scan cold)."""
+    ctx = ProjectContext(project_root)
+    ctx.use_cache = use_cache
+    return ctx
+
+
+def run_size(size, repeat, workdir):
+    """Benchmarks every engine on one generated project. Returns {key: seconds}."""
+    import importlib
+    project_root = os.path.join(workdir, f"project_{size}")
+    start = time.perf_counter()
+    stats = synthproject.generate_project(project_root, size)
+    utils.log_info(f"Generated {size} JARs in {time.perf_counter() - start:.1f}s ({stats['duplicated_families']} duplicated families)")
+    userlib_path = os.path.join(project_root, "userlib")
+
+    results = {}
+    for engine_name in ENGINES:
+        engine = importlib.import_module(engine_name)
+        seconds, result = timed(lambda: engine.analyze(fresh_context(project_root)), repeat)
+        results[f"{size}/{engine_name}/analyze"] = seconds
+        to_remove = result['to_remove']
+        line = f"  {engine_name:<20} analyze {seconds * 1000:>9.1f} ms  ({len(to_remove)} to remove)"
+
+        # Same analysis with the deep scan served from the on-disk cache (the first call fills it)
+        with contextlib.redirect_stdout(io.StringIO()):
+            engine.analyze(fresh_context(project_root, use_cache=True))
+        cached_s, _ = timed(lambda: engine.analyze(fresh_context(project_root, use_cache=True)), repeat)
+        results[f"{size}/{engine_name}/analyze-cached"] = cached_s
+        line += f" | cached {cached_s * 1000:.0f} ms"
+
+        for mode in backup.BACKUP_MODES:
+            backup_s, revert_s = bench_backup(userlib_path, to_remove, mode, repeat)
+            results[f"{size}/{engine_name}/backup-{mode}"] = backup_s
+            results[f"{size}/{engine_name}/revert-{mode}"] = revert_s
+            line += f" | {mode} {backup_s * 1000:.0f}/{revert_s * 1000:.0f} ms"
+        print(line)
+
+    shutil.rmtree(project_root, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Returns the keys that are slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for key, seconds in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None or base < MIN_COMPARED_SECONDS:
+            continue
+        if seconds > base * (1 + tolerance):
+            regressions.append((key, base, seconds))
+    return regressions
+
+
+def main():
+    sizes = [int(s) for s in utils.get_arg_values("--sizes")] or list(DEFAULT_SIZES)
+    repeat = int(utils.get_arg_value("--repeat", DEFAULT_REPEAT))
+    tolerance = float(utils.get_arg_value("--tolerance", DEFAULT_TOLERANCE))
+
+    utils.log_header("Mendix Userlib Cleanup Benchmarks")
+    print(f"  Python {platform.python_version()} on {platform.system()} — repeat {repeat} (median)")
+    print("  cached: analyze with the deep scan from the on-disk cache")
+    print("  backup/revert columns: backup ms / revert ms per layout\n")
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="mx-cleanuserlib-bench-")
+    # Keep the deep scan cache of the synthetic projects out of the user's cache folder
+    os.environ[scancache.CACHE_ENV] = os.path.join(workdir, "cache")
+    try:
+        for size in sizes:
+            utils.log_subheader(f"{size} JARs")
+            results.update(run_size(size, repeat, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    document = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'repeat': repeat},
+        'results': results,
+    }
+    output = utils.get_arg_value("--output")
+    if output:
+        with open(output, "w", encoding="utf-8") as fp:
+            json.dump(document, fp, indent=2, sort_keys=True)
+
+    if "--save-baseline" in sys.argv:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as fp:
+            json.dump(document, fp, indent=2, sort_keys=True)
+        utils.log_success(f"Baseline written to {BASELINE_FILE}")
+
+    if "--compare" in sys.argv:
+        if not os.path.exists(BASELINE_FILE):
+            utils.log_error("No baselines.json found. Run with --save-baseline first.")
+            sys.exit(1)
+        with open(BASELINE_FILE, "r", encoding="utf-8") as fp:
+            baseline = json.load(fp)['results']
+        regressions = compare(results, baseline, tolerance)
+        utils.log_subheader("Baseline comparison")
+        for key, base, seconds in regressions:
+            utils.log_error(f"{key}: {seconds * 1000:.1f} ms (baseline {base * 1000:.1f} ms)")
+        if regressions:
+            sys.exit(1)
+        utils.log_success(f"No regressions beyond {tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Author: Erik van Gorsel
+# Startup latency benchmark
+#
+# Measures what a developer feels when the tool runs from a pre-commit
+# hook: the time until the first line of output appears and the time until
+# `--check` exits. Both the source entry point (python manager.py) and the
+# frozen binary are measured, each from a fresh process.
+#
+# Usage:
+#   python startup_benchmark.py [--exe path\to\mx--cleanuserlib.exe] [--runs 10]
+#                               [--project path] [--output startup.json]
+# Without --project a small synthetic project (100 JARs) is generated.
+# Without --exe the binary is looked up in the usual build locations.
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+INTERNAL_DIR = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+MANAGER_PATH = os.path.join(INTERNAL_DIR, "src", "core", "manager.py")
+sys.path.insert(0, os.path.join(INTERNAL_DIR, "src", "core"))
+sys.path.insert(0, BENCH_DIR)
+
+import utils
+import synthproject
+
+DEFAULT_RUNS = 10
+PROJECT_JARS = 100
+EXE_CANDIDATES = (
+    os.path.join(INTERNAL_DIR, "..", "mx--cleanuserlib.exe"),
+    os.path.join(INTERNAL_DIR, "dist", "mx--cleanuserlib.exe"),
+    os.path.join(INTERNAL_DIR, "dist", "mx--cleanuserlib"),
+    os.path.join(INTERNAL_DIR, "dist", "mx-clean-userlib", "mx-clean-userlib.exe"),
+)
+
+
+def measure(command, cwd):
+    """Runs the command once. Returns (seconds to first output line, seconds to exit)."""
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    proc.stdout.readline()
+    first_output = time.perf_counter() - start
+    proc.stdout.read()
+    proc.wait()
+    return first_output, time.perf_counter() - start
+
+
+def bench_entry_point(label, command, cwd, runs):
+    measure(command, cwd)  # Warm the OS file cache (and the onefile extraction path)
+    samples = [measure(command, cwd) for _ in range(runs)]
+    first = [s[0] for s in samples]
+    total = [s[1] for s in samples]
+    print(f"  {label:<10} first output {statistics.median(first) * 1000:>8.1f} ms (min {min(first) * 1000:.1f})"
+          f"   --check exit {statistics.median(total) * 1000:>8.1f} ms (min {min(total) * 1000:.1f})")
+    return {'first_output': statistics.median(first), 'check_exit': statistics.median(total)}
+
+
+def find_exe():
+    exe = utils.get_arg_value("--exe")
+    if exe:
+        return exe if os.path.exists(exe) else None
+    for candidate in EXE_CANDIDATES:
+        if os.path.exists(candidate):
+            return os.path.abspath(candidate)
+    return None
+
+
+def main():
+    runs = int(utils.get_arg_value("--runs", DEFAULT_RUNS))
+    project = utils.get_arg_value("--project")
+    workdir = None
+    if not project:
+        workdir = tempfile.mkdtemp(prefix="mx-cleanuserlib-startup-")
+        project = os.path.join(workdir, "project")
+        synthproject.generate_project(project, PROJECT_JARS)
+
+    utils.log_header("Mendix Userlib Cleanup Startup Benchmark")
+    print(f"  {runs} runs per entry point (median), project: {project}\n")
+
+    results = {}
+    try:
+        results['source'] = bench_entry_point("source", [sys.executable, MANAGER_PATH, "--check"], project, runs)
+        exe = find_exe()
+        if exe:
+            results['frozen'] = bench_entry_point("frozen", [exe, "--check"], project, runs)
+        else:
+            utils.log_info("No frozen binary found (build one or pass --exe); skipped.")
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = utils.get_arg_value("--output")
+    if output:
+        with open(output, "w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=2)
+
+
+if __name__ == "__main__":
+    main()
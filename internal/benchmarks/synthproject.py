@@ -0,0 +1,160 @@
+# Author: Erik van Gorsel
+# Synthetic Mendix project generator
+#
+# Builds a project the engines accept as real: an .mpr (SQLite with a
+# _MetaData table), a userlib with N valid JARs and a vendorlib tree with
+# the vendorlib-sbom.json that Studio Pro 10+ writes next to it.
+# The userlib mix exercises every engine stage:
+#   - version-duplicated families (filename grouping),
+#   - renamed copies and class subsets of other JARs (deep scan),
+#   - Marketplace module .RequiredLib sidecars (metadata association),
+#   - libraries that Studio Pro also ships in vendorlib (cross-check),
+#   - protected libraries (protection filter).
+# Output is deterministic for a given seed, so timings are comparable.
+#
+# Usage: python synthproject.py <target dir> <jar count> [--version 10.24.5] [--seed 0] [--no-sbom]
+
+import os
+import sys
+import json
+import random
+import shutil
+import sqlite3
+import zipfile
+
+DEFAULT_VERSION = "10.24.5"
+CLASSES_PER_JAR = (8, 40)
+# Fixed timestamp so mtime-based tie breaks are reproducible
+FIXED_MTIME = 1700000000
+
+MODULES = ("CommunityCommons", "ExcelImporter", "DocumentGeneration", "Encryption", "SAML20")
+PROTECTED = ("bcprov-jdk18on", "mendix-runtime-api", "slf4j-api", "log4j-core")
+
+
+def write_mpr(project_root, version):
+    path = os.path.join(project_root, "App.mpr")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE _MetaData (_ProductVersion TEXT, _BuildVersion TEXT)")
+    conn.execute("INSERT INTO _MetaData VALUES (?, ?)", (version, version))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def write_jar(path, classes, group=None, artifact=None, version=None):
+    """Writes a valid JAR with a manifest, the given class entries and optional Maven metadata."""
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as jar:
+        jar.writestr("META-INF/MANIFEST.MF", "Manifest-Version: 1.0\r\nCreated-By: synthproject\r\n")
+        if group:
+            jar.writestr(
+                f"META-INF/maven/{group}/{artifact}/pom.properties",
+                f"groupId={group}\nartifactId={artifact}\nversion={version}\n",
+            )
+        for name in classes:
+            jar.writestr(name, b"\xca\xfe\xba\xbe" + name.encode("utf-8"))
+    os.utime(path, (FIXED_MTIME, FIXED_MTIME))
+
+
+def class_names(group, artifact, count):
+    package = group.replace(".", "/") + "/" + artifact.replace("-", "")
+    return [f"{package}/C{i}.class" for i in range(count)]
+
+
+def write_sbom(vendorlib, components):
+    """Writes a minimal CycloneDX vendorlib-sbom.json for (group, artifact, version) tuples."""
+    document = {
+        "bomFormat": "CycloneDX",
+        "specVersion": "1.5",
+        "components": [
+            {"type": "library", "group": g, "name": a, "version": v, "purl": f"pkg:maven/{g}/{a}@{v}?type=jar"}
+            for g, a, v in components
+        ],
+    }
+    with open(os.path.join(vendorlib, "vendorlib-sbom.json"), "w", encoding="utf-8") as fp:
+        json.dump(document, fp, indent=1)
+
+
+def generate_project(project_root, jar_count, version=DEFAULT_VERSION, seed=0, sbom=True):
+    """Creates the project and returns a dict with its layout statistics."""
+    rng = random.Random(seed)
+    shutil.rmtree(project_root, ignore_errors=True)
+    userlib = os.path.join(project_root, "userlib")
+    vendorlib = os.path.join(project_root, "vendorlib")
+    os.makedirs(userlib)
+    os.makedirs(os.path.join(vendorlib, "managed"))
+    write_mpr(project_root, version)
+
+    stats = {'jars': 0, 'duplicated_families': 0, 'renamed_copies': 0, 'subsets': 0,
+             'sidecars': 0, 'vendorlib_overlaps': 0, 'protected': 0}
+    family = 0
+    vendor_components = []
+
+    def add(name, classes, **maven):
+        write_jar(os.path.join(userlib, name), classes, **maven)
+        stats['jars'] += 1
+
+    while stats['jars'] < jar_count:
+        family += 1
+        group = f"org.bench.g{family % 97}"
+        artifact = f"lib{family:05d}"
+        size = rng.randint(*CLASSES_PER_JAR)
+        classes = class_names(group, artifact, size)
+        roll = rng.random()
+        remaining = jar_count - stats['jars']
+
+        if roll < 0.15 and remaining >= 2:
+            # Version-duplicated family: each newer release adds classes
+            versions = rng.randint(2, min(3, remaining))
+            for v in range(versions):
+                add(f"{artifact}-1.{v}.0.jar", classes[:size - versions + v + 1],
+                    group=group, artifact=artifact, version=f"1.{v}.0")
+            stats['duplicated_families'] += 1
+        elif roll < 0.20 and remaining >= 2:
+            # Renamed copy with an identical class set
+            add(f"{artifact}-2.0.0.jar", classes, group=group, artifact=artifact, version="2.0.0")
+            add(f"repack-{artifact}.jar", classes)
+            stats['renamed_copies'] += 1
+        elif roll < 0.25 and remaining >= 2:
+            # A slimmed-down JAR fully shadowed by the full one
+            add(f"{artifact}-3.0.0.jar", classes, group=group, artifact=artifact, version="3.0.0")
+            add(f"{artifact}-core-lite.jar", classes[:max(1, size // 3)])
+            stats['subsets'] += 1
+        elif roll < 0.32:
+            # Also shipped (newer) by Studio Pro in vendorlib
+            add(f"{artifact}-4.0.0.jar", classes, group=group, artifact=artifact, version="4.0.0")
+            write_jar(os.path.join(vendorlib, "managed", f"{artifact}-4.1.0.jar"), classes)
+            vendor_components.append((group, artifact, "4.1.0"))
+            stats['vendorlib_overlaps'] += 1
+        elif roll < 0.34:
+            name = f"{PROTECTED[family % len(PROTECTED)]}-{family}.0.jar"
+            add(name, classes)
+            stats['protected'] += 1
+        else:
+            name = f"{artifact}-1.0.{family % 10}.jar"
+            add(name, classes, group=group, artifact=artifact, version=f"1.0.{family % 10}")
+            if roll > 0.95:
+                module = MODULES[family % len(MODULES)]
+                open(os.path.join(userlib, f"{name}.{module}.RequiredLib"), "w").close()
+                stats['sidecars'] += 1
+
+    # vendorlib-only libraries (never in userlib)
+    for i in range(max(1, jar_count // 20)):
+        write_jar(os.path.join(vendorlib, f"vendoronly{i:05d}-1.0.0.jar"), class_names("com.vendor", f"v{i}", 4))
+        vendor_components.append(("com.vendor", f"vendoronly{i:05d}", "1.0.0"))
+    if sbom:
+        write_sbom(vendorlib, vendor_components)
+    return stats
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python synthproject.py <target dir> <jar count> [--version X.Y.Z] [--seed N] [--no-sbom]")
+        sys.exit(1)
+    version = sys.argv[sys.argv.index("--version") + 1] if "--version" in sys.argv else DEFAULT_VERSION
+    seed = int(sys.argv[sys.argv.index("--seed") + 1]) if "--seed" in sys.argv else 0
+    stats = generate_project(sys.argv[1], int(sys.argv[2]), version=version, seed=seed, sbom="--no-sbom" not in sys.argv)
+    print(f"Generated {sys.argv[1]}: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,11 @@
 
 a = Analysis(
     ['src\\core\\manager.py'],
-    pathex=[],
+    pathex=['src/core', 'src/engines'],
     binaries=[],
-    datas=[('src/core', 'src/core'), ('src/engines', 'src/engines'), ('config', 'config'), ('docs', 'docs')],
-    hiddenimports=[],
+    datas=[('src/core', 'src/core'), ('src/engines', 'src/engines'), ('config', 'config')],
+    # Engines are imported by name on selection (manager.load_engine); bundle them precompiled
+    hiddenimports=['clean_userlib_mx11', 'clean_userlib_mx10', 'clean_userlib_mx9', 'clean_userlib_mx8', 'clean_userlib_mx7'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
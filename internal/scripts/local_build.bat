@@ -11,7 +11,7 @@ if %errorlevel% neq 0 (
     exit /b 1
 )
 
-echo [1/3] Cleaning up previous build artifacts...
+echo [1/4] Cleaning up previous build artifacts...
 if exist build rmdir /s /q build
 if exist dist rmdir /s /q dist
 if exist mx--cleanuserlib.spec del mx--cleanuserlib.spec
@@ -19,7 +19,15 @@ if exist mx--cleanuserlib.spec del mx--cleanuserlib.spec
 REM Move to the internal directory where src/ and config/ are located
 cd /d "%~dp0.."
 
-echo [2/3] Building standalone executable (Optimized)...
+echo [2/4] Precompiling the engine routing table...
+python src\core\routing.py config
+if %errorlevel% neq 0 (
+    echo [ERROR] Could not compile config\MxVersions.txt.
+    pause
+    exit /b %errorlevel%
+)
+
+echo [3/4] Building standalone executable (Optimized)...
 pyinstaller --noconfirm --onefile --console --name mx--cleanuserlib ^
     --exclude-module unittest ^
     --exclude-module email ^
@@ -27,10 +35,16 @@ pyinstaller --noconfirm --onefile --console --name mx--cleanuserlib ^
     --exclude-module http ^
     --exclude-module html ^
     --exclude-module xml ^
+    --paths src/core ^
+    --paths src/engines ^
+    --hidden-import clean_userlib_mx11 ^
+    --hidden-import clean_userlib_mx10 ^
+    --hidden-import clean_userlib_mx9 ^
+    --hidden-import clean_userlib_mx8 ^
+    --hidden-import clean_userlib_mx7 ^
     --add-data "src/core;src/core" ^
     --add-data "src/engines;src/engines" ^
     --add-data "config;config" ^
-    --add-data "docs;docs" ^
     src/core/manager.py
 
 if %errorlevel% neq 0 (
@@ -39,7 +53,7 @@ if %errorlevel% neq 0 (
     exit /b %errorlevel%
 )
 
-echo [3/3] Build successful!
+echo [4/4] Build successful!
 echo Moving executable to project root...
 if exist "dist\mx--cleanuserlib.exe" move /y "dist\mx--cleanuserlib.exe" "..\mx--cleanuserlib.exe"
 echo The standalone executable is now in the project root.
@@ -0,0 +1,246 @@
+# Author: Erik van Gorsel
+# In-process API
+#
+# The command line reaches the engines through manager.main, which prints,
+# prompts and exits. IDE plugins, pre-commit hooks, batch mode and the
+# daemon call these functions instead: they take a project folder and
+# return a JSON-ready result, and never prompt or exit. A Session also
+# keeps the analysis inputs of every project it has answered for in memory
+# (inventory, deep scan signatures, class index, vendorlib index and the
+# routing table) and brings them up to date from file system events
+# before each answer, like watch mode does.
+
+import io
+import os
+import time
+import threading
+import contextlib
+
+import utils
+from project import ProjectContext
+
+
+def empty_result(project_root):
+    """The result structure of one analysed project (also the batch report entry)."""
+    return {
+        'project': project_root,
+        'version': None,
+        'engine': None,
+        'to_remove': [],
+        'reasons': {},
+        'protected': {},
+        'overlaps': [],
+        'unscanned': [],
+        'total_scanned': 0,
+        'jar_count': 0,
+        'error': None,
+        'log': '',
+    }
+
+
+def _fill(result, analysis, ctx):
+    """Copies an engine's analyze() outcome into `result` in JSON-ready form."""
+    if analysis['error']:
+        raise RuntimeError(analysis['error'])
+    to_remove = sorted(analysis['to_remove'])
+    result['to_remove'] = to_remove
+    result['reasons'] = {f: analysis['reasons'].get(f, "redundant") for f in to_remove}
+    result['protected'] = {f: str(rule) for f, rule in sorted(analysis['protected'].items())}
+    result['overlaps'] = [o.to_dict() for o in analysis['overlaps']]
+    result['unscanned'] = sorted(r.name for r in ctx.unscanned)
+    result['total_scanned'] = analysis['total_scanned']
+    result['jar_count'] = analysis['jar_count']
+
+
+def resolve_engine(version, routing_table=None):
+    """Returns (normalized version, engine module). Raises RuntimeError when either is unknown."""
+    import manager
+    version_str = manager.normalize_version(version)
+    if not version_str:
+        raise RuntimeError("Could not determine the Mendix version of this project.")
+    engine = manager.select_engine(version_str, routing_table)
+    if not engine:
+        raise RuntimeError(f"No suitable cleanup engine for version {version_str}.")
+    return version_str, engine
+
+
+def analyze_project(project_root, deep_scan_timeout=None, use_cache=True):
+    """Detects, routes and analyses one project from scratch. Errors are returned in result['error']."""
+    result = empty_result(project_root)
+    buffer = io.StringIO()
+    ctx = ProjectContext(project_root)
+    ctx.use_cache = use_cache
+    if deep_scan_timeout is not None:
+        ctx.deep_scan_timeout = deep_scan_timeout
+    try:
+        with contextlib.redirect_stdout(buffer):
+            result['version'], engine = resolve_engine(ctx.version)
+            result['engine'] = engine.__name__
+            _fill(result, engine.analyze(ctx), ctx)
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        ctx.close()
+    result['log'] = buffer.getvalue()
+    return result
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return st.st_size, st.st_mtime
+
+
+class WarmProject:
+    """The kept analysis inputs of one project and the watcher that keeps them current."""
+
+    def __init__(self, ctx, routing_table, polling=False):
+        import watch
+        if not os.path.isdir(ctx.userlib_path):
+            raise RuntimeError("userlib folder not found.")
+        self.root = ctx.root
+        self.mpr_path = ctx.mpr_path
+        self.mpr_stamp = _stamp(self.mpr_path)
+        self.rules_stamp = utils.protection_stamp(self.root)
+        self.version, self.engine = resolve_engine(ctx.version, routing_table)
+        # Watch first: whatever changes while the project is read is applied on the next request
+        self.watcher = watch.create_watcher([(ctx.userlib_path, False), (ctx.vendorlib_path, True)], polling)
+        try:
+            self.state = watch.IncrementalProject(ctx)
+        except Exception:
+            self.watcher.close()
+            raise
+        # The last verdict, valid until a file or the .mpr changes
+        self._result = None
+        self._document = None
+
+    def refresh(self, routing_table):
+        """Applies the file changes since the last request. A saved .mpr may carry another version."""
+        import watch
+        changed = self.watcher.drain()
+        if watch.RESYNC in changed:
+            self.state.resync()
+            self._result = None
+        elif changed and self.state.apply(changed):
+            self._result = None
+        stamp = _stamp(self.mpr_path)
+        if stamp != self.mpr_stamp:
+            self._result = None
+            ctx = ProjectContext(self.root)
+            try:
+                self.version, self.engine = resolve_engine(ctx.version, routing_table)
+            finally:
+                ctx.close()
+            self.mpr_stamp = stamp
+        # Edited protection rules change the verdict without touching userlib or vendorlib
+        rules_stamp = utils.protection_stamp(self.root)
+        if rules_stamp != self.rules_stamp:
+            self._result = None
+            self.rules_stamp = rules_stamp
+
+    def run(self, with_plan=False):
+        """Analyses the kept state quietly, unless nothing changed since the last run.
+        Returns (result, plan document or None)."""
+        import plan
+        if self._result is not None and (self._document is not None or not with_plan):
+            return dict(self._result), self._document
+        result = empty_result(self.root)
+        result['version'] = self.version
+        result['engine'] = self.engine.__name__
+        document = None
+        buffer = io.StringIO()
+        ctx = self.state.context()
+        try:
+            with contextlib.redirect_stdout(buffer):
+                analysis = self.engine.analyze(ctx)
+                _fill(result, analysis, ctx)
+                if with_plan:
+                    document = plan.build_plan(ctx, analysis)
+        except Exception as e:
+            result['error'] = str(e)
+        finally:
+            ctx.close()
+        result['log'] = buffer.getvalue()
+        self._result, self._document = result, document
+        return dict(result), document
+
+    def close(self):
+        self.watcher.close()
+
+
+class Session:
+    """Answers analysis requests for any number of projects from warm, incrementally updated state.
+    Thread-safe: requests are served one at a time."""
+
+    def __init__(self, polling=False):
+        import manager
+        self._lock = threading.Lock()
+        self._projects = {}
+        self._polling = polling
+        self.routing_table = manager.load_routing_table()
+        self.started = time.time()
+
+    def _project(self, path):
+        ctx = ProjectContext.discover(path)
+        if ctx is None:
+            raise RuntimeError(f"No Mendix project (.mpr file) in {path} or its parent folders.")
+        warm = self._projects.get(ctx.root)
+        if warm is None:
+            try:
+                warm = self._projects[ctx.root] = WarmProject(ctx, self.routing_table, self._polling)
+            finally:
+                ctx.close()
+        else:
+            warm.refresh(self.routing_table)
+        return warm
+
+    def analyze(self, path):
+        """Analyses the project holding `path`. Errors are returned in result['error']."""
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                result, _ = self._project(path).run()
+            except Exception as e:
+                result = empty_result(os.path.abspath(path))
+                result['error'] = str(e)
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return result
+
+    def plan(self, path):
+        """Returns the cleanup plan (see plan.py) of the project holding `path`. Raises RuntimeError."""
+        with self._lock:
+            result, document = self._project(path).run(with_plan=True)
+            if result['error']:
+                raise RuntimeError(result['error'])
+            return document
+
+    def invalidate(self, path=None):
+        """Forgets one project (the next request reads it again), or all. Returns the number forgotten."""
+        with self._lock:
+            if path is None:
+                roots = list(self._projects)
+            else:
+                ctx = ProjectContext.discover(path)
+                roots = [ctx.root] if ctx is not None and ctx.root in self._projects else []
+            for root in roots:
+                self._projects.pop(root).close()
+            return len(roots)
+
+    def status(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'uptime': round(time.time() - self.started, 1),
+                'projects': [
+                    {'root': w.root, 'version': w.version, 'engine': w.engine.__name__, 'files': len(w.state.records)}
+                    for w in self._projects.values()
+                ],
+            }
+
+    def close(self):
+        with self._lock:
+            for warm in self._projects.values():
+                warm.close()
+            self._projects.clear()
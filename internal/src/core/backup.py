@@ -0,0 +1,314 @@
+# Author: Erik van Gorsel
+# Backup layouts for removed userlib files
+#
+# Three layouts live side by side in userlib/userlib_backup/:
+#   - 'zip':  userlib_backup_<timestamp>.zip, the files re-compressed into
+#             one archive (the original behaviour).
+#   - 'move': userlib_backup_<timestamp>/, the files moved with an atomic
+#             os.rename on the same filesystem. Nothing is read or written,
+#             so even a large userlib is backed up instantly. Such a folder
+#             can later be packed into an uncompressed (STORED) archive.
+#   - 'store': objects/<sha256>, a content-addressed pool holding every
+#             removed file once, plus userlib_backup_<timestamp>.json, a
+#             small run manifest pointing into it. Re-cleaning the same JAR
+#             after a restore costs no extra disk space.
+# The archive and folder layouts carry cleanup_manifest.txt; all three can
+# be reverted.
+#
+# Backups are ordered by the sequence number in their manifest, never by
+# name: a compacted archive and the counter suffixes of several runs in the
+# same minute do not sort chronologically. Backups from before the sequence
+# number was recorded count as older than all others, in name order.
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import zipfile
+
+import utils
+import profiling
+
+BACKUP_DIR_NAME = 'userlib_backup'
+BACKUP_PREFIX = 'userlib_backup_'
+MANIFEST_NAME = 'cleanup_manifest.txt'
+OBJECTS_DIR_NAME = 'objects'
+RUN_SUFFIX = '.json'
+COMPACTED_SUFFIX = '_compacted'
+BACKUP_MODES = ('zip', 'move', 'store')
+HASH_CHUNK = 1024 * 1024
+SEQUENCE_RE = re.compile(r'^Sequence: (\d+)\s*$', re.MULTILINE)
+# userlib_backup_<timestamp>[_<counter>][_compacted]
+NAME_RE = re.compile(rf'^{BACKUP_PREFIX}(.+?)(?:_(\d+))?(?:{COMPACTED_SUFFIX})?$')
+
+# (path, size, mtime_ns) -> sequence number; a backup's manifest never changes
+_sequences = {}
+
+
+def get_backup_folder(userlib_path, create=False):
+    backup_folder = os.path.join(userlib_path, BACKUP_DIR_NAME)
+    if create and not os.path.exists(backup_folder):
+        os.makedirs(backup_folder)
+    return backup_folder
+
+
+def new_backup_name(backup_folder, timestamp):
+    """Returns an unused 'userlib_backup_<timestamp>' base name (zip and folder alike).
+
+    The counter continues after the highest one in use for this timestamp, compacted
+    archives included, so a name freed by compaction or a revert is never handed out again.
+    """
+    base = f"{BACKUP_PREFIX}{timestamp}"
+    highest = 0
+    for name in list_backups(backup_folder):
+        match = NAME_RE.match(_backup_stem(name))
+        if match and f"{BACKUP_PREFIX}{match.group(1)}" == base:
+            highest = max(highest, int(match.group(2) or 1))
+    return base if highest == 0 else f"{base}_{highest + 1}"
+
+
+def list_backups(backup_folder):
+    """Returns all backups (archives and folders), oldest first."""
+    if not os.path.exists(backup_folder):
+        return []
+    backups = []
+    with os.scandir(backup_folder) as it:
+        for entry in it:
+            if not entry.name.startswith(BACKUP_PREFIX):
+                continue
+            if entry.is_dir() or entry.name.endswith(('.zip', RUN_SUFFIX)):
+                backups.append(entry.name)
+    backups.sort(key=lambda name: (read_sequence(backup_folder, name) or 0, _name_order(name)))
+    return backups
+
+
+def _name_order(name):
+    """Fallback order of backups without a sequence number: timestamp, then counter."""
+    match = NAME_RE.match(_backup_stem(name))
+    if not match:
+        return (name, 0)
+    return (match.group(1), int(match.group(2) or 1))
+
+
+def read_sequence(backup_folder, name):
+    """Sequence number from the backup's manifest, or None for older backups."""
+    path = os.path.join(backup_folder, name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (path, st.st_size, st.st_mtime_ns)
+    if key in _sequences:
+        return _sequences[key]
+
+    manifest = None
+    try:
+        if os.path.isdir(path):
+            with open(os.path.join(path, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                manifest = f.read()
+        elif name.endswith(RUN_SUFFIX):
+            manifest = read_run(backup_folder, name).get('manifest')
+        else:
+            with zipfile.ZipFile(path, 'r') as zip_file:
+                manifest = zip_file.read(MANIFEST_NAME).decode('utf-8', 'replace')
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+    match = SEQUENCE_RE.search(manifest or '')
+    sequence = _sequences[key] = int(match.group(1)) if match else None
+    return sequence
+
+
+def next_sequence(backup_folder):
+    """Sequence number for a new backup: one past the highest in the folder."""
+    return max((read_sequence(backup_folder, n) or 0 for n in list_backups(backup_folder)), default=0) + 1
+
+
+def _backup_stem(name):
+    """Backup name without its layout-specific extension."""
+    for ext in ('.zip', RUN_SUFFIX):
+        if name.endswith(ext):
+            return name[:-len(ext)]
+    return name
+
+
+def find_backup(backup_folder, name):
+    """Resolves a user-supplied backup name to an existing archive or folder name."""
+    name = os.path.basename(name.rstrip('/\\'))
+    stem = _backup_stem(name)
+    for candidate in (name, stem + '.zip', stem + RUN_SUFFIX, stem):
+        if os.path.exists(os.path.join(backup_folder, candidate)):
+            return candidate
+    return None
+
+
+def write_zip_backup(to_move, userlib_path, backup_folder, name, manifest_content):
+    """Compresses the files into <name>.zip and removes them from userlib."""
+    zip_path = os.path.join(backup_folder, name + '.zip')
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(MANIFEST_NAME, manifest_content)
+        for f in to_move:
+            full_path = os.path.join(userlib_path, f)
+            if os.path.exists(full_path):
+                zip_file.write(full_path, arcname=f)
+                profiling.count(profiling.BYTES_READ, os.path.getsize(full_path))
+                os.remove(full_path)
+    profiling.count(profiling.BYTES_WRITTEN, os.path.getsize(zip_path))
+    return zip_path
+
+
+def move_to_backup_dir(to_move, userlib_path, backup_folder, name, manifest_content):
+    """Moves the files into the <name>/ folder with os.rename (no data is copied)."""
+    target_dir = os.path.join(backup_folder, name)
+    os.makedirs(target_dir)
+    with open(os.path.join(target_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        f.write(manifest_content)
+
+    for f in to_move:
+        full_path = os.path.join(userlib_path, f)
+        if os.path.exists(full_path):
+            try:
+                os.rename(full_path, os.path.join(target_dir, f))
+            except OSError:
+                # Only possible if userlib_backup is a mount point of its own
+                shutil.move(full_path, os.path.join(target_dir, f))
+    return target_dir
+
+
+def hash_file(path):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+            profiling.count(profiling.BYTES_READ, len(chunk))
+    return digest.hexdigest()
+
+
+def object_path(backup_folder, sha256):
+    return os.path.join(backup_folder, OBJECTS_DIR_NAME, sha256[:2], sha256)
+
+
+def write_store_backup(to_move, userlib_path, backup_folder, name, manifest_content):
+    """Moves each file into the content-addressed pool (once per unique content) and writes a run manifest."""
+    entries = []
+    for f in sorted(to_move):
+        full_path = os.path.join(userlib_path, f)
+        if not os.path.exists(full_path):
+            continue
+        st = os.stat(full_path)
+        sha256 = hash_file(full_path)
+        target = object_path(backup_folder, sha256)
+        if os.path.exists(target):
+            # Identical bytes are already in the pool from an earlier run
+            os.remove(full_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.rename(full_path, target)
+        entries.append({'name': f, 'sha256': sha256, 'size': st.st_size, 'mtime': st.st_mtime})
+
+    run_path = os.path.join(backup_folder, name + RUN_SUFFIX)
+    with open(run_path, 'w', encoding='utf-8') as fp:
+        json.dump({'files': entries, 'manifest': manifest_content}, fp, indent=1)
+    return run_path
+
+
+def read_run(backup_folder, name):
+    with open(os.path.join(backup_folder, name), 'r', encoding='utf-8') as fp:
+        return json.load(fp)
+
+
+def collect_garbage(backup_folder):
+    """Deletes pool objects that no run manifest refers to. Returns the number removed."""
+    objects_dir = os.path.join(backup_folder, OBJECTS_DIR_NAME)
+    if not os.path.exists(objects_dir):
+        return 0
+    referenced = set()
+    for name in list_backups(backup_folder):
+        if name.endswith(RUN_SUFFIX):
+            referenced.update(e['sha256'] for e in read_run(backup_folder, name)['files'])
+
+    removed = 0
+    for shard in os.listdir(objects_dir):
+        shard_dir = os.path.join(objects_dir, shard)
+        for sha256 in os.listdir(shard_dir):
+            if sha256 not in referenced:
+                os.remove(os.path.join(shard_dir, sha256))
+                removed += 1
+        if not os.listdir(shard_dir):
+            os.rmdir(shard_dir)
+    return removed
+
+
+def pack_backup_dir(backup_folder, name):
+    """Packs a folder backup into an uncompressed <name>.zip and removes the folder."""
+    source_dir = os.path.join(backup_folder, name)
+    zip_path = os.path.join(backup_folder, name + '.zip')
+    tmp_path = zip_path + '.tmp'
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as zip_file:
+        for f in sorted(os.listdir(source_dir)):
+            zip_file.write(os.path.join(source_dir, f), arcname=f)
+    profiling.count(profiling.BYTES_WRITTEN, os.path.getsize(tmp_path))
+    os.replace(tmp_path, zip_path)
+    shutil.rmtree(source_dir)
+    return zip_path
+
+
+def pack_all_backup_dirs(userlib_path):
+    """Packs every folder backup into a STORED archive. Returns the created archive names."""
+    backup_folder = get_backup_folder(userlib_path)
+    packed = []
+    for name in list_backups(backup_folder):
+        if os.path.isdir(os.path.join(backup_folder, name)):
+            pack_backup_dir(backup_folder, name)
+            packed.append(name + '.zip')
+    return packed
+
+
+def restore_backup(backup_folder, name, userlib_path):
+    """Restores every file of a backup into userlib and deletes the backup. Returns the file count."""
+    path = os.path.join(backup_folder, name)
+    restored = 0
+
+    if os.path.isdir(path):
+        for f in os.listdir(path):
+            if f == MANIFEST_NAME:
+                continue
+            os.replace(os.path.join(path, f), os.path.join(userlib_path, f))
+            restored += 1
+        shutil.rmtree(path)
+        return restored
+
+    if name.endswith(RUN_SUFFIX):
+        for entry in read_run(backup_folder, name)['files']:
+            # Copy, not move: other runs may point at the same object
+            target = os.path.join(userlib_path, entry['name'])
+            shutil.copy2(object_path(backup_folder, entry['sha256']), target + '.restoring')
+            profiling.count(profiling.BYTES_WRITTEN, entry['size'])
+            os.replace(target + '.restoring', target)
+            restored += 1
+        os.remove(path)
+        collect_garbage(backup_folder)
+        return restored
+
+    with zipfile.ZipFile(path, 'r') as zip_ref:
+        members = [m for m in zip_ref.namelist() if m != MANIFEST_NAME]
+        zip_ref.extractall(userlib_path, members=members)
+        restored = len(members)
+    os.remove(path)
+    return restored
+
+
+def create_backup(to_move, userlib_path, timestamp, mode='zip'):
+    """Backs up and removes the files using the given layout. Returns the backup path."""
+    if mode not in BACKUP_MODES:
+        raise ValueError(f"Unknown backup mode '{mode}' (expected one of: {', '.join(BACKUP_MODES)})")
+    backup_folder = get_backup_folder(userlib_path, create=True)
+    name = new_backup_name(backup_folder, timestamp)
+    manifest_content = utils.create_backup_manifest(to_move, timestamp, sequence=next_sequence(backup_folder))
+
+    if mode == 'store':
+        return write_store_backup(to_move, userlib_path, backup_folder, name, manifest_content)
+    if mode == 'move':
+        return move_to_backup_dir(to_move, userlib_path, backup_folder, name, manifest_content)
+    return write_zip_backup(to_move, userlib_path, backup_folder, name, manifest_content)
@@ -0,0 +1,117 @@
+# Author: Erik van Gorsel
+# Parallel multi-project batch mode
+#
+# Evaluates many Mendix projects from a single process start: each project
+# is version-detected, routed and analysed in a worker process, and all
+# results are folded into one report and one exit code. Batch mode is
+# read-only and never prompts, so it is safe to run on build farms.
+
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import utils
+
+# Folders inside a Mendix project that never contain another project
+SKIP_DIRS = {
+    'userlib', 'vendorlib', 'deployment', 'javasource', 'javascriptsource',
+    'theme', 'themesource', 'widgets', 'resources', 'node_modules',
+}
+
+# ProcessPoolExecutor refuses more than 61 workers on Windows
+MAX_WORKERS = 61
+
+
+def discover_projects(targets):
+    """Expands project roots and search folders into a sorted list of project roots."""
+    roots = set()
+    for target in targets:
+        target = os.path.abspath(target)
+        if not os.path.isdir(target):
+            utils.log_warning(f"Skipping batch target (not a directory): {target}")
+            continue
+
+        for root, dirs, files in os.walk(target):
+            if any(f.endswith('.mpr') and not f.endswith('.bak') for f in files):
+                roots.add(root)
+                # Mendix projects do not nest, so stop descending here
+                dirs[:] = []
+                continue
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith('.')]
+    return sorted(roots)
+
+
+def evaluate_project(project_root, deep_scan_timeout=None, use_cache=True):
+    """Worker entry point: detects, routes and analyses one project without side effects."""
+    import api
+    return api.analyze_project(project_root, deep_scan_timeout=deep_scan_timeout, use_cache=use_cache)
+
+
+def print_summary(results):
+    """Prints the combined batch report."""
+    failed = [r for r in results if r['error']]
+    dirty = [r for r in results if not r['error'] and r['to_remove']]
+
+    if dirty:
+        utils.log_subheader("Projects with redundant libraries")
+        for r in dirty:
+            print(f"  {r['project']} ({r['engine']}, Mendix {r['version']})")
+            for f in r['to_remove']:
+                print(f"    - {f}")
+
+    if failed:
+        utils.log_subheader("Projects that could not be analysed")
+        for r in failed:
+            print(f"  {r['project']}: {r['error']}")
+
+    utils.log_subheader("Batch Summary")
+    print(f"  • Projects analysed:         {len(results)}")
+    print(f"  • Clean projects:            {len(results) - len(dirty) - len(failed)}")
+    print(f"  • Projects with redundancy:  {len(dirty)}")
+    print(f"  • Failed projects:           {len(failed)}")
+    print(f"  • Redundant files in total:  {sum(len(r['to_remove']) for r in dirty)}")
+
+
+def run_batch(targets, max_workers=None, report_path=None, deep_scan_timeout=None, use_cache=True):
+    """Analyses all projects under `targets` in parallel. Returns the combined exit code."""
+    utils.log_header("Mendix Userlib Cleanup (Batch Mode)")
+
+    projects = discover_projects(targets)
+    if not projects:
+        utils.log_error("No Mendix projects (.mpr files) found in the batch targets.")
+        return 1
+
+    workers = min(max_workers or os.cpu_count() or 1, len(projects), MAX_WORKERS)
+    utils.log_info(f"Analysing {len(projects)} projects with {workers} worker processes...")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(evaluate_project, p, deep_scan_timeout, use_cache): p for p in projects}
+        for future in as_completed(futures):
+            try:
+                r = future.result()
+            except Exception as e:
+                r = {'project': futures[future], 'error': f"Worker failure: {e}", 'to_remove': [], 'log': ''}
+            results.append(r)
+
+            if r['error']:
+                print(f"  [ERROR] {r['project']}")
+            elif r['to_remove']:
+                print(f"  [FAIL]  {r['project']} ({len(r['to_remove'])} redundant files)")
+            else:
+                print(f"  [OK]    {r['project']}")
+
+    results.sort(key=lambda r: r['project'])
+    print_summary(results)
+
+    if report_path:
+        try:
+            with open(report_path, 'w') as f:
+                json.dump({'projects': results}, f, indent=2)
+            utils.log_success(f"Batch report written to {report_path}")
+        except OSError as e:
+            utils.log_error(f"Could not write batch report: {e}")
+
+    if any(r['error'] or r['to_remove'] for r in results):
+        return 1
+    return 0
@@ -0,0 +1,169 @@
+# Author: Erik van Gorsel
+# Backup catalog and selective restore
+#
+# userlib_backup/catalog.json records, for every backup, which files it
+# holds together with their hash (CRC-32 for archives, SHA-256 for the
+# backup store) and, for archives, the offset of each entry. The catalog
+# answers "which backup holds this JAR?" without opening any archive, and
+# lets a single file be streamed back from its entry offset instead of
+# extracting the whole archive. Backups are re-indexed only when their
+# size or modification time changes.
+
+import os
+import json
+import shutil
+import fnmatch
+
+import backup
+import zipdir
+
+CATALOG_NAME = 'catalog.json'
+FORMAT_VERSION = 1
+
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns] if os.path.isfile(path) else [0, st.st_mtime_ns]
+
+
+def index_backup(backup_folder, name):
+    """Reads the file list of one backup without extracting anything."""
+    path = os.path.join(backup_folder, name)
+    entries = []
+
+    if os.path.isdir(path):
+        layout = 'move'
+        for f in sorted(os.listdir(path)):
+            if f != backup.MANIFEST_NAME:
+                entries.append({'name': f, 'size': os.path.getsize(os.path.join(path, f))})
+    elif name.endswith(backup.RUN_SUFFIX):
+        layout = 'store'
+        for e in backup.read_run(backup_folder, name)['files']:
+            entries.append({'name': e['name'], 'sha256': e['sha256'], 'size': e['size']})
+    else:
+        layout = 'zip'
+        for e in zipdir.read_central_directory(path):
+            if e.name == backup.MANIFEST_NAME or e.name.endswith('/'):
+                continue
+            entries.append({
+                'name': e.name,
+                'crc': e.crc,
+                'size': e.file_size,
+                'offset': e.header_offset,
+                'compressed_size': e.compressed_size,
+                'method': e.compress_type,
+            })
+
+    return {'layout': layout, 'signature': _signature(path), 'entries': entries}
+
+
+class BackupCatalog:
+    """Persistent index of file name / hash -> backup and entry location."""
+
+    def __init__(self, backup_folder):
+        self.backup_folder = backup_folder
+        self.path = os.path.join(backup_folder, CATALOG_NAME)
+        self.backups = {}
+        self.order = []
+        self._dirty = False
+
+    @classmethod
+    def open(cls, userlib_path):
+        """Loads the catalog and brings it up to date with the backups on disk."""
+        catalog = cls(backup.get_backup_folder(userlib_path))
+        try:
+            with open(catalog.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == FORMAT_VERSION:
+                catalog.backups = data.get('backups', {})
+        except (OSError, ValueError):
+            catalog._dirty = True
+        catalog.refresh()
+        return catalog
+
+    def refresh(self):
+        """Indexes new or changed backups and forgets deleted ones."""
+        self.order = backup.list_backups(self.backup_folder)
+        present = set(self.order)
+        for name in list(self.backups):
+            if name not in present:
+                del self.backups[name]
+                self._dirty = True
+        for name in self.order:
+            known = self.backups.get(name)
+            path = os.path.join(self.backup_folder, name)
+            if known is None or known.get('signature') != _signature(path):
+                try:
+                    self.backups[name] = index_backup(self.backup_folder, name)
+                except (OSError, ValueError, KeyError, zipdir.ZipDirError):
+                    continue
+                self._dirty = True
+        if self._dirty:
+            self.save()
+
+    def save(self):
+        if not os.path.exists(self.backup_folder):
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'format': FORMAT_VERSION, 'backups': self.backups}, f, indent=1)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def find(self, patterns, backup_name=None):
+        """Returns {file name: (backup name, entry)} for files matching any pattern.
+
+        A pattern is a file name, a glob or a hash (prefix). The most recent
+        backup wins unless backup_name restricts the search to one backup.
+        """
+        names = [backup_name] if backup_name else self.order
+        matches = {}
+        for name in names:
+            info = self.backups.get(name)
+            if not info:
+                continue
+            for entry in info['entries']:
+                if _entry_matches(entry, patterns):
+                    matches[entry['name']] = (name, entry)
+        return matches
+
+    def which(self, pattern):
+        """Returns [(backup name, entry)] for every backup holding a matching file, oldest first."""
+        hits = []
+        for name in self.order:
+            for entry in self.backups.get(name, {}).get('entries', []):
+                if _entry_matches(entry, [pattern]):
+                    hits.append((name, entry))
+        return hits
+
+    def restore(self, matches, userlib_path):
+        """Restores the selected entries into userlib. Returns the restored file names."""
+        restored = []
+        for file_name, (name, entry) in sorted(matches.items()):
+            layout = self.backups[name]['layout']
+            source = os.path.join(self.backup_folder, name)
+            target = os.path.join(userlib_path, file_name)
+            if layout == 'zip':
+                zipdir.extract_entry(source, entry['offset'], entry['compressed_size'], entry['method'], entry['crc'], target)
+            elif layout == 'store':
+                shutil.copy2(backup.object_path(self.backup_folder, entry['sha256']), target + '.restoring')
+                os.replace(target + '.restoring', target)
+            else:
+                os.replace(os.path.join(source, file_name), target)
+            restored.append(file_name)
+        self.refresh()
+        return restored
+
+
+def _entry_matches(entry, patterns):
+    name = entry['name'].lower()
+    hashes = [str(entry[k]) for k in ('sha256',) if k in entry]
+    if 'crc' in entry:
+        hashes.append(f"{entry['crc']:08x}")
+    for pattern in patterns:
+        p = pattern.lower()
+        if name == p or fnmatch.fnmatchcase(name, p):
+            return True
+        if len(p) >= 8 and any(h.startswith(p) for h in hashes):
+            return True
+    return False
@@ -0,0 +1,300 @@
+# Author: Erik van Gorsel
+# Cross-JAR class index (duplicate classes and split packages)
+#
+# Two JARs that both ship org/apache/xmlbeans/XmlObject.class load into the
+# same class loader and fail at runtime with a LinkageError, even when their
+# file names have nothing in common. This index holds every class entry of
+# userlib and vendorlib in three parallel arrays:
+#   - a 64-bit blake2b hash of the class name   (array 'Q', 8 bytes)
+#   - the id of the JAR it belongs to            (array 'I', 4 bytes)
+#   - the id of its interned package name        (array 'I', 4 bytes)
+# so 200k class entries take about 3 MB. Class names themselves are not
+# kept; shared_class_names() recovers them for a pair when needed.
+# Removed JARs (watch mode) are compacted out of the arrays once they hold
+# a quarter of the entries, and their ids are reused.
+
+import os
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import zipdir
+import deepscan
+import profiling
+
+VENDORLIB = "vendorlib"
+# Up to this many new entries are inserted into the sorted arrays instead of re-sorting them
+INSERT_LIMIT = 5000
+# Share of the entries that may belong to removed JARs before the arrays are compacted
+COMPACT_RATIO = 0.25
+
+
+def class_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def package_of(class_name):
+    """'org/apache/xmlbeans/XmlObject.class' -> 'org.apache.xmlbeans'"""
+    return class_name.rpartition("/")[0].replace("/", ".")
+
+
+class JarOverlap:
+    """Classes and packages two JARs have in common."""
+    __slots__ = ("jar_a", "jar_b", "shared_classes", "shared_packages", "split_packages")
+
+    def __init__(self, jar_a, jar_b, shared_classes, shared_packages, split_packages):
+        self.jar_a = jar_a
+        self.jar_b = jar_b
+        self.shared_classes = shared_classes
+        self.shared_packages = shared_packages
+        self.split_packages = split_packages
+
+    def __str__(self):
+        parts = []
+        if self.shared_classes:
+            parts.append(f"{self.shared_classes} duplicate classes in {', '.join(self.shared_packages[:3])}"
+                         + (" ..." if len(self.shared_packages) > 3 else ""))
+        if self.split_packages:
+            parts.append(f"split package {', '.join(self.split_packages[:3])}"
+                         + (" ..." if len(self.split_packages) > 3 else ""))
+        return f"{self.jar_a} <-> {self.jar_b}: " + "; ".join(parts)
+
+    def to_dict(self):
+        return {
+            'jar_a': self.jar_a,
+            'jar_b': self.jar_b,
+            'shared_classes': self.shared_classes,
+            'shared_packages': list(self.shared_packages),
+            'split_packages': list(self.split_packages),
+        }
+
+
+def _overlap_order(o):
+    return (-o.shared_classes, -len(o.split_packages), o.jar_a, o.jar_b)
+
+
+class ClassIndex:
+    """Array-backed inverted index from class name hashes to JARs."""
+
+    def __init__(self):
+        self.jars = []                  # Label per JAR id; None for a free id
+        self.packages = []
+        self._package_ids = {}
+        self._hashes = array("Q")
+        self._jar_ids = array("I")
+        self._pkg_ids = array("I")
+        self._sorted_upto = 0
+        self._ids = {}                  # label -> ids of the JARs with that label
+        self._jar_packages = []         # per JAR id: {package id: class count}
+        self._package_jars = defaultdict(set)
+        self._removed = set()           # Ids whose entries are still in the arrays
+        self._garbage = 0               # Number of those entries
+        self._free = []                 # Compacted ids, reused by add_jar
+
+    def __len__(self):
+        return len(self._hashes) - self._garbage
+
+    @property
+    def nbytes(self):
+        """Memory held by the entry arrays."""
+        return sum(a.itemsize * len(a) for a in (self._hashes, self._jar_ids, self._pkg_ids))
+
+    def add_jar(self, label, class_names):
+        """Adds the class entries of one JAR. `label` is how the JAR is reported."""
+        if self._free:
+            jar_id = self._free.pop()
+            self.jars[jar_id] = label
+        else:
+            jar_id = len(self.jars)
+            self.jars.append(label)
+            self._jar_packages.append(None)
+        packages = self._jar_packages[jar_id] = {}
+        for name in class_names:
+            package = package_of(name)
+            pkg_id = self._package_ids.get(package)
+            if pkg_id is None:
+                pkg_id = self._package_ids[package] = len(self.packages)
+                self.packages.append(package)
+            packages[pkg_id] = packages.get(pkg_id, 0) + 1
+            self._hashes.append(class_hash(name))
+            self._jar_ids.append(jar_id)
+            self._pkg_ids.append(pkg_id)
+        for pkg_id in packages:
+            self._package_jars[pkg_id].add(jar_id)
+        self._ids.setdefault(label, []).append(jar_id)
+        return jar_id
+
+    def remove_jar(self, label):
+        """Drops a JAR (e.g. deleted or about to be re-added after a change). Its entries are skipped by
+        every query until enough have gathered to compact the arrays."""
+        for jar_id in self._ids.pop(label, ()):
+            self._removed.add(jar_id)
+            self._garbage += sum(self._jar_packages[jar_id].values())
+        if self._garbage > len(self._hashes) * COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self):
+        """Deletes the entries of removed JARs from the arrays and frees their ids. Keeps the sort order."""
+        removed = self._removed
+        keep = [i for i, jar_id in enumerate(self._jar_ids) if jar_id not in removed]
+        self._sorted_upto = bisect_left(keep, self._sorted_upto)
+        self._hashes = array("Q", (self._hashes[i] for i in keep))
+        self._jar_ids = array("I", (self._jar_ids[i] for i in keep))
+        self._pkg_ids = array("I", (self._pkg_ids[i] for i in keep))
+        for jar_id in removed:
+            for pkg_id in self._jar_packages[jar_id]:
+                self._package_jars[pkg_id].discard(jar_id)
+            self.jars[jar_id] = None
+            self._jar_packages[jar_id] = None
+        self._free.extend(sorted(removed, reverse=True))
+        removed.clear()
+        self._garbage = 0
+
+    def _live_ids(self, exclude=()):
+        """Ids of the JARs that count: not removed and not labelled in `exclude`."""
+        return {i for i, label in enumerate(self.jars)
+                if label is not None and i not in self._removed and label not in exclude}
+
+    def _sort(self):
+        """Orders the entries by hash so equal classes form contiguous runs.
+        A few new entries (watch mode) are inserted in place; many trigger a full sort."""
+        n = len(self._hashes)
+        start = self._sorted_upto
+        if start == n:
+            return
+        if start and n - start <= INSERT_LIMIT:
+            tail = sorted(zip(self._hashes[start:], self._jar_ids[start:], self._pkg_ids[start:]))
+            del self._hashes[start:], self._jar_ids[start:], self._pkg_ids[start:]
+            for h, jar_id, pkg_id in tail:
+                pos = bisect_right(self._hashes, h)
+                self._hashes.insert(pos, h)
+                self._jar_ids.insert(pos, jar_id)
+                self._pkg_ids.insert(pos, pkg_id)
+        else:
+            order = sorted(range(n), key=self._hashes.__getitem__)
+            self._hashes = array("Q", (self._hashes[i] for i in order))
+            self._jar_ids = array("I", (self._jar_ids[i] for i in order))
+            self._pkg_ids = array("I", (self._pkg_ids[i] for i in order))
+        self._sorted_upto = n
+
+    def jars_with_class(self, class_name):
+        """Returns the labels of all JARs that ship the class."""
+        self._sort()
+        h = class_hash(class_name)
+        pos = bisect_left(self._hashes, h)
+        found = []
+        while pos < len(self._hashes) and self._hashes[pos] == h:
+            if self._jar_ids[pos] not in self._removed:
+                found.append(self.jars[self._jar_ids[pos]])
+            pos += 1
+        return found
+
+    def overlaps(self, exclude=(), involving=None):
+        """Returns a JarOverlap for every pair of JARs sharing classes or packages, largest first.
+        JARs whose label is in `exclude` (e.g. files about to be removed) are ignored. With `involving`
+        (labels), only the pairs with at least one of those JARs are computed."""
+        self._sort()
+        live = self._live_ids(exclude)
+        hashes, jar_ids, pkg_ids = self._hashes, self._jar_ids, self._pkg_ids
+        focus = live if involving is None else {i for i in live if self.jars[i] in involving}
+        per_jar_pkg = self._jar_packages
+
+        # Only hashes that occur more than once can be shared; their runs are found by bisection
+        if involving is None:
+            runs = [(bisect_left(hashes, h), count) for h, count in Counter(hashes).items() if count > 1]
+        else:
+            runs = []
+            for h in {hashes[i] for i, jar_id in enumerate(jar_ids) if jar_id in focus}:
+                pos = bisect_left(hashes, h)
+                runs.append((pos, bisect_right(hashes, h, pos) - pos))
+
+        shared = defaultdict(int)                       # (a, b) -> duplicate classes
+        shared_by_pkg = defaultdict(int)                # (a, b, pkg) -> duplicate classes
+        for pos, count in runs:
+            run = {jar_ids[j] for j in range(pos, pos + count)} & live
+            if len(run) > 1:
+                members = sorted(run)
+                pkg = pkg_ids[pos]
+                for x in range(len(members)):
+                    for y in range(x + 1, len(members)):
+                        if members[x] in focus or members[y] in focus:
+                            shared[members[x], members[y]] += 1
+                            shared_by_pkg[members[x], members[y], pkg] += 1
+
+        # Packages present in two JARs that do not ship exactly the same classes
+        split = defaultdict(list)
+        for pkg in {p for jar in focus for p in per_jar_pkg[jar]}:
+            members = sorted(self._package_jars[pkg] & live)
+            if len(members) < 2 or not self.packages[pkg]:
+                continue
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    a, b = members[x], members[y]
+                    if a not in focus and b not in focus:
+                        continue
+                    dup = shared_by_pkg.get((a, b, pkg), 0)
+                    if not (dup == per_jar_pkg[a][pkg] == per_jar_pkg[b][pkg]):
+                        split[a, b].append(pkg)
+
+        shared_packages = defaultdict(list)
+        for (a, b, pkg) in shared_by_pkg:
+            shared_packages[a, b].append(pkg)
+
+        result = []
+        for pair in set(shared) | set(split):
+            a, b = pair
+            result.append(JarOverlap(
+                self.jars[a], self.jars[b], shared.get(pair, 0),
+                tuple(sorted(self.packages[p] for p in shared_packages.get(pair, ()))),
+                tuple(sorted(self.packages[p] for p in split.get(pair, ()))),
+            ))
+        result.sort(key=_overlap_order)
+        return result
+
+    def update_overlaps(self, previous, exclude=(), involving=()):
+        """Brings the `previous` overlaps up to date: the pairs with a JAR labelled in `involving` (changed,
+        or newly excluded or no longer) are computed again, all others are kept as they are."""
+        involving = set(involving)
+        kept = [o for o in previous if o.jar_a not in involving and o.jar_b not in involving]
+        return sorted(kept + self.overlaps(exclude, involving), key=_overlap_order)
+
+    def shared_class_names(self, class_names, other_label):
+        """Filters the class names of one JAR down to those the other JAR also ships."""
+        self._sort()
+        other = max(i for i in self._live_ids() if self.jars[i] == other_label)
+        theirs = {self._hashes[i] for i in range(len(self._hashes)) if self._jar_ids[i] == other}
+        return sorted(n for n in class_names if class_hash(n) in theirs)
+
+
+def _read_classes(path):
+    try:
+        return deepscan.get_class_entries(zipdir.read_entry_names(path))
+    except (OSError, zipdir.ZipDirError):
+        return None
+
+
+def read_vendorlib_classes(vendorlib_path, files=None, max_workers=None):
+    """Returns {relative path: class names} for the JARs under vendorlib (all, or just `files`)."""
+    if files is None:
+        import vendorlib
+        files = [a.file for a in vendorlib.scan_vendorlib(vendorlib_path)]
+    paths = [os.path.join(vendorlib_path, f) for f in files]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return {f: classes for f, classes in zip(files, pool.map(_read_classes, paths)) if classes}
+
+
+@profiling.timed("Class index build")
+def build_index(signatures, vendorlib_path=None, vendor_classes=None, max_workers=None):
+    """Indexes the userlib JARs (from their deep scan signatures) and every JAR under vendorlib.
+    `vendor_classes` ({relative path: class names}) replaces reading vendorlib when given."""
+    index = ClassIndex()
+    for sig in signatures:
+        index.add_jar(sig.file, sig.classes)
+
+    if vendor_classes is None and vendorlib_path and os.path.isdir(vendorlib_path):
+        vendor_classes = read_vendorlib_classes(vendorlib_path, max_workers=max_workers)
+    for rel_path in sorted(vendor_classes or ()):
+        index.add_jar(f"{VENDORLIB}/{rel_path}", vendor_classes[rel_path])
+    return index
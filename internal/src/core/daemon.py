@@ -0,0 +1,167 @@
+# Author: Erik van Gorsel
+# Resident daemon (--daemon)
+#
+# Serves an api.Session as JSON-RPC 2.0 over HTTP on 127.0.0.1. An IDE
+# plugin or a pre-commit hook then gets the verdict for a project that the
+# daemon has seen before in milliseconds: its inventory, deep scan
+# signatures and class index stay in memory and only the JARs that changed
+# since the last request are read. The daemon is read-only; it analyses and
+# plans, but never moves or deletes files.
+#
+#   POST http://127.0.0.1:47231/
+#   {"jsonrpc": "2.0", "id": 1, "method": "analyze", "params": {"project": "C:/Apps/MyApp"}}
+#
+# Methods: analyze, plan, invalidate, status, shutdown.
+
+import json
+import urllib.request
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import utils
+import api
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 47231
+# Seconds the server waits for a request before it checks for a shutdown
+POLL_SECONDS = 0.5
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class RpcError(Exception):
+    """An error reported to the client as a JSON-RPC error object."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _project_param(params, required=True):
+    project = params.get('project') if isinstance(params, dict) else None
+    if project is None and not required:
+        return None
+    if not isinstance(project, str) or not project:
+        raise RpcError(INVALID_PARAMS, "params.project must be the path of a Mendix project folder.")
+    return project
+
+
+class Daemon:
+    """Dispatches JSON-RPC requests to one Session."""
+
+    def __init__(self, session):
+        self.session = session
+        self.stopping = False
+        self.methods = {
+            'analyze': lambda params: self.session.analyze(_project_param(params)),
+            'plan': lambda params: self.session.plan(_project_param(params)),
+            'invalidate': lambda params: {'forgotten': self.session.invalidate(_project_param(params, required=False))},
+            'status': lambda params: self.session.status(),
+            'shutdown': self._shutdown,
+        }
+
+    def _shutdown(self, params):
+        self.stopping = True
+        return True
+
+    def handle(self, request):
+        """Returns the response object for one request (None for a notification)."""
+        if not isinstance(request, dict) or request.get('jsonrpc') != "2.0" or not isinstance(request.get('method'), str):
+            return _error(None, INVALID_REQUEST, "Not a JSON-RPC 2.0 request.")
+        request_id = request.get('id')
+        method = self.methods.get(request['method'])
+        try:
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Unknown method '{request['method']}'.")
+            result = method(request.get('params') or {})
+        except RpcError as e:
+            response = _error(request_id, e.code, str(e))
+        except Exception as e:
+            response = _error(request_id, SERVER_ERROR, str(e))
+        else:
+            response = {'jsonrpc': "2.0", 'id': request_id, 'result': result}
+        return response if 'id' in request else None
+
+    def handle_body(self, body):
+        """Decodes a request body (a single request or a batch) and returns the response object."""
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            return _error(None, PARSE_ERROR, f"Invalid JSON: {e}")
+        if isinstance(payload, list):
+            if not payload:
+                return _error(None, INVALID_REQUEST, "Empty batch.")
+            responses = [r for r in (self.handle(p) for p in payload) if r is not None]
+            return responses or None
+        return self.handle(payload)
+
+
+def _error(request_id, code, message):
+    return {'jsonrpc': "2.0", 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP transport: one JSON-RPC payload per POST."""
+
+    def do_POST(self):
+        # Browsers send an Origin header: web pages must not be able to drive the daemon
+        if self.headers.get('Origin'):
+            self.send_error(403)
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self.send_error(413)
+            return
+        response = self.server.rpc.handle_body(self.rfile.read(length))
+        if response is None:
+            self.send_response(204)
+            self.end_headers()
+            return
+        data = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header('Content-Type', "application/json")
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_daemon(port=DEFAULT_PORT, polling=False):
+    """Serves requests until the 'shutdown' method or Ctrl+C. Returns the exit code."""
+    utils.log_header("Mendix Userlib Cleanup (Daemon)")
+    try:
+        server = HTTPServer((HOST, port), _Handler)
+    except OSError as e:
+        utils.log_error(f"Cannot listen on {HOST}:{port} ({e}). Is a daemon already running?")
+        return 1
+    server.timeout = POLL_SECONDS
+    server.rpc = Daemon(api.Session(polling=polling))
+    utils.log_info(f"Listening on http://{HOST}:{port}/ (JSON-RPC 2.0). Press Ctrl+C to stop.")
+    try:
+        while not server.rpc.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+        server.rpc.session.close()
+    utils.log_info("Daemon stopped.")
+    return 0
+
+
+def request(method, params=None, port=DEFAULT_PORT, timeout=300):
+    """Client helper: calls one daemon method and returns its result. Raises RpcError or OSError."""
+    body = json.dumps({'jsonrpc': "2.0", 'id': 1, 'method': method, 'params': params or {}}).encode("utf-8")
+    req = urllib.request.Request(f"http://{HOST}:{port}/", data=body, headers={'Content-Type': "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        response = json.load(resp)
+    if 'error' in response:
+        raise RpcError(response['error']['code'], response['error']['message'])
+    return response['result']
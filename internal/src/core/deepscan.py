@@ -0,0 +1,194 @@
+# Author: Erik van Gorsel
+# Native deep scan (signature-based analysis)
+#
+# Replaces the external mendix-userlib-cleaner.exe. Every JAR in userlib
+# is fingerprinted by the class entries listed in its ZIP central
+# directory, so duplicates are found even when their file names differ:
+#   - JARs with an identical class set are duplicates of each other; the
+#     newest one is kept.
+#   - A JAR whose classes are all shipped by one other, larger JAR of the
+#     same library (same Maven identity, else same normalized name) is
+#     fully shadowed by it and therefore redundant. A fat or shaded JAR
+#     that bundles a different library is only reported as an overlap:
+#     other modules may still reference that library by its file.
+# The same memory-mapped pass also reads the manifest and pom.properties
+# (see jarmeta), so versions are compared as the JARs declare them.
+
+import os
+import sys
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import utils
+import zipdir
+import jarmeta
+import tracing
+import inventory
+
+# Entries that appear in almost every JAR and say nothing about its identity
+IGNORED_CLASSES = ("module-info.class", "package-info.class")
+MAVEN_PREFIX = "META-INF/maven/"
+POM_PROPERTIES = "/pom.properties"
+
+
+class JarSignature:
+    """Class-level fingerprint of a single JAR."""
+    __slots__ = ("file", "classes", "digest", "version", "mtime", "coordinates", "metadata")
+
+    def __init__(self, file, classes, version, mtime, coordinates=None, metadata=None):
+        self.file = file
+        self.classes = classes
+        self.version = version
+        self.mtime = mtime
+        self.coordinates = coordinates
+        self.metadata = metadata
+        joined = "\n".join(sorted(classes)).encode("utf-8")
+        self.digest = hashlib.sha1(joined).hexdigest() if classes else None
+
+
+def get_class_entries(names):
+    """Filters an entry list down to the (interned) class entries that identify a JAR."""
+    classes = set()
+    for name in names:
+        if not name.endswith(".class") or name.startswith("META-INF/"):
+            continue
+        if name.endswith(IGNORED_CLASSES):
+            continue
+        classes.add(sys.intern(name))
+    return frozenset(classes)
+
+
+def get_maven_coordinates(names, file_name=None):
+    """Returns (group, artifact) from the META-INF/maven/<group>/<artifact>/ entries, else None. A shaded
+    JAR carries those of every bundled library; jarmeta.choose_identity picks its own by the file name."""
+    found = set()
+    for name in names:
+        if name.startswith(MAVEN_PREFIX) and name.endswith(POM_PROPERTIES):
+            parts = name[len(MAVEN_PREFIX):-len(POM_PROPERTIES)].split("/")
+            if len(parts) == 2:
+                found.add((parts[0], parts[1]))
+    return jarmeta.choose_identity(found, file_name)
+
+
+def read_signature(userlib_path, record):
+    """Reads the central directory and the metadata entries of one JAR. Returns None for unreadable archives."""
+    start = time.perf_counter() if tracing.ENABLED else None
+    try:
+        names, contents = zipdir.read_mapped_entries(os.path.join(userlib_path, record.name), jarmeta.is_metadata_entry)
+    except (OSError, ValueError, zipdir.ZipDirError) as e:
+        if start is not None:
+            tracing.emit(tracing.READ, record.name, stage="signatures", error=str(e),
+                         duration_ms=round((time.perf_counter() - start) * 1000, 3))
+        return None
+    metadata = jarmeta.from_entries(contents, record.name)
+    sig = JarSignature(record.name, get_class_entries(names), jarmeta.version_key(record, metadata), record.mtime,
+                       get_maven_coordinates(names, record.name), metadata)
+    if start is not None:
+        tracing.emit(tracing.READ, record.name, stage="signatures", classes=len(sig.classes),
+                     duration_ms=round((time.perf_counter() - start) * 1000, 3))
+    return sig
+
+
+def _keep_order(sig):
+    """Sort key: the JAR to keep sorts last (highest version, then newest file)."""
+    return (sig.version, sig.mtime, sig.file)
+
+
+def same_library(a, b):
+    """Whether two JARs are builds of one library: equal Maven coordinates when both declare them,
+    else equal normalized names (the artifactId when declared, else the file's base name)."""
+    if a.coordinates and b.coordinates:
+        return a.coordinates == b.coordinates
+    return _library_name(a) == _library_name(b)
+
+
+def _library_name(sig):
+    name = sig.coordinates[1] if sig.coordinates else utils.get_jar_details(sig.file)[0]
+    return utils.normalize_lib_name(name)
+
+
+def find_redundant(signatures):
+    """Maps the file names that are duplicated or shadowed by another JAR to the reason."""
+    signatures = [s for s in signatures if s is not None and s.classes]
+    redundant = {}
+
+    # 1. Identical class sets: keep only the preferred copy
+    by_digest = {}
+    for sig in signatures:
+        by_digest.setdefault(sig.digest, []).append(sig)
+
+    unique = []
+    for group in by_digest.values():
+        group.sort(key=_keep_order)
+        for dup in group[:-1]:
+            redundant[dup.file] = f"same classes as {group[-1].file}"
+            tracing.emit(tracing.DUPLICATE_CLASSES, dup.file, rule="identical class set", related=group[-1].file)
+        unique.append(group[-1])
+
+    # 2. Strict containment: every class of A is also shipped by a larger JAR B of the same library.
+    # Any container of A must own A's first class, so only those are compared.
+    owners = {}
+    for sig in unique:
+        for name in sig.classes:
+            owners.setdefault(name, []).append(sig)
+
+    for sig in unique:
+        probe = min(sig.classes)
+        for other in owners[probe]:
+            if other is sig or len(other.classes) <= len(sig.classes) or not same_library(sig, other):
+                continue
+            if sig.classes <= other.classes:
+                redundant[sig.file] = f"classes contained in {other.file}"
+                tracing.emit(tracing.CONTAINED_CLASSES, sig.file, rule="class set contained in a larger JAR", related=other.file)
+                break
+
+    return redundant
+
+
+class SignatureRead:
+    """Fingerprints JARs on a thread pool in the background, so other stages can run meanwhile."""
+
+    def __init__(self, userlib_path, records, max_workers=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._futures = [(record, self._pool.submit(read_signature, userlib_path, record)) for record in records]
+
+    def result(self, timeout=None):
+        """Waits up to `timeout` seconds. Returns (signatures, records not read in time).
+        Unreadable archives are reported and left out."""
+        done, _ = wait([future for _, future in self._futures], timeout)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        signatures, pending = [], []
+        for record, future in self._futures:
+            if future not in done:
+                pending.append(record)
+                continue
+            sig = future.result()
+            if sig is None:
+                utils.log_warning(f"Deep scan skipped unreadable archive: {record.name}")
+            else:
+                signatures.append(sig)
+        return signatures, pending
+
+    def close(self):
+        """Cancels the reads not started yet and waits for the running ones, so no JAR stays open.
+        After a timeout, result() leaves them running; files must not be moved until this returns."""
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def read_signatures(userlib_path, records, max_workers=None):
+    """Fingerprints the JARs in parallel. Unreadable archives are reported and left out."""
+    if not records:
+        return []
+    return SignatureRead(userlib_path, records, max_workers).result()[0]
+
+
+def scan_userlib(userlib_path, records=None, max_workers=None, signatures=None):
+    """Fingerprints all JARs (unless their signatures are given) and returns {redundant file name: reason},
+    ordered by name."""
+    if signatures is None:
+        if records is None:
+            records = inventory.UserlibInventory.scan(userlib_path).jar_records()
+        signatures = read_signatures(userlib_path, records, max_workers)
+    redundant = find_redundant(signatures)
+    return {name: redundant[name] for name in sorted(redundant)}
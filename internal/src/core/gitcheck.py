@@ -0,0 +1,232 @@
+# Author: Erik van Gorsel
+# Git-aware check (--check in a git working tree)
+#
+# A CI pipeline checks out the project afresh for every commit. The file
+# modification times are new each time, so the deep scan cache (keyed on
+# size and mtime) never hits, although userlib and vendorlib rarely change.
+# When the project lives in a git working tree whose userlib and vendorlib
+# files are exactly what the index records, the verdict is cached under the
+# blob IDs from .git/index instead, together with the engine, the Studio Pro
+# version and the rule files. An unchanged tree is answered without opening
+# a JAR. After a change, only the JARs with a new blob ID are read: the
+# entry keeps the signatures of the others by blob ID. The check itself
+# then runs in full on those signatures, in memory; the entry holds no
+# stage results that could be brought up to date the way watch mode does.
+#
+# The key also covers the tool's own code (the source of the modules that
+# decide the verdict, or the executable of the frozen build), so an upgrade
+# never reuses the verdict of an older release.
+#
+# Untracked, modified or conflicted files turn this off; the normal check runs.
+
+import os
+import sys
+import json
+import hashlib
+import importlib.util
+
+import utils
+import tracing
+import profiling
+import scancache
+import gitindex
+
+ENTRY_PREFIX = "gitcheck-"
+# Bumped whenever the stored format or an engine's verdict for the same inputs changes
+VERDICT_FORMAT = 1
+# Modules whose code decides the verdict, besides the engine module itself
+VERDICT_MODULES = ("pipeline", "deepscan", "inventory", "jarmeta", "zipdir", "classindex", "naming",
+                   "vendorlib", "protection", "project", "utils", "scancache", "gitcheck")
+
+_code_digests = {}
+
+
+def tracked_state(ctx):
+    """Returns {'userlib': {file name: blob ID}, 'vendorlib': {relative path: blob ID}} when every userlib
+    file, vendorlib JAR and the SBOM are tracked and unchanged since git indexed them, else None."""
+    import plan
+    repository = gitindex.find_repository(ctx.root)
+    if repository is None:
+        return None
+    worktree, git_dir = repository
+    folders = {}
+    for area, path in (("userlib", ctx.userlib_path), ("vendorlib", ctx.vendorlib_path)):
+        rel_path = os.path.relpath(path, worktree).replace(os.sep, "/")
+        if rel_path.startswith("../"):
+            return None
+        folders[area] = rel_path + "/"
+    try:
+        entries = gitindex.read_index(git_dir, tuple(folders.values()))
+    except gitindex.GitIndexError as e:
+        utils.log_warning(f"{e} Running the full check.")
+        return None
+
+    state = {}
+    current = {
+        'userlib': {r.name: (r.size, r.mtime) for r in ctx.inventory().records.values()},
+        'vendorlib': {f: tuple(p) for f, p in plan.fingerprint_vendorlib(ctx.vendorlib_path).items()},
+    }
+    for area, files in current.items():
+        blobs = state[area] = {}
+        for name, (size, mtime) in files.items():
+            entry = entries.get(folders[area] + name)
+            if entry is None or not entry.matches(size, mtime):
+                return None
+            blobs[name] = entry.blob
+    return state
+
+
+def _file_digest(path):
+    try:
+        with open(path, "rb") as fp:
+            return hashlib.blake2b(fp.read(), digest_size=20).hexdigest()
+    except OSError:
+        return "-"
+
+
+def code_digest(engine_name):
+    """Digest of the code behind an engine's verdict (see module_digest)."""
+    return module_digest((engine_name,) + VERDICT_MODULES)
+
+
+def module_digest(modules):
+    """Digest of the source of these modules, or of the executable itself in the frozen build,
+    whose modules have no source files. Computed once per process."""
+    modules = tuple(modules)
+    if modules in _code_digests:
+        return _code_digests[modules]
+    h = hashlib.blake2b(digest_size=20)
+    for module in modules:
+        try:
+            spec = importlib.util.find_spec(module)
+        except (ImportError, ValueError):
+            spec = None
+        origin = spec.origin if spec is not None else None
+        if origin is None or not os.path.isfile(origin):
+            st = os.stat(sys.executable)
+            h = hashlib.blake2b(f"executable={sys.executable}\n{st.st_size}\n{st.st_mtime_ns}\n".encode("utf-8"),
+                                digest_size=20)
+            break
+        h.update(f"{module}={_file_digest(origin)}\n".encode("utf-8"))
+    digest = _code_digests[modules] = h.hexdigest()
+    return digest
+
+
+def verdict_key(state, engine_name, version, project_root):
+    """Digest of everything the check verdict depends on."""
+    import protection
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"format={VERDICT_FORMAT}\nengine={engine_name}\nversion={version}\n".encode("utf-8"))
+    h.update(f"code={code_digest(engine_name)}\n".encode("utf-8"))
+    for label, digest in sorted(protection.rule_digests(project_root).items()):
+        h.update(f"rules={label}={digest}\n".encode("utf-8"))
+    for area in ("userlib", "vendorlib"):
+        for name in sorted(state[area]):
+            h.update(f"{area}\0{name}\0{state[area][name]}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _entry_path(mpr_path):
+    """One cache entry per project (.mpr file)."""
+    digest = hashlib.blake2b(os.path.abspath(mpr_path or "").encode("utf-8"), digest_size=20).hexdigest()
+    return os.path.join(scancache.cache_dir(), f"{ENTRY_PREFIX}{digest}.json")
+
+
+@profiling.timed("Check cache")
+def load_entry(path):
+    """Returns the cache entry, or None when it is missing or unusable."""
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            entry = json.load(fp)
+            profiling.count(profiling.BYTES_READ, fp.tell())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get("format") != VERDICT_FORMAT:
+        return None
+    return entry
+
+
+@profiling.timed("Check cache")
+def save_entry(path, entry):
+    """Stores the cache entry. Failures only cost the next run its shortcut."""
+    folder = os.path.dirname(path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(entry, fp, separators=(",", ":"))
+            profiling.count(profiling.BYTES_WRITTEN, fp.tell())
+        os.replace(tmp_path, path)
+        scancache.prune(folder, prefix=ENTRY_PREFIX)
+    except OSError as e:
+        utils.log_warning(f"Could not write the check cache ({e}).")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+@profiling.timed("Signature reuse")
+def _reuse_signatures(ctx, rows, blobs):
+    """Seeds the context with the kept signatures of unchanged blobs; only the other JARs are read.
+    Returns the changes as (area, sign, name) tuples, like watch mode reports them."""
+    import deepscan
+    kept, fresh = [], []
+    for rec in ctx.inventory().jar_records():
+        row = rows.get(blobs[rec.name])
+        if row is not None:
+            kept.append(scancache.signature_from_row(row, rec))
+        else:
+            fresh.append(rec)
+    with profiling.phase("Signature read"):
+        signatures = kept + deepscan.read_signatures(ctx.userlib_path, fresh)
+    ctx.seed(signatures=signatures)
+    return [("userlib", "~", rec.name) for rec in fresh]
+
+
+def run_check(ctx, engine):
+    """--check with the git-keyed verdict cache; the normal check when it does not apply. Returns the exit code."""
+    if not ctx.use_cache or not os.path.isdir(ctx.userlib_path):
+        return engine.run_check(ctx)
+    with profiling.phase("Git index"):
+        state = tracked_state(ctx)
+    if state is None:
+        return engine.run_check(ctx)
+
+    key = verdict_key(state, engine.__name__, ctx.version, ctx.root)
+    path = _entry_path(ctx.mpr_path)
+    entry = load_entry(path) or {}
+    if entry.get("key") == key:
+        utils.log_info("userlib and vendorlib are unchanged since the last check (git index); reusing its verdict.")
+        finding = entry["finding"]
+        if finding:
+            tracing.emit(tracing.SELECTED, finding[0], rule=finding[1], stage="cached verdict")
+        return engine.report_check(tuple(finding) if finding else None)
+
+    rows = entry.get("signatures") or {}
+    if rows:
+        changes = _reuse_signatures(ctx, rows, state['userlib'])
+        if changes:
+            reused = len(ctx.inventory().jars) - len(changes)
+            utils.log_info(f"{len(changes)} userlib JAR(s) new or changed since the last check (git index);"
+                           f" only those were read, the signatures of {reused} unchanged JAR(s) were reused.")
+
+    with profiling.phase("Check"):
+        finding = engine.check(ctx)
+
+    # A deep scan cut short by --deep-scan-timeout gives a partial verdict: never kept
+    if not ctx.unscanned:
+        signatures = ctx.cached().get('signatures')
+        if signatures is not None:
+            rows = {state['userlib'][sig.file]: scancache.signature_row(sig) for sig in signatures}
+        else:
+            # The check stopped before the deep scan: keep what is still valid
+            current = set(state['userlib'].values())
+            rows = {blob: row for blob, row in rows.items() if blob in current}
+        save_entry(path, {
+            "format": VERDICT_FORMAT,
+            "key": key,
+            "finding": list(finding) if finding else None,
+            "signatures": rows,
+        })
+    return engine.report_check(finding)
@@ -0,0 +1,153 @@
+# Author: Erik van Gorsel
+# Git index reader
+#
+# Reads the blob IDs that git recorded for tracked files straight from the
+# index file (.git/index, format versions 2 to 4), without running git and
+# without opening any tracked file. Each entry also keeps the size and
+# modification time of the file git hashed: a working tree file with other
+# stat data was changed since, and its recorded blob ID no longer applies.
+#
+# Like git, a file rewritten within the same nanosecond with the same size
+# is not noticed; file systems without sub-second times widen that window
+# to a second.
+
+import os
+import re
+import struct
+
+import profiling
+
+INDEX_SIGNATURE = b"DIRC"
+INDEX_VERSIONS = (2, 3, 4)
+# ctime and mtime (seconds, nanoseconds), dev, ino, mode, uid, gid, size
+_STAT = struct.Struct(">10I")
+_HEADER = struct.Struct(">4sII")
+_FLAGS = struct.Struct(">H")
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE = 0x3000
+XFLAG_INTENT_TO_ADD = 0x2000
+
+
+class GitIndexError(Exception):
+    """Raised when the index cannot be read or has an unknown format."""
+
+
+class IndexEntry:
+    """Blob ID and recorded stat data of one tracked file."""
+    __slots__ = ("blob", "size", "mtime_s", "mtime_ns")
+
+    def __init__(self, blob, size, mtime_s, mtime_ns):
+        self.blob = blob
+        self.size = size
+        self.mtime_s = mtime_s
+        self.mtime_ns = mtime_ns
+
+    def matches(self, size, mtime):
+        """True when a file of this size and mtime (seconds, as os.stat gives it) is the one git hashed."""
+        if size & 0xFFFFFFFF != self.size or int(mtime) & 0xFFFFFFFF != self.mtime_s:
+            return False
+        # 0 nanoseconds: git (or the file system) did not record sub-second times
+        return self.mtime_ns == 0 or abs((mtime % 1) * 1e9 - self.mtime_ns) < 1000
+
+
+def find_repository(path):
+    """Returns (working tree root, git directory) of the repository holding `path`, or None."""
+    current = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(current, ".git")
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git):
+            # Linked worktrees and submodules: '.git' is a file pointing at the git directory
+            try:
+                with open(dot_git, "r", encoding="utf-8") as fp:
+                    line = fp.readline().strip()
+            except OSError:
+                return None
+            if not line.startswith("gitdir:"):
+                return None
+            return current, os.path.normpath(os.path.join(current, line[len("gitdir:"):].strip()))
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def hash_size(git_dir):
+    """Length in bytes of the object IDs: 20 (SHA-1), or 32 for SHA-256 repositories."""
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r", encoding="utf-8") as fp:
+            common_dir = os.path.join(git_dir, fp.read().strip())
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(common_dir, "config"), "r", encoding="utf-8") as fp:
+            config = fp.read()
+    except OSError:
+        return 20
+    return 32 if re.search(r"^\s*objectformat\s*=\s*sha256\s*$", config, re.IGNORECASE | re.MULTILINE) else 20
+
+
+def _varint(data, pos):
+    """Decodes git's offset varint (index v4 path prefix lengths). Returns (value, next position)."""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def read_index(git_dir, prefixes=("",)):
+    """Returns {path: IndexEntry} of the merged (stage 0) entries whose path starts with one of
+    `prefixes` ('/'-separated, relative to the working tree root). Raises GitIndexError."""
+    try:
+        with open(os.path.join(git_dir, "index"), "rb") as fp:
+            data = fp.read()
+        profiling.count(profiling.BYTES_READ, len(data))
+    except OSError as e:
+        raise GitIndexError(f"Could not read the git index: {e}")
+    if len(data) < _HEADER.size:
+        raise GitIndexError("The git index is truncated.")
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != INDEX_SIGNATURE or version not in INDEX_VERSIONS:
+        raise GitIndexError(f"Unsupported git index (version {version}).")
+
+    oid_size = hash_size(git_dir)
+    wanted = tuple(p.encode("utf-8") for p in prefixes)
+    entries = {}
+    pos = _HEADER.size
+    path = b""
+    try:
+        for _ in range(count):
+            start = pos
+            stat = _STAT.unpack_from(data, pos)
+            pos += _STAT.size
+            blob = data[pos:pos + oid_size]
+            pos += oid_size
+            flags, = _FLAGS.unpack_from(data, pos)
+            pos += _FLAGS.size
+            xflags = 0
+            if flags & FLAG_EXTENDED:
+                xflags, = _FLAGS.unpack_from(data, pos)
+                pos += _FLAGS.size
+            if version == 4:
+                # Each path is stored as the number of bytes to drop from the previous one plus a suffix
+                strip, pos = _varint(data, pos)
+                end = data.index(b"\0", pos)
+                path = path[:len(path) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b"\0", pos)
+                path = data[pos:end]
+                # Entries are NUL-padded to a multiple of 8 bytes
+                pos = start + ((end - start + 8) & ~7)
+            if flags & FLAG_STAGE or xflags & XFLAG_INTENT_TO_ADD or not path.startswith(wanted):
+                continue
+            entries[path.decode("utf-8", "surrogateescape")] = IndexEntry(blob.hex(), stat[9], stat[2], stat[3])
+    except (struct.error, ValueError, IndexError):
+        raise GitIndexError("The git index is truncated or corrupt.")
+    return entries
@@ -0,0 +1,94 @@
+# Author: Erik van Gorsel
+# Single-pass userlib inventory
+#
+# The userlib folder is listed once with os.scandir. Every file becomes a
+# compact LibFile record holding the name details the engines need
+# (base name, normalized name, version key, size, mtime), so no stage has
+# to stat or re-parse a file name again. Module metadata files such as
+# 'poi-5.2.3.jar.ExcelImporter.RequiredLib' are linked to their JAR
+# through a prefix index built from the sorted file names.
+
+import os
+from bisect import bisect_left
+
+import utils
+import profiling
+
+
+class LibFile:
+    """One file in userlib with its precomputed name details."""
+    __slots__ = ("name", "is_jar", "base_name", "norm_name", "version", "version_key", "size", "mtime")
+
+    def __init__(self, name, size, mtime):
+        self.name = name
+        self.is_jar = name.endswith('.jar')
+        self.size = size
+        self.mtime = mtime
+        self.base_name, self.version = utils.get_jar_details(name)
+        self.norm_name = utils.normalize_lib_name(self.base_name)
+        self.version_key = utils.parse_version(self.version)
+
+    def __repr__(self):
+        return f"LibFile({self.name!r})"
+
+
+def is_scannable(name):
+    """Backup archives and folders inside userlib are never part of a scan."""
+    return not name.startswith('userlib_backup_') and not name.endswith('.zip')
+
+
+class UserlibInventory:
+    """All scannable files of a userlib folder, indexed by name and JAR prefix."""
+
+    def __init__(self, userlib_path, records):
+        self.userlib_path = userlib_path
+        self.records = {r.name: r for r in records}
+        self.files = [r.name for r in records]
+        self.jars = [r.name for r in records if r.is_jar]
+        self._sidecars = self._build_sidecar_index()
+
+    @classmethod
+    @profiling.timed("Inventory scan")
+    def scan(cls, userlib_path):
+        """Builds the inventory with a single directory listing."""
+        records = []
+        with os.scandir(userlib_path) as it:
+            for entry in it:
+                if not is_scannable(entry.name) or not entry.is_file():
+                    continue
+                st = entry.stat()
+                profiling.count(profiling.FILES_STATED)
+                records.append(LibFile(entry.name, st.st_size, st.st_mtime))
+        return cls(userlib_path, records)
+
+    def _build_sidecar_index(self):
+        """Maps each JAR to the files whose name starts with the full JAR name."""
+        ordered = sorted(self.files)
+        index = {}
+        for jar in self.jars:
+            pos = bisect_left(ordered, jar)
+            matches = []
+            while pos < len(ordered) and ordered[pos].startswith(jar):
+                if ordered[pos] != jar:
+                    matches.append(ordered[pos])
+                pos += 1
+            if matches:
+                index[jar] = tuple(matches)
+        return index
+
+    def __contains__(self, name):
+        return name in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, name):
+        return self.records.get(name)
+
+    def jar_records(self):
+        """Returns the LibFile records of all JARs, in listing order."""
+        return [self.records[j] for j in self.jars]
+
+    def sidecars(self, jar):
+        """Returns the metadata files ('.RequiredLib', '.Required', ...) that belong to a JAR."""
+        return self._sidecars.get(jar, ())
@@ -0,0 +1,160 @@
+# Author: Erik van Gorsel
+# Embedded JAR metadata (true artifact identity and version)
+#
+# File names lie: 'commons-lang3-3.12.0-jdk8.jar', 'log4j-1.2-api-2.17.1.jar'
+# or a renamed 'lang3.jar' say little about what is inside. Maven builds
+# record the real identity in META-INF/maven/<group>/<artifact>/pom.properties
+# and most JARs carry an Implementation-/Bundle-Version in their manifest.
+# Only those entries are read (zipdir.read_mapped_entries: a few KB per JAR),
+# in the same pass that collects the class entries for the deep scan
+# (deepscan.read_signature), so the engines get them without extra I/O.
+
+from collections import defaultdict
+
+import utils
+
+MANIFEST = "META-INF/MANIFEST.MF"
+MAVEN_PREFIX = "META-INF/maven/"
+POM_PROPERTIES = "/pom.properties"
+# Manifest attributes that carry a version, in order of preference
+VERSION_ATTRIBUTES = ("Implementation-Version", "Bundle-Version")
+
+
+class JarMetadata:
+    """Identity of one JAR as declared by its own metadata."""
+    __slots__ = ("group", "artifact", "version", "title")
+
+    def __init__(self, group=None, artifact=None, version=None, title=None):
+        self.group = group
+        self.artifact = artifact
+        self.version = version
+        self.title = title
+
+    @property
+    def coordinate(self):
+        """'groupId:artifactId', or None when the JAR has no (single) Maven identity."""
+        return f"{self.group}:{self.artifact}" if self.group and self.artifact else None
+
+    def __repr__(self):
+        return f"JarMetadata({self.coordinate or self.title!r}, {self.version!r})"
+
+
+def is_metadata_entry(name):
+    return name == MANIFEST or (name.startswith(MAVEN_PREFIX) and name.endswith(POM_PROPERTIES))
+
+
+def parse_properties(data):
+    """Parses the key=value lines of a pom.properties file."""
+    props = {}
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        line = line.strip()
+        if not line or line[0] in "#!":
+            continue
+        key, sep, value = line.partition("=")
+        if sep:
+            props[key.strip()] = value.strip()
+    return props
+
+
+def parse_manifest(data):
+    """Parses the main section of a MANIFEST.MF (continuation lines start with a space)."""
+    attributes = {}
+    key = None
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        if not line:
+            break
+        if line.startswith(" ") and key:
+            attributes[key] += line[1:]
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            key = None
+            continue
+        key = key.strip()
+        attributes[key] = value.strip()
+    return attributes
+
+
+def choose_identity(candidates, file_name=None):
+    """Picks the (groupId, artifactId) a JAR stands for among those it declares. A shaded JAR bundles the
+    pom.properties of every library inside it: then only an artifactId that names the file
+    ('<artifactId>-...' or '<artifactId>.jar') counts, the longest when several do ('poi-ooxml' over 'poi'
+    for poi-ooxml-5.2.3.jar). Returns None when no single candidate remains."""
+    candidates = set(candidates)
+    if len(candidates) == 1:
+        return next(iter(candidates))
+    if not file_name:
+        return None
+    name = file_name.rsplit("/", 1)[-1].lower()
+    named = [c for c in candidates if name.startswith(c[1].lower() + "-") or name == c[1].lower() + ".jar"]
+    if not named:
+        return None
+    longest = max(len(c[1]) for c in named)
+    named = [c for c in named if len(c[1]) == longest]
+    # Two groups shipping the same artifactId: no way to tell which one the file is
+    return named[0] if len(named) == 1 else None
+
+
+def from_entries(contents, file_name=None):
+    """Builds the JarMetadata from the manifest and pom.properties contents of one JAR.
+    Of several pom.properties (a shaded JAR), choose_identity decides which one is the JAR's own."""
+    poms = {}
+    for name, data in contents.items():
+        if name.endswith(POM_PROPERTIES):
+            props = parse_properties(data)
+            if props.get("groupId") and props.get("artifactId"):
+                poms.setdefault((props["groupId"], props["artifactId"]), props)
+    identity = choose_identity(poms, file_name)
+
+    manifest = parse_manifest(contents[MANIFEST]) if MANIFEST in contents else {}
+    manifest_version = next((manifest[a] for a in VERSION_ATTRIBUTES if manifest.get(a)), None)
+    title = manifest.get("Implementation-Title") or manifest.get("Bundle-SymbolicName", "").split(";")[0] or None
+
+    if identity is not None:
+        pom = poms[identity]
+        return JarMetadata(pom["groupId"], pom["artifactId"], pom.get("version") or manifest_version, title)
+    return JarMetadata(version=manifest_version, title=title)
+
+
+def version_key(record, metadata):
+    """The declared version when the JAR has one, else the one from its file name."""
+    if metadata is not None and metadata.version:
+        return utils.parse_version(metadata.version)
+    return record.version_key
+
+
+def group_name(record, meta):
+    """The normalized name a JAR's version group is filed under: its artifactId when it declares one,
+    else its file name. group_by_identity never puts JARs with different group names together."""
+    if meta is not None and meta.coordinate:
+        return utils.normalize_lib_name(meta.artifact)
+    return record.norm_name
+
+
+def group_by_identity(records, metadata):
+    """Groups JAR records that are versions of the same library: by groupId:artifactId when the JAR
+    declares it, else by normalized file name. A JAR without Maven metadata joins the coordinate
+    group whose artifactId normalizes to its name, so a stripped copy still meets its siblings."""
+    groups = defaultdict(list)
+    by_artifact = {}
+    unidentified = []
+    for rec in records:
+        meta = metadata.get(rec.name)
+        if meta is not None and meta.coordinate:
+            groups[meta.coordinate].append(rec)
+            by_artifact.setdefault(utils.normalize_lib_name(meta.artifact), meta.coordinate)
+        else:
+            unidentified.append(rec)
+    for rec in unidentified:
+        groups[by_artifact.get(rec.norm_name, rec.norm_name)].append(rec)
+    return groups
+
+
+def superseded(records, metadata):
+    """Maps the records of one group that a newer version makes redundant to the record that
+    supersedes them. JARs sharing the newest version (e.g. platform classifiers) are all kept."""
+    if len(records) < 2:
+        return {}
+    keyed = sorted(((version_key(r, metadata.get(r.name)), r) for r in records), key=lambda kr: kr[0])
+    newest, kept = keyed[-1]
+    return {r: kept for key, r in keyed if key < newest}
@@ -10,8 +10,6 @@
 import os
 import re
 import sys
-import sqlite3
-import json
 
 # --- Path Resolution & Module Loading ---
 # Detect if running as a PyInstaller frozen EXE
@@ -31,48 +29,30 @@ for path in [ENGINES_PATH, CORE_PATH]:
     if os.path.exists(path) and path not in sys.path:
         sys.path.insert(0, path)
 
-# Import Utilities and Engines
+# Import Utilities (engines are imported on selection, see load_engine)
 import utils
-import clean_userlib_mx11
-import clean_userlib_mx10
-import clean_userlib_mx9
-import clean_userlib_mx8
-import clean_userlib_mx7
+import profiling
+import routing
+from project import ProjectContext
 
-def get_mendix_version(project_root):
+# Engine registry: module name -> supported Studio Pro line. The version
+# ranges that select each engine live in config/MxVersions.txt.
+ENGINE_REGISTRY = {
+    "clean_userlib_mx11": "Mendix 11",
+    "clean_userlib_mx10": "Mendix 10",
+    "clean_userlib_mx9": "Mendix 9",
+    "clean_userlib_mx8": "Mendix 8",
+    "clean_userlib_mx7": "Mendix 7",
+}
+
+def get_mendix_version(project):
     """
     Extracts Mendix version using prioritized sources:
     1. .mpr metadata (Primary)
     2. settings.json (Fallback)
+    Accepts a ProjectContext (cached) or a project root path.
     """
-    # Source 1: .mpr (SQLite)
-    mpr_files = [f for f in os.listdir(project_root) if f.endswith('.mpr') and not f.endswith('.bak')]
-    if mpr_files:
-        mpr_path = os.path.join(project_root, mpr_files[0])
-        try:
-            conn = sqlite3.connect(f"file:{mpr_path}?mode=ro", uri=True)
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM _MetaData LIMIT 1")
-            row = cursor.fetchone()
-            if row:
-                v = row[0] if re.match(r'^\d+\.', str(row[0])) else row[1]
-                conn.close()
-                return str(v)
-            conn.close()
-        except:
-            pass
-
-    # Source 2: settings.json
-    settings_path = os.path.join(project_root, 'settings.json')
-    if os.path.exists(settings_path):
-        try:
-            with open(settings_path, 'r') as f:
-                data = json.load(f)
-                return data.get('MendixVersion') or data.get('modelerVersion')
-        except:
-            pass
-            
-    return None
+    return ProjectContext.of(project).version
 
 def normalize_version(v):
     """Strips suffixes like LTS, MTS and trims whitespace."""
@@ -83,106 +63,210 @@ def normalize_version(v):
     match = re.search(r'(\d+\.\d+(\.\d+)?)', v)
     return match.group(1) if match else v.strip()
 
-def parse_mx_versions(file_path):
-    """
-    Intelligently parses MxVersions.txt.
-    Supports ranges ('Range: X.X.X to Y.Y.Y') and list formats.
-    """
-    explicit_versions = set()
-    ranges = []
-    
-    if not os.path.exists(file_path):
-        return explicit_versions, ranges
-        
-    try:
-        with open(file_path, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#"):
-                    continue
-                
-                # Broad regex for Range detection: Range: START to END
-                range_match = re.search(r'Range:\s*([\d\.\-]+)\s+to\s+([\d\.\-]+)', line, re.IGNORECASE)
-                if range_match:
-                    try:
-                        start = utils.parse_version(normalize_version(range_match.group(1)))
-                        end = utils.parse_version(normalize_version(range_match.group(2)))
-                        ranges.append((start, end))
-                    except Exception as e:
-                        print(f"Note: Skipping invalid range format: {line}")
-                    continue
-
-                # Fallback: Extract anything that looks like a version number
-                version_matches = re.finditer(r'(\d+\.\d+\.\d+)', line)
-                for match in version_matches:
-                    explicit_versions.add(match.group(1))
-                    
-    except Exception as e:
-        print(f"Note: Error parsing MxVersions.txt: {e}")
-        
-    return explicit_versions, ranges
+def load_routing_table():
+    """Loads the engine routing table compiled from config/MxVersions.txt."""
+    return routing.load_table(os.path.join(RESOURCE_DIR, "config"))
 
-def is_valid_version(v, explicit_set, ranges):
+def is_valid_version(v, table=None):
     """Validates if a version exists in the reference list or falls within a range."""
     norm_v = normalize_version(v)
     if not norm_v: return False
-    
-    # 1. Check explicit list
-    if norm_v in explicit_set:
-        return True
-        
-    # 2. Check ranges
+    table = table or load_routing_table()
+    return table.contains(norm_v)
+
+def load_engine(engine_name):
+    """Returns the registered engine (its stage configuration in pipeline.ENGINES). None for unknown names."""
+    if engine_name not in ENGINE_REGISTRY:
+        return None
+    with profiling.phase("Engine import"):
+        import pipeline
+        return pipeline.ENGINES[engine_name]
+
+def select_engine(version_str, table=None):
+    """Maps a normalized Mendix version to its cleanup engine module (or None)."""
+    table = table or load_routing_table()
+    return load_engine(table.lookup(version_str))
+
+def positive_arg(flag, convert=float, kind=None):
+    """The value of a numeric flag (None when absent). Exits with an error unless it is a number above 0."""
+    value = utils.get_arg_value(flag)
+    if value is None:
+        return None
     try:
-        parsed_v = utils.parse_version(norm_v)
-        for start, end in ranges:
-            if start <= parsed_v <= end:
-                return True
-    except:
-        pass
-        
-    return False
+        number = convert(value)
+    except ValueError:
+        number = None
+    # 'not >' also rejects NaN
+    if number is None or not number > 0 or number == float('inf'):
+        kind = kind or ("a whole number" if convert is int else "a number")
+        utils.log_error(f"Invalid value for {flag}: '{value}' (expected {kind} greater than 0).")
+        sys.exit(1)
+    return number
+
+def retention_policy(default=False):
+    """The backup retention policy from --keep-last, --max-age (days) and --max-backup-size (e.g. 500MB).
+    Exits on an invalid value. None when no flag is given, unless `default` asks for the default policy."""
+    flags = ('--keep-last', '--max-age', '--max-backup-size')
+    if not default and all(utils.get_arg_value(flag) is None for flag in flags):
+        return None
+    import retention
+    keep_last = positive_arg('--keep-last', int)
+    return retention.RetentionPolicy(
+        keep_last=keep_last if keep_last is not None else retention.DEFAULT_KEEP_LAST,
+        max_age_days=positive_arg('--max-age'),
+        max_total_bytes=positive_arg('--max-backup-size', retention.parse_size, "a size (e.g. 500MB)"),
+    )
 
 # find_project_root moved to core/utils.py
 
 def main():
     print("Mendix Userlib Cleanup script is being executed...")
+
+    # Profiling: --profile prints per-phase timings at exit, --profile=run.pstats also dumps cProfile data
+    if '--profile' in sys.argv or any(a.startswith('--profile=') for a in sys.argv):
+        profiling.enable(utils.get_arg_value('--profile'))
+
+    # Decision trace: --trace out.jsonl streams one JSON event per decision (see tracing.py)
+    if '--trace' in sys.argv or any(a.startswith('--trace=') for a in sys.argv):
+        import tracing
+        trace_path = utils.get_arg_value('--trace')
+        if not trace_path:
+            utils.log_error("Usage: --trace out.jsonl")
+            sys.exit(1)
+        try:
+            tracing.enable(trace_path)
+        except OSError as e:
+            utils.log_error(f"Could not create the trace file {trace_path}: {e}")
+            sys.exit(1)
+    
+    # Deep scan: --deep-scan-timeout SECONDS bounds the wait for it, --no-cache skips the on-disk result cache
+    deep_scan_timeout = positive_arg('--deep-scan-timeout')
+    use_cache = '--no-cache' not in sys.argv
+
+    # Backup retention: checked before anything is moved, applied after a cleanup only when a flag asks for it
+    backup_retention = retention_policy(default='--prune' in sys.argv)
+
+    # CI gate: --check stops at the first redundancy no protection rule covers, --check=full reports all of them
+    check_mode = '--check' in sys.argv or any(a.startswith('--check=') for a in sys.argv)
+    plan_mode = '--plan' in sys.argv or any(a.startswith('--plan=') for a in sys.argv)
+    quick_check = check_mode and utils.get_arg_value('--check') != 'full' and not plan_mode
+
+    # Batch Mode: many projects, read-only, one combined exit code (never prompts)
+    if '--batch' in sys.argv:
+        import batch
+        targets = utils.get_arg_values('--batch') or [os.getcwd()]
+        exit_code = batch.run_batch(
+            targets,
+            max_workers=positive_arg('--workers', int),
+            report_path=utils.get_arg_value('--report'),
+            deep_scan_timeout=deep_scan_timeout,
+            use_cache=use_cache,
+        )
+        sys.exit(exit_code)
+    
+    # Daemon Mode: serve warm analyses to IDE plugins and hooks over localhost JSON-RPC
+    # (--daemon [--port N], --daemon=poll forces polling for file changes)
+    if '--daemon' in sys.argv or any(a.startswith('--daemon=') for a in sys.argv):
+        import daemon
+        port = positive_arg('--port', int)
+        if port is not None and port > 65535:
+            utils.log_error(f"Invalid value for --port: '{port}' (expected a port number up to 65535).")
+            sys.exit(1)
+        sys.exit(daemon.run_daemon(port or daemon.DEFAULT_PORT,
+                                   polling=utils.get_arg_value('--daemon') == 'poll'))
     
-    # Detect Path Context using standardized resolver
-    # Note: utils.resolve_paths handles finding the .mpr
-    project_root, userlib_path = utils.resolve_paths(__file__)
+    # Detect Path Context once; engines and backups share this context
+    ctx = ProjectContext.resolve(__file__)
     
-    if not project_root:
+    if ctx is None:
         utils.log_error("Could not find a Mendix project (.mpr file) in this directory or any parent directories.")
         print("Please run this tool from your Mendix project root folder.")
         sys.exit(1)
         
-    userlib_path = os.path.join(project_root, 'userlib')
+    userlib_path = ctx.userlib_path
+    ctx.retention = backup_retention
     
+    # Selective revert: --only "guava-*.jar,poi-4.1.2.jar" (names, globs or hashes)
+    only = [p.strip() for v in utils.get_arg_values('--only') for p in v.split(',') if p.strip()] or None
+
     # Custom Revert String: zipname --revert or --revert
     if len(sys.argv) >= 3 and sys.argv[2].lower() == "--revert":
         zip_to_revert = sys.argv[1]
         utils.log_header("Mendix Userlib Cleanup (Special Revert)")
-        utils.revert_files(userlib_path, specific_zip=zip_to_revert)
+        utils.revert_files(userlib_path, specific_zip=zip_to_revert, only=only)
         sys.exit(0)
 
     # Global Revert Check (Prioritized)
     if '--revert' in sys.argv:
         utils.log_header("Mendix Userlib Cleanup (Revert Mode)")
-        utils.revert_files(userlib_path)
+        utils.revert_files(userlib_path, only=only)
+        sys.exit(0)
+
+    # On-demand retention: --prune [--keep-last N] [--max-age DAYS] [--max-backup-size 500MB]
+    if '--prune' in sys.argv:
+        import retention
+        utils.log_header("Mendix Userlib Cleanup (Backup Retention)")
+        retention.print_report(retention.apply_policy(userlib_path, backup_retention))
+        sys.exit(0)
+
+    # Backup lookup: which backups hold a file (name, glob or hash)
+    if '--which' in sys.argv:
+        import catalog
+        pattern = utils.get_arg_value('--which', '*')
+        utils.log_header("Mendix Userlib Cleanup (Backup Lookup)")
+        hits = catalog.BackupCatalog.open(userlib_path).which(pattern)
+        for name, entry in hits:
+            print(f"  {entry['name']:<50} {name}")
+        if not hits:
+            utils.log_info(f"No backup holds a file matching '{pattern}'.")
         sys.exit(0)
     
+    # Pack moved-file backup folders (--backup=move) into uncompressed archives
+    if '--pack-backups' in sys.argv:
+        import backup
+        utils.log_header("Mendix Userlib Cleanup (Pack Backups)")
+        packed = backup.pack_all_backup_dirs(userlib_path)
+        for name in packed:
+            utils.log_success(f"Packed {name}")
+        if not packed:
+            utils.log_info("No backup folders to pack.")
+        sys.exit(0)
+
+    # Apply a plan written by --plan: no engine stage runs, the plan is checked against the project instead
+    if '--apply' in sys.argv:
+        import plan
+        utils.log_header("Mendix Userlib Cleanup (Apply Plan)")
+        plan_path = utils.get_arg_value('--apply')
+        if not plan_path:
+            utils.log_error("Usage: --apply plan.json")
+            sys.exit(1)
+        try:
+            exit_code = plan.apply_plan(ctx, plan_path, utils.get_arg_value('--backup', 'zip').lower())
+        finally:
+            ctx.close()
+        sys.exit(exit_code)
+
     utils.log_header("Mendix Userlib Cleanup Utility")
     print() 
     
     utils.log_info("Initializing cleanup process...")
     
+    # Start the deep scan now: it reads in the background during version detection, routing and engine import.
+    # The quick check starts it only when its probes find nothing.
+    ctx.use_cache = use_cache
+    if deep_scan_timeout is not None:
+        ctx.deep_scan_timeout = deep_scan_timeout
+    if not quick_check:
+        ctx.start_deep_scan()
+
     # 1. Detect Version
     utils.log_step(1, 5, "Detecting Mendix Studio Pro version...")
-    version_str = get_mendix_version(project_root)
+    with profiling.phase("Version detection"):
+        version_str = ctx.version
     
-    # Load reference data from the bundled config
-    config_dir = os.path.join(RESOURCE_DIR, "config")
-    explicit_set, ranges = parse_mx_versions(os.path.join(config_dir, "MxVersions.txt"))
+    # Load the engine routing table from the bundled config
+    with profiling.phase("Routing table"):
+        routing_table = load_routing_table()
     
     if version_str:
         utils.log_success(f"Detected Mendix version: {version_str}")
@@ -196,82 +280,63 @@ def main():
     # Final Validation & Normalization
     version_str = normalize_version(version_str)
     
-    # LTS Routing Logic
-    LTS_MAPPING = {
-        # 11 Series
-        "11.0.0": clean_userlib_mx11.run_cleanup,
-        # 10.24 LTS Series
-        "10.24.13": clean_userlib_mx10.run_cleanup,
-        "10.24.12": clean_userlib_mx10.run_cleanup,
-        "10.24.11": clean_userlib_mx10.run_cleanup,
-        "10.24.10": clean_userlib_mx10.run_cleanup,
-        "10.24.9": clean_userlib_mx10.run_cleanup,
-        "10.24.8": clean_userlib_mx10.run_cleanup,
-        "10.24.6": clean_userlib_mx10.run_cleanup,
-        "10.24.5": clean_userlib_mx10.run_cleanup,
-        "10.24.4": clean_userlib_mx10.run_cleanup,
-        "10.24.3": clean_userlib_mx10.run_cleanup,
-        "10.24.2": clean_userlib_mx10.run_cleanup,
-        "10.24.1": clean_userlib_mx10.run_cleanup,
-        "10.24.0": clean_userlib_mx10.run_cleanup,
-        # 9.24 LTS Series
-        "9.24.40": clean_userlib_mx9.run_cleanup,
-        "9.24.39": clean_userlib_mx9.run_cleanup,
-        "9.24.38": clean_userlib_mx9.run_cleanup,
-        "9.24.37": clean_userlib_mx9.run_cleanup,
-        "9.24.36": clean_userlib_mx9.run_cleanup,
-        "9.24.35": clean_userlib_mx9.run_cleanup,
-        "9.24.34": clean_userlib_mx9.run_cleanup,
-        # 8.18 LTS Series
-        "8.18.35": clean_userlib_mx8.run_cleanup,
-        "8.18.34": clean_userlib_mx8.run_cleanup
-    }
+    target_engine = select_engine(version_str, routing_table)
     
-    # Try exact match first, then prefix match
-    target_func = LTS_MAPPING.get(version_str)
-    
-    if not target_func:
-        for lts_ver, func in LTS_MAPPING.items():
-            if version_str.startswith(lts_ver):
-                target_func = func
-                break
-    
-    if not target_func:
-        try:
-            major = int(version_str.split('.')[0])
-            # Auto-assign for versions 7-11
-            if major == 7:
-                target_func = clean_userlib_mx7.run_cleanup
-            elif major == 8:
-                target_func = clean_userlib_mx8.run_cleanup
-            elif major == 9:
-                target_func = clean_userlib_mx9.run_cleanup
-            elif major == 10:
-                target_func = clean_userlib_mx10.run_cleanup
-            elif major == 11:
-                target_func = clean_userlib_mx11.run_cleanup
-            elif major > 11:
-                target_func = clean_userlib_mx11.run_cleanup
-            elif major < 7:
-                target_func = clean_userlib_mx7.run_cleanup
-        except:
-            pass
-    
-    if target_func:
-        utils.log_success(f"Matched cleanup engine: {target_func.__module__}")
+    if target_engine:
+        utils.log_success(f"Matched cleanup engine: {target_engine.__name__}")
+        import tracing
+        tracing.emit(tracing.RUN, project=ctx.root, engine=target_engine.__name__, version=version_str)
     else:
         utils.log_error(f"No suitable cleanup script could be assigned for version {version_str}")
         sys.exit(1)
-    
+
+    # Watch Mode: re-evaluate as Studio Pro adds or updates JARs (--watch, --watch=poll forces polling)
+    if '--watch' in sys.argv or any(a.startswith('--watch=') for a in sys.argv):
+        import watch
+        try:
+            exit_code = watch.run_watch(ctx, target_engine, polling=utils.get_arg_value('--watch') == 'poll')
+        finally:
+            ctx.close()
+        sys.exit(exit_code)
+
+    # Plan Mode: analyse once and write the removal plan for a later --apply (never prompts)
+    if plan_mode:
+        import plan
+        plan_path = utils.get_arg_value('--plan')
+        if not plan_path:
+            utils.log_error("Usage: --plan plan.json")
+            sys.exit(1)
+        try:
+            exit_code = plan.run_plan(ctx, target_engine, plan_path, check=check_mode)
+        finally:
+            ctx.close()
+        sys.exit(exit_code)
+
+    # Check Mode: answer the CI gate on the first unprotected redundancy (never prompts)
+    if quick_check:
+        import gitcheck
+        try:
+            exit_code = gitcheck.run_check(ctx, target_engine)
+        finally:
+            ctx.close()
+        sys.exit(exit_code)
+
     # Execute Targeted Engine directly
     try:
-        target_func()
+        target_engine.run_cleanup(ctx)
     except KeyboardInterrupt:
         utils.log_info("Operation cancelled by user.")
         sys.exit(1)
     except Exception as e:
         utils.log_error(f"Engine failure: {e}")
         sys.exit(1)
+    finally:
+        ctx.close()
 
 if __name__ == "__main__":
+    # Worker processes of the frozen (PyInstaller) binary re-enter here.
+    # Only they need multiprocessing, so normal starts skip its import.
+    if getattr(sys, 'frozen', False) and '--multiprocessing-fork' in sys.argv:
+        import multiprocessing
+        multiprocessing.freeze_support()
     main()
@@ -0,0 +1,67 @@
+# Author: Erik van Gorsel
+# Library name normalization rules
+#
+# The package prefixes, Marketplace module names and metadata markers used
+# to normalize library names live in config/LibNameRules.txt. They are
+# compiled once into two combined regular expressions:
+#   - the suffix matcher strips '.<Module>.RequiredLib' style metadata
+#     suffixes from a file name;
+#   - the name matcher strips a package prefix and a metadata suffix from
+#     a library base name in a single match.
+
+import re
+
+RULE_KINDS = ("prefix", "module", "marker")
+
+# Studio Pro's own metadata suffixes, used when no marker rules are configured
+DEFAULT_MARKERS = ("RequiredLib", "Required")
+
+
+def _alternation(values):
+    """Builds a non-capturing alternation; longest values first so they win."""
+    ordered = sorted(set(values), key=lambda v: (-len(v), v))
+    return "(?:" + "|".join(re.escape(v) for v in ordered) + ")"
+
+
+class NameRules:
+    """Compiled library-name normalization rules."""
+
+    def __init__(self, prefixes=(), modules=(), markers=()):
+        self.prefixes = tuple(prefixes)
+        self.modules = tuple(modules)
+        self.markers = tuple(markers) or DEFAULT_MARKERS
+
+        suffix = r"\." + _alternation(self.markers)
+        if self.modules:
+            suffix = r"(?:\." + _alternation(self.modules) + ")?" + suffix
+        prefix = "(?:" + _alternation(self.prefixes) + ")?" if self.prefixes else ""
+
+        self.suffix_re = re.compile(suffix + "$", re.IGNORECASE)
+        self.name_re = re.compile(
+            "^" + prefix + r"(?P<core>.*?)(?:" + suffix + ")?$",
+            re.IGNORECASE | re.DOTALL,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Parses a rules file. Raises OSError if it cannot be read."""
+        rules = {kind: [] for kind in RULE_KINDS}
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                kind, sep, value = line.partition(":")
+                kind, value = kind.strip().lower(), value.strip()
+                if not sep or kind not in rules or not value:
+                    raise ValueError(f"{path}:{line_no}: invalid rule '{line}'")
+                rules[kind].append(value)
+        return cls(rules["prefix"], rules["module"], rules["marker"])
+
+    def strip_suffix(self, filename):
+        """Removes a trailing '.<Module>.RequiredLib' / '.Required' metadata suffix."""
+        return self.suffix_re.sub("", filename, count=1)
+
+    def normalize(self, name):
+        """Lower-cases a library name and strips its package prefix and metadata suffix."""
+        return self.name_re.match(name.lower()).group("core")
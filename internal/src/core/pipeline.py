@@ -0,0 +1,626 @@
+# Author: Erik van Gorsel
+# Declarative stage pipeline
+#
+# The engines only differ in the findings they collect: Mendix 7 relies on
+# the deep scan alone, Mendix 8 and 9 add version grouping, and Mendix 10+
+# also match userlib against the managed vendorlib artifacts first. Each
+# engine is therefore a configuration (ENGINES): a list of finding stages
+# on top of one shared stage graph. Every stage declares the artifacts it
+# needs and the runner starts it as soon as they exist, so independent work
+# overlaps on a thread pool: the deep scan read, the vendorlib index, the
+# vendorlib class read and the protection rules. The vendorlib matches and
+# version groups are first found by file name alone while the deep scan
+# reads; once its signatures are in, only the JARs whose declared
+# coordinates, identity or version say otherwise are decided again. Artifacts the
+# ProjectContext already holds (e.g. seeded by watch mode) are reused, and
+# stages that no requested artifact depends on are skipped.
+#
+# The --check gate (Engine.check) first runs the finding stages that can
+# judge single JARs (vendorlib matches, version groups) on the few JARs
+# their names point at, and stops at the first confirmed redundancy that no
+# protection rule covers. Only when they find none does it run the deep scan.
+#
+# Watch mode (Engine.evaluate with the previous artifacts and a Delta) lets
+# stages with an update function re-evaluate only what a change can reach:
+# the vendorlib match of the changed JARs, the version groups they left or
+# joined, the deep scan findings among the JARs sharing a class with them,
+# and the class overlaps of the JARs whose state or verdict changed.
+
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import utils
+import tracing
+import profiling
+from project import ProjectContext
+
+
+class Stage:
+    """One step of the analysis: `func(ctx, inputs)` turns the `needs` artifacts into the artifact `name`.
+    Finding stages return {file name: detail}; `reason` turns a detail into the reason shown for the file.
+    A finding stage with a `probe(probe)` can also yield its findings one by one from single JARs (see check).
+    A stage with an `update(ctx, inputs, previous, delta)` can bring its previous artifact up to date."""
+    __slots__ = ("name", "needs", "func", "reason", "probe", "update")
+
+    def __init__(self, name, needs, func, reason=str, probe=None, update=None):
+        self.name = name
+        self.needs = tuple(needs)
+        self.func = func
+        self.reason = reason
+        self.probe = probe
+        self.update = update
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, needs={self.needs})"
+
+
+class Delta:
+    """What changed since the previous evaluation (watch mode): the userlib file names with the signatures
+    they had before (None when new or unreadable), and the relative paths of the changed vendorlib files."""
+
+    def __init__(self, userlib=None, vendorlib=()):
+        self.userlib = dict(userlib or {})
+        self.vendorlib = set(vendorlib)
+
+    def jars(self):
+        return {name for name in self.userlib if name.endswith(".jar")}
+
+    def groups(self, metadata):
+        """Names of the version groups the changed JARs left or joined (see jarmeta.group_name).
+        `metadata` maps the current file names to their JarMetadata."""
+        import jarmeta
+        import inventory
+        names = set()
+        for name in self.jars():
+            rec = inventory.LibFile(name, 0, 0)
+            old = self.userlib[name]
+            names.add(jarmeta.group_name(rec, old.metadata if old is not None else None))
+            names.add(jarmeta.group_name(rec, metadata.get(name)))
+        return names
+
+
+# --- Shared stages ---
+
+def _inventory(ctx, inputs):
+    return ctx.inventory()
+
+
+def _signatures(ctx, inputs):
+    return ctx.signatures()
+
+
+def _metadata(ctx, inputs):
+    return ctx.metadata()
+
+
+def _vendor_index(ctx, inputs):
+    return ctx.vendor_index()
+
+
+def _protector(ctx, inputs):
+    return utils.get_protection_matcher(ctx.root)
+
+
+@profiling.timed("Vendorlib classes")
+def _vendor_classes(ctx, inputs):
+    import classindex
+    if not os.path.isdir(ctx.vendorlib_path):
+        return {}
+    return classindex.read_vendorlib_classes(ctx.vendorlib_path)
+
+
+def _class_index(ctx, inputs):
+    import classindex
+    index = classindex.build_index(inputs['signatures'], vendor_classes=inputs['vendor_classes'])
+    ctx.seed(class_index=index)
+    return index
+
+
+def _partition(ctx, inputs):
+    candidates = inputs['candidates']
+    removable, protected = inputs['protector'].partition(candidates)
+    if tracing.ENABLED:
+        for name in sorted(protected):
+            tracing.emit(tracing.PROTECTED, name, rule=str(protected[name]), reason=candidates[name])
+        for name in sorted(removable):
+            tracing.emit(tracing.SELECTED, name, rule=candidates[name])
+    return removable, protected
+
+
+def _overlaps(ctx, inputs):
+    removable, _ = inputs['partition']
+    return utils.get_class_overlaps(ctx, removed=removable)
+
+
+def _update_overlaps(ctx, inputs, previous, delta):
+    """Only the pairs with a changed JAR, or one whose verdict changed, are computed again."""
+    import classindex
+    removable, _ = inputs['partition']
+    involving = delta.jars() | {f"{classindex.VENDORLIB}/{f}" for f in delta.vendorlib}
+    involving |= removable ^ previous['partition'][0]
+    return utils.get_class_overlaps(ctx, removed=removable, previous=previous['overlaps'], involving=involving)
+
+
+SHARED_STAGES = (
+    Stage("inventory", (), _inventory),
+    Stage("signatures", ("inventory",), _signatures),
+    Stage("metadata", ("signatures",), _metadata),
+    Stage("vendor_index", (), _vendor_index),
+    Stage("protector", (), _protector),
+    Stage("vendor_classes", (), _vendor_classes),
+    Stage("class_index", ("signatures", "vendor_classes"), _class_index),
+    Stage("partition", ("candidates", "protector"), _partition),
+    Stage("overlaps", ("partition", "class_index"), _overlaps, update=_update_overlaps),
+)
+
+
+# --- Finding stages ---
+
+def _name_matches(ctx, inputs):
+    """Userlib JARs whose normalized name vendorlib provides: {file name: managed artifact}.
+    Needs no deep scan; vendor_matches decides the JARs that declare coordinates again."""
+    records = inputs['inventory'].jar_records()
+    return {rec.name: artifact for rec, artifact in inputs['vendor_index'].match(records, ctx.userlib_path, ())}
+
+
+def _update_name_matches(ctx, inputs, previous, delta):
+    """Matches the names of the changed JARs again; all of them when vendorlib changed."""
+    if delta.vendorlib:
+        return _name_matches(ctx, inputs)
+    inv = inputs['inventory']
+    changed = delta.jars()
+    found = {name: artifact for name, artifact in previous['vendor_name_matches'].items() if name not in changed}
+    records = [inv.get(name) for name in sorted(changed) if name in inv]
+    found.update((rec.name, artifact) for rec, artifact in inputs['vendor_index'].match(records, ctx.userlib_path, ()))
+    return found
+
+
+def _declared_matches(ctx, inputs, name_matches, signatures):
+    """The name matches with every JAR that declares coordinates (in `signatures`) matched on those
+    instead, as VendorIndex.match does when vendorlib's SBOM lists coordinates."""
+    index = inputs['vendor_index']
+    found = dict(name_matches)
+    if index.by_coordinate:
+        inv = inputs['inventory']
+        declared = [inv.get(sig.file) for sig in signatures if sig.coordinates is not None and sig.file in inv]
+        for rec in declared:
+            found.pop(rec.name, None)
+        found.update((rec.name, artifact) for rec, artifact in index.match(declared, ctx.userlib_path, signatures))
+    for name in sorted(found):
+        _trace_vendor_match(name, found[name])
+    return found
+
+
+def _vendor_matches(ctx, inputs):
+    """Userlib JARs that vendorlib already provides: {file name: managed artifact}."""
+    found = _declared_matches(ctx, inputs, inputs['vendor_name_matches'], inputs['signatures'])
+    return {rec.name: found[rec.name] for rec in inputs['inventory'].jar_records() if rec.name in found}
+
+
+def _update_vendor_matches(ctx, inputs, previous, delta):
+    """Decides the changed JARs again; all of them when vendorlib changed (in memory, nothing is read)."""
+    if delta.vendorlib:
+        return _vendor_matches(ctx, inputs)
+    changed = delta.jars()
+    name_matches = inputs['vendor_name_matches']
+    found = {name: artifact for name, artifact in previous['vendor_matches'].items() if name not in changed}
+    found.update(_declared_matches(ctx, inputs, {n: name_matches[n] for n in changed if n in name_matches},
+                                   [sig for sig in inputs['signatures'] if sig.file in changed]))
+    return found
+
+
+def _group_versions(records, metadata, trace=True):
+    """{old file: newest file} over jarmeta.group_by_identity(records, metadata)."""
+    import jarmeta
+    found = {}
+    for identity, group in jarmeta.group_by_identity(records, metadata).items():
+        for old, kept in jarmeta.superseded(group, metadata).items():
+            if trace:
+                _trace_superseded(old.name, kept.name, identity)
+            found[old.name] = kept.name
+    return found
+
+
+def _regroup(inv, found, names, managed, metadata, trace=True):
+    """`found` with the version groups in `names` (see jarmeta.group_name) grouped again."""
+    import jarmeta
+    found = {old: kept for old, kept in found.items()
+             if old in inv and jarmeta.group_name(inv.get(old), metadata.get(old)) not in names}
+    remaining = [rec for rec in inv.jar_records()
+                 if rec.name not in managed and jarmeta.group_name(rec, metadata.get(rec.name)) in names]
+    found.update(_group_versions(remaining, metadata, trace))
+    return found
+
+
+def _name_groups(ctx, inputs):
+    """Older versions by file name alone: {file name: newest file}. Needs no deep scan; version_groups
+    groups again only where a JAR's declared identity or version says otherwise. JARs whose name
+    vendorlib provides are left out (unmanaged_name_groups)."""
+    managed = inputs.get('vendor_name_matches', {})
+    return _group_versions([rec for rec in inputs['inventory'].jar_records() if rec.name not in managed], {}, trace=False)
+
+
+def _update_name_groups(ctx, inputs, previous, delta):
+    """Regroups the file name groups of the changed JARs and of those whose vendorlib name match changed."""
+    import inventory
+    inv = inputs['inventory']
+    managed = inputs.get('vendor_name_matches', {})
+    before = previous.get('vendor_name_matches', {})
+    names = {inventory.LibFile(name, 0, 0).norm_name for name in delta.jars() | (managed.keys() ^ before.keys())}
+    artifact = 'unmanaged_name_groups' if 'vendor_name_matches' in inputs else 'name_groups'
+    return _regroup(inv, previous[artifact], names, managed, {}, trace=False)
+
+
+def _superseded(ctx, inputs):
+    """Older versions of a library (grouped on the declared groupId:artifactId and version, file name as
+    fallback): {file name: newest file}. JARs already matched in vendorlib are left out. The name-based
+    findings stand for every group no declared identity or version, nor a vendorlib match on
+    coordinates, touches; only the others are grouped again."""
+    import jarmeta
+    with profiling.phase("Version grouping"):
+        inv = inputs['inventory']
+        metadata = inputs['metadata']
+        managed = inputs.get('vendor_matches', {})
+        name_managed = inputs.get('vendor_name_matches', {})
+        by_name = inputs['unmanaged_name_groups'] if 'vendor_matches' in inputs else inputs['name_groups']
+        names = set()
+        keyed = []
+        for rec in inv.jar_records():
+            meta = metadata.get(rec.name)
+            key = jarmeta.group_name(rec, meta)
+            if (meta is not None and (meta.coordinate or meta.version)) or (rec.name in managed) != (rec.name in name_managed):
+                # The file name group it was judged in, and the group it belongs to
+                names.add(rec.norm_name)
+                names.add(key)
+            if rec.name not in managed:
+                keyed.append((key, rec))
+        # An untouched JAR's group is its file name group, whose members are all untouched as well
+        found = {old: kept for old, kept in by_name.items() if inv.get(old).norm_name not in names}
+        if tracing.ENABLED:
+            for old in sorted(found):
+                _trace_superseded(old, found[old], inv.get(old).norm_name)
+        found.update(_group_versions([rec for key, rec in keyed if key in names], metadata))
+        return found
+
+
+def _update_superseded(ctx, inputs, previous, delta):
+    """Regroups only the version groups the changed JARs (or those whose vendorlib match changed) belong to."""
+    import jarmeta
+    managed = inputs.get('vendor_matches', {})
+    metadata = inputs['metadata']
+    inv = inputs['inventory']
+    names = delta.groups(metadata)
+    for name in managed.keys() ^ previous.get('vendor_matches', {}).keys():
+        if name in inv:
+            names.add(jarmeta.group_name(inv.get(name), metadata.get(name)))
+    return _regroup(inv, previous['version_groups'], names, managed, metadata)
+
+
+def _trace_vendor_match(name, artifact):
+    tracing.emit(tracing.VENDORLIB_MATCH, name, rule=str(artifact), related=f"vendorlib/{artifact.file}" if artifact.file else None)
+
+
+def _trace_superseded(name, kept, identity):
+    tracing.emit(tracing.SUPERSEDED, name, rule=f"older version of {identity}", related=kept)
+
+
+def _deep_findings(ctx, inputs):
+    """JARs whose classes another JAR ships as well: {file name: reason}."""
+    inv = inputs['inventory']
+    return {f: reason for f, reason in utils.get_deep_scan_findings(ctx.userlib_path, ctx=ctx).items() if f in inv}
+
+
+def _update_deep_findings(ctx, inputs, previous, delta):
+    """Compares again only the JARs that share a class with a changed JAR (before or after the change):
+    every duplicate or container of such a JAR shares that class too, and no other finding can change."""
+    import deepscan
+    inv = inputs['inventory']
+    signatures = inputs['signatures']
+    by_file = {sig.file: sig for sig in signatures}
+    index = ctx.class_index()
+    reach = delta.jars()
+    for name in delta.jars():
+        for sig in (delta.userlib[name], by_file.get(name)):
+            for class_name in sig.classes if sig is not None else ():
+                reach.update(index.jars_with_class(class_name))
+
+    found = {f: reason for f, reason in previous['deep_findings'].items() if f not in reach and f in inv}
+    for f, reason in deepscan.find_redundant([sig for sig in signatures if sig.file in reach]).items():
+        if f in inv:
+            found[f] = reason
+    return {name: found[name] for name in sorted(found)}
+
+
+# --- Single-JAR probes (--check) ---
+
+class Probe:
+    """What the check gate knows about single JARs: their signatures (from the held deep scan, else
+    one targeted read per JAR) and the vendorlib artifact that provides them."""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.inv = ctx.inventory()
+        held = ctx.cached().get('signatures')
+        self.complete = held is not None
+        self._signatures = {sig.file: sig for sig in held or ()}
+        self._managed = {}
+
+    def signature(self, rec):
+        """The deep scan signature of one JAR, None when it is unreadable."""
+        if not self.complete and rec.name not in self._signatures:
+            import deepscan
+            self._signatures[rec.name] = deepscan.read_signature(self.ctx.userlib_path, rec)
+        return self._signatures.get(rec.name)
+
+    def managed(self, rec):
+        """The vendorlib artifact that provides this JAR, or None (decided as VendorIndex.match does)."""
+        if rec.name not in self._managed:
+            index = self.ctx.vendor_index()
+            # Coordinates only count when vendorlib declares them (SBOM); otherwise no JAR is read
+            sig = self.signature(rec) if index.by_coordinate else None
+            match = next(index.match([rec], self.ctx.userlib_path, [sig] if sig is not None else []), None)
+            self._managed[rec.name] = match[1] if match else None
+            if match:
+                _trace_vendor_match(rec.name, match[1])
+        return self._managed[rec.name]
+
+
+def _probe_vendor_matches(probe):
+    """Tests the JARs whose name vendorlib also ships. Coordinate-only matches are left to the full run."""
+    by_name = probe.ctx.vendor_index().by_name
+    for rec in sorted(probe.inv.jar_records(), key=lambda r: r.name):
+        if rec.norm_name in by_name:
+            artifact = probe.managed(rec)
+            if artifact is not None:
+                yield rec.name, artifact
+
+
+def _probe_version_groups(probe, unmanaged=False):
+    """Tests the JARs that share a normalized name. Only versions with the same declared identity (or both
+    without one) are compared, so every finding is one the full grouping makes as well."""
+    import jarmeta
+    by_name = defaultdict(list)
+    for rec in probe.inv.jar_records():
+        by_name[rec.norm_name].append(rec)
+    for norm_name in sorted(by_name):
+        records = by_name[norm_name]
+        if len(records) < 2:
+            continue
+        if unmanaged:
+            records = [rec for rec in records if probe.managed(rec) is None]
+        metadata = {}
+        by_identity = defaultdict(list)
+        for rec in records:
+            sig = probe.signature(rec)
+            meta = sig.metadata if sig is not None else None
+            if meta is not None:
+                metadata[rec.name] = meta
+            by_identity[meta.coordinate if meta is not None else None].append(rec)
+        for identity, group in by_identity.items():
+            for old, kept in sorted(jarmeta.superseded(group, metadata).items(), key=lambda ok: ok[0].name):
+                _trace_superseded(old.name, kept.name, identity or norm_name)
+                yield old.name, kept.name
+
+
+# Name-based first passes of the finding stages: they need no deep scan, so they run while it reads
+NAME_STAGES = (
+    Stage("vendor_name_matches", ("inventory", "vendor_index"), _name_matches, update=_update_name_matches),
+    Stage("name_groups", ("inventory",), _name_groups, update=_update_name_groups),
+    Stage("unmanaged_name_groups", ("inventory", "vendor_name_matches"), _name_groups, update=_update_name_groups),
+)
+
+VENDOR_MATCHES = Stage("vendor_matches", ("inventory", "vendor_index", "vendor_name_matches", "signatures"),
+                       _vendor_matches, reason=lambda artifact: f"managed in vendorlib as {artifact}",
+                       probe=_probe_vendor_matches, update=_update_vendor_matches)
+VERSION_GROUPS = Stage("version_groups", ("inventory", "name_groups", "metadata"), _superseded,
+                       reason=lambda kept: f"superseded by {kept}", probe=_probe_version_groups,
+                       update=_update_superseded)
+# Mendix 10+: versions are only compared among the JARs vendorlib does not manage
+UNMANAGED_VERSION_GROUPS = Stage("version_groups", ("inventory", "vendor_name_matches", "unmanaged_name_groups",
+                                                    "metadata", "vendor_matches"),
+                                 _superseded, reason=lambda kept: f"superseded by {kept}",
+                                 probe=lambda probe: _probe_version_groups(probe, unmanaged=True),
+                                 update=_update_superseded)
+DEEP_FINDINGS = Stage("deep_findings", ("inventory", "signatures"), _deep_findings, update=_update_deep_findings)
+
+
+def _candidates(findings):
+    """The stage that merges the findings (the first reason for a file wins) and adds their sidecars."""
+    def collect(ctx, inputs):
+        inv = inputs['inventory']
+        candidates = {}
+        for stage in findings:
+            for name, detail in inputs[stage.name].items():
+                candidates.setdefault(name, stage.reason(detail))
+        for jar in list(candidates):
+            for sidecar in inv.sidecars(jar):
+                if sidecar not in candidates:
+                    tracing.emit(tracing.SIDECAR, sidecar, rule="metadata of a redundant JAR", related=jar)
+                    candidates[sidecar] = f"metadata of {jar}"
+        return candidates
+    return Stage("candidates", ("inventory",) + tuple(s.name for s in findings), collect)
+
+
+# --- Runner ---
+
+def _run_stage(stage, ctx, inputs, stack, previous=None, delta=None):
+    with profiling.nested_in(stack), tracing.in_stage(stage.name):
+        if previous is not None and stage.update is not None:
+            return stage.update(ctx, inputs, previous, delta)
+        return stage.func(ctx, inputs)
+
+
+def run_stages(stages, ctx, targets, known=None, max_workers=None, previous=None, delta=None):
+    """Produces the `targets` artifacts. Each needed stage starts on the thread pool as soon as its
+    inputs exist; `known` artifacts are used as they are. With the `previous` artifacts and the Delta
+    since, stages that have an update function bring their previous artifact up to date instead.
+    Returns {artifact name: value}."""
+    artifacts = dict(known or {})
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name in needed or name in artifacts:
+            continue
+        needed.add(name)
+        pending.extend(stages[name].needs)
+
+    waiting = {name: set(stages[name].needs) - artifacts.keys() for name in needed}
+    stack = profiling.current_stack()
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while waiting or running:
+            for name in [n for n, deps in waiting.items() if not deps]:
+                del waiting[name]
+                stage = stages[name]
+                inputs = {n: artifacts[n] for n in stage.needs}
+                running[pool.submit(_run_stage, stage, ctx, inputs, stack, previous, delta)] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                artifacts[name] = future.result()
+                for deps in waiting.values():
+                    deps.discard(name)
+    return artifacts
+
+
+class Engine:
+    """A cleanup engine: a named configuration of finding stages over the shared stage graph.
+    Exposes the same analyze()/run_cleanup() interface as the engine modules did."""
+
+    def __init__(self, module_name, title, findings):
+        self.__name__ = module_name
+        self.title = title
+        self.findings = tuple(findings)
+        self.stages = {s.name: s for s in SHARED_STAGES + NAME_STAGES + self.findings + (_candidates(self.findings),)}
+
+    def __repr__(self):
+        return f"Engine({self.__name__!r})"
+
+    def analyze(self, ctx):
+        """Computes the redundant userlib files without modifying anything. Accepts a ProjectContext or a root path."""
+        return self.evaluate(ctx)[0]
+
+    def evaluate(self, ctx, previous=None, delta=None):
+        """analyze(), also returning the stage artifacts (None when no stage ran). Given the `previous`
+        artifacts and the Delta since, only what the change can reach is evaluated again (watch mode)."""
+        ctx = ProjectContext.of(ctx)
+        result = utils.new_cleanup_result(self.title)
+
+        if not os.path.exists(ctx.userlib_path):
+            utils.log_error("userlib folder not found.")
+            result['error'] = "userlib folder not found."
+            return result, None
+
+        # Single directory pass; every stage queries this index
+        inv = ctx.inventory()
+        result['total_scanned'] = len(inv)
+        result['jar_count'] = len(inv.jars)
+        if not inv.jars:
+            utils.log_info("Everything is clean! No JAR files found in userlib.")
+            return result, None
+
+        # The deep scan reads in the background (unless run_cleanup already started it)
+        ctx.start_deep_scan()
+        artifacts = run_stages(self.stages, ctx, ("partition", "overlaps"), known=ctx.cached(),
+                               previous=previous, delta=delta)
+        removable, protected = artifacts['partition']
+
+        if 'vendor_matches' in self.stages:
+            utils.log_info("Checking for managed dependencies in vendorlib...")
+            for name, artifact in artifacts['vendor_matches'].items():
+                utils.log_warning(f"Found in vendorlib: {name} (Managed as {artifact})")
+        if 'deep_findings' in self.stages:
+            utils.log_subheader("Running deep scan (signature-based analysis)")
+        utils.print_protected(protected)
+        # Classes still shipped twice (userlib and vendorlib) after this cleanup
+        utils.print_class_overlaps(artifacts['overlaps'])
+
+        result['to_remove'] = removable
+        result['reasons'] = artifacts['candidates']
+        result['protected'] = protected
+        result['overlaps'] = artifacts['overlaps']
+        return result, artifacts
+
+    def check(self, ctx):
+        """The CI gate: returns (file, reason) of the first redundant file no protection rule covers, else None.
+        Probing stages stop at their first confirmed finding; only when none holds are all findings computed
+        (without the class overlaps, which never decide the gate)."""
+        ctx = ProjectContext.of(ctx)
+        inv = ctx.inventory()
+        protector = utils.get_protection_matcher(ctx.root)
+        probe = Probe(ctx)
+        for stage in self.findings:
+            if stage.probe is None:
+                continue
+            with profiling.phase(f"Probe {stage.name}"), tracing.in_stage(f"{stage.name} probe"):
+                for name, detail in stage.probe(probe):
+                    reason = stage.reason(detail)
+                    for f in (name,) + tuple(inv.sidecars(name)):
+                        if f != name:
+                            tracing.emit(tracing.SIDECAR, f, rule="metadata of a redundant JAR", related=name)
+                            reason = f"metadata of {name}"
+                        rule = protector.match(f)
+                        if rule is None:
+                            tracing.emit(tracing.SELECTED, f, rule=reason)
+                            return f, reason
+                        tracing.emit(tracing.PROTECTED, f, rule=str(rule), reason=reason)
+
+        artifacts = run_stages(self.stages, ctx, ("partition",), known=ctx.cached())
+        removable, _ = artifacts['partition']
+        if not removable:
+            return None
+        name = min(removable)
+        return name, artifacts['candidates'][name]
+
+    def run_check(self, ctx):
+        """--check: reports the first unprotected redundancy. Returns the exit code."""
+        ctx = ProjectContext.of(ctx)
+        if not os.path.exists(ctx.userlib_path):
+            utils.log_error("userlib folder not found.")
+            return 1
+        with profiling.phase("Check"):
+            finding = self.check(ctx)
+        return self.report_check(finding)
+
+    def report_check(self, finding):
+        """Prints a check() outcome. Returns the exit code."""
+        if finding is None:
+            utils.log_divider()
+            utils.log_success(f"Everything is clean! No redundant libraries found by {self.title} scan.")
+            return 0
+        name, reason = finding
+        utils.log_error(f"Cleanup check failed: {name} is redundant ({reason}).")
+        utils.log_info("Run with --check=full to list every redundant file.")
+        return 1
+
+    def run_cleanup(self, ctx=None):
+        # Resolve the project using the standardized resolver unless the manager passed its context
+        if ctx is None:
+            ctx = ProjectContext.resolve(__file__)
+            if ctx is None:
+                utils.log_error("Could not find a Mendix project (.mpr file).")
+                return
+        ctx = ProjectContext.of(ctx)
+        # The deep scan runs in the background from here on, overlapping the other stages
+        ctx.start_deep_scan()
+
+        with profiling.phase("Analysis"):
+            result = self.analyze(ctx)
+        if result['error'] or not result['jar_count']:
+            return
+
+        with profiling.phase("Backup & cleanup"):
+            utils.handle_backup_and_cleanup(result['to_remove'], ctx.userlib_path, total_scanned=result['total_scanned'], engine_name=self.title, ctx=ctx)
+
+
+# Engine configurations by module name (the names config/MxVersions.txt routes to).
+# A new Studio Pro line that needs other stages is a new entry here.
+ENGINES = {
+    "clean_userlib_mx11": Engine("clean_userlib_mx11", "Mendix 11 Engine", (VENDOR_MATCHES, UNMANAGED_VERSION_GROUPS, DEEP_FINDINGS)),
+    "clean_userlib_mx10": Engine("clean_userlib_mx10", "Mendix 10 Engine", (VENDOR_MATCHES, UNMANAGED_VERSION_GROUPS, DEEP_FINDINGS)),
+    "clean_userlib_mx9": Engine("clean_userlib_mx9", "Mendix 9 Engine", (VERSION_GROUPS, DEEP_FINDINGS)),
+    "clean_userlib_mx8": Engine("clean_userlib_mx8", "Mendix 8 Engine", (VERSION_GROUPS, DEEP_FINDINGS)),
+    "clean_userlib_mx7": Engine("clean_userlib_mx7", "Mendix 7 Engine", (DEEP_FINDINGS,)),
+}
@@ -0,0 +1,202 @@
+# Author: Erik van Gorsel
+# Cleanup plans (--plan / --apply)
+#
+# A plan is the outcome of one analysis written to JSON: the files to
+# remove with the reason for each, the protected hits and class overlaps,
+# and a (size, mtime) fingerprint of every input the engines looked at
+# (the userlib files and the vendorlib JARs and SBOM) plus a digest of the
+# protection and name rules. --apply executes a plan without running any
+# engine stage again, so a CI pipeline analyses once in its check job and
+# applies in its deploy job. A plan is refused when any fingerprint no
+# longer matches: the analysis would be stale.
+
+import os
+import json
+from datetime import datetime
+
+import utils
+import profiling
+import vendorlib
+import protection
+
+PLAN_FORMAT = 2
+# Problems listed before a refused plan is summarized as '... and N more'
+PROBLEM_LIMIT = 10
+
+
+class PlanError(Exception):
+    """Raised when a plan file cannot be read or was written by another format version."""
+
+
+def fingerprint_userlib(inv):
+    """{file name: [size, mtime]} of every scannable userlib file."""
+    return {r.name: [r.size, r.mtime] for r in inv.records.values()}
+
+
+def fingerprint_vendorlib(vendorlib_path):
+    """{relative path: [size, mtime]} of the vendorlib JARs and its SBOM."""
+    prints = {}
+    if not os.path.isdir(vendorlib_path):
+        return prints
+    pending = [vendorlib_path]
+    while pending:
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.name.endswith(".jar") or entry.name == vendorlib.SBOM_NAME:
+                    st = entry.stat()
+                    rel_path = os.path.relpath(entry.path, vendorlib_path).replace(os.sep, "/")
+                    prints[rel_path] = [st.st_size, st.st_mtime]
+                profiling.count(profiling.FILES_STATED)
+    return prints
+
+
+def build_plan(ctx, result):
+    """Turns an engine's analyze() result into a plan document."""
+    inv = ctx.inventory()
+    remove = []
+    for name in sorted(result['to_remove']):
+        rec = inv.get(name)
+        remove.append({
+            'file': name,
+            'size': rec.size,
+            'mtime': rec.mtime,
+            'reason': result['reasons'].get(name, "redundant"),
+        })
+    return {
+        'format': PLAN_FORMAT,
+        'created': datetime.now().isoformat(timespec="seconds"),
+        'project': {
+            'root': ctx.root,
+            'mpr': os.path.basename(ctx.mpr_path) if ctx.mpr_path else None,
+            'version': ctx.version,
+        },
+        'engine': result['engine'],
+        'total_scanned': result['total_scanned'],
+        'remove': remove,
+        'protected': {f: str(rule) for f, rule in sorted(result['protected'].items())},
+        'overlaps': [o.to_dict() for o in result['overlaps']],
+        'unscanned': sorted(r.name for r in ctx.unscanned),
+        'inputs': {
+            'userlib': fingerprint_userlib(inv),
+            'vendorlib': fingerprint_vendorlib(ctx.vendorlib_path),
+            'rules': protection.rule_digests(ctx.root),
+        },
+    }
+
+
+def write_plan(path, document):
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump(document, fp, indent=2)
+
+
+def load_plan(path):
+    """Reads a plan file. Raises PlanError when it is missing, malformed or of another format."""
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            document = json.load(fp)
+    except (OSError, ValueError) as e:
+        raise PlanError(f"Could not read the plan {path}: {e}")
+    if not isinstance(document, dict) or document.get('format') != PLAN_FORMAT:
+        raise PlanError(f"{path} is not a cleanup plan of format {PLAN_FORMAT}.")
+    if not all(key in document for key in ('project', 'remove', 'inputs')):
+        raise PlanError(f"{path} is incomplete.")
+    return document
+
+
+def _compare(label, planned, current):
+    """Lists the files of one input folder that were added, removed or changed since the plan."""
+    problems = []
+    for name in sorted(planned.keys() | current.keys()):
+        before, now = planned.get(name), current.get(name)
+        if before is None:
+            problems.append(f"{label}/{name} was added")
+        elif now is None:
+            problems.append(f"{label}/{name} was removed")
+        elif list(now) != list(before):
+            problems.append(f"{label}/{name} changed (size or modification time)")
+    return problems
+
+
+def verify(ctx, document):
+    """Returns why the plan no longer matches the project (an empty list when it still does)."""
+    problems = []
+    project = document['project']
+    mpr = os.path.basename(ctx.mpr_path) if ctx.mpr_path else None
+    if project.get('mpr') != mpr:
+        problems.append(f"the plan was made for {project.get('mpr')}, not {mpr}")
+    elif project.get('version') != ctx.version:
+        problems.append(f"the Studio Pro version changed from {project.get('version')} to {ctx.version}")
+
+    inputs = document['inputs']
+    # Only plain userlib file names may be removed: a crafted path must not reach outside the folder
+    planned_userlib = inputs.get('userlib', {})
+    for entry in document['remove']:
+        name = entry.get('file') if isinstance(entry, dict) else None
+        if (not isinstance(name, str) or name not in planned_userlib or '..' in name
+                or any(sep in name for sep in ('/', '\\', os.sep))):
+            problems.append(f"{name!r} is not a file in userlib and cannot be removed")
+
+    problems += _compare("userlib", planned_userlib, fingerprint_userlib(ctx.inventory()))
+    problems += _compare("vendorlib", inputs.get('vendorlib', {}), fingerprint_vendorlib(ctx.vendorlib_path))
+    # A library protected (or a name rule changed) after the plan was made must not be removed by it
+    planned_rules = inputs.get('rules', {})
+    for label, digest in sorted(protection.rule_digests(ctx.root).items()):
+        if planned_rules.get(label) != digest:
+            problems.append(f"the rules in {label} changed")
+    return problems
+
+
+def run_plan(ctx, engine, path, check=False):
+    """Analyses the project with the selected engine and writes the plan. Returns the exit code:
+    1 on errors, or with `check` when the plan removes files."""
+    with profiling.phase("Analysis"):
+        result = engine.analyze(ctx)
+    if result['error']:
+        return 1
+
+    document = build_plan(ctx, result)
+    write_plan(path, document)
+    utils.log_success(f"Plan written to {path}: {len(document['remove'])} files to remove, "
+                      f"{len(document['protected'])} protected.")
+    if check and document['remove']:
+        utils.log_error(f"Cleanup check failed: Found {len(document['remove'])} redundant files.")
+        return 1
+    return 0
+
+
+def apply_plan(ctx, path, backup_mode='zip'):
+    """Executes a plan after checking its fingerprints. Returns the exit code."""
+    import backup
+    try:
+        document = load_plan(path)
+    except PlanError as e:
+        utils.log_error(str(e))
+        return 1
+    if backup_mode not in backup.BACKUP_MODES:
+        utils.log_error(f"Unknown backup mode '{backup_mode}'. Use --backup=zip, --backup=move or --backup=store.")
+        return 1
+
+    with profiling.phase("Plan verification"):
+        problems = verify(ctx, document)
+    if problems:
+        utils.log_error("The project changed since the plan was made. The plan was not applied:")
+        for problem in problems[:PROBLEM_LIMIT]:
+            print(f"  - {problem}")
+        if len(problems) > PROBLEM_LIMIT:
+            print(f"  ... and {len(problems) - PROBLEM_LIMIT} more")
+        utils.log_info("Create a new plan with --plan.")
+        return 1
+
+    remove = document['remove']
+    if not remove:
+        utils.log_success("Everything is clean! The plan removes no files.")
+        return 0
+
+    utils.log_subheader(f"Applying plan ({document.get('engine')}, {document.get('created')})")
+    for entry in remove:
+        print(f"  - {entry['file']}  [{entry['reason']}]")
+    if not utils.perform_cleanup({entry['file'] for entry in remove}, ctx.userlib_path, backup_mode, ctx=ctx):
+        return 1
+    return 0
@@ -0,0 +1,153 @@
+# Author: Erik van Gorsel
+# Per-phase timing and I/O accounting (--profile)
+#
+# Phases are wrapped in `with profiling.phase("name"):` blocks or the
+# @profiling.timed("name") decorator, and I/O is tallied with
+# profiling.count(). Everything is a cheap no-op until enable() is called.
+# At exit a summary table is printed and, when a path was given
+# (--profile=run.pstats), the cProfile statistics are dumped for pstats
+# or snakeviz.
+
+import sys
+import time
+import atexit
+import functools
+import threading
+from contextlib import contextmanager
+
+ENABLED = False
+
+# Well-known counters, printed in this order
+FILES_STATED = "files stat'ed"
+BYTES_READ = "bytes read"
+BYTES_WRITTEN = "bytes written"
+COUNTER_ORDER = (FILES_STATED, BYTES_READ, BYTES_WRITTEN)
+
+_lock = threading.Lock()
+_local = threading.local()
+_phases = {}
+_counters = {}
+_profiler = None
+_pstats_path = None
+_started = None
+
+
+def enable(pstats_path=None):
+    """Turns on phase timing; with a path, also runs cProfile and dumps its stats at exit."""
+    global ENABLED, _profiler, _pstats_path, _started
+    if ENABLED:
+        return
+    ENABLED = True
+    _started = time.perf_counter()
+    if pstats_path:
+        import cProfile
+        _pstats_path = pstats_path
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    atexit.register(report)
+
+
+@contextmanager
+def phase(name):
+    """Times a block. Nested phases are shown indented under their parent."""
+    if not ENABLED:
+        yield
+        return
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    key = tuple(stack) + (name,)
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        with _lock:
+            total, calls = _phases.get(key, (0.0, 0))
+            _phases[key] = (total + elapsed, calls + 1)
+
+
+def current_stack():
+    """The phases open in this thread (hand it to worker threads, see nested_in)."""
+    return tuple(getattr(_local, 'stack', ()))
+
+
+@contextmanager
+def nested_in(stack):
+    """Runs a worker thread's phases nested under the phases of the thread that started it."""
+    _local.stack = list(stack)
+    try:
+        yield
+    finally:
+        _local.stack = []
+
+
+def timed(name):
+    """Decorator form of phase()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1):
+    """Adds to an I/O counter (thread-safe)."""
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def _format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+def report():
+    """Prints the phase table and I/O counters; dumps cProfile stats if requested."""
+    import utils
+    global _profiler
+    if _profiler is not None:
+        _profiler.disable()
+        try:
+            _profiler.dump_stats(_pstats_path)
+        except OSError as e:
+            utils.log_warning(f"Could not write profile data: {e}")
+        _profiler = None
+
+    total = time.perf_counter() - _started
+    utils.log_subheader("Profile Summary")
+    print(f"  {'Phase':<44}{'Calls':>6}{'Time (ms)':>12}{'Share':>8}")
+    for key in sorted(_phases, key=_phase_order):
+        elapsed, calls = _phases[key]
+        label = "  " * (len(key) - 1) + key[-1]
+        share = (elapsed / total * 100) if total else 0
+        print(f"  {label:<44}{calls:>6}{elapsed * 1000:>12.1f}{share:>7.1f}%")
+    print(f"  {'Total (wall clock)':<44}{'':>6}{total * 1000:>12.1f}")
+
+    names = [n for n in COUNTER_ORDER if n in _counters] + sorted(n for n in _counters if n not in COUNTER_ORDER)
+    if names:
+        print()
+        for n in names:
+            value = _counters[n]
+            shown = _format_bytes(value) if n.startswith("bytes") else str(value)
+            print(f"  • {n:<26}{shown}")
+    if _pstats_path:
+        print(f"\n  cProfile data written to {_pstats_path} (python -m pstats {_pstats_path})")
+    sys.stdout.flush()
+
+
+def _phase_order(key):
+    """Sorts phases by first start, keeping children under their parent."""
+    return tuple(_first_seen.setdefault(key[:i + 1], len(_first_seen)) for i in range(len(key)))
+
+
+_first_seen = {}
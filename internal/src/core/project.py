@@ -0,0 +1,245 @@
+# Author: Erik van Gorsel
+# Project context
+#
+# Everything the tool needs to know about one Mendix project, discovered
+# once and shared by the manager, the engines and the backup code: the
+# project root (found with a single upward walk), the listing of that
+# folder, the .mpr path, the userlib/vendorlib paths, the Studio Pro
+# version, one read-only SQLite connection to the .mpr, the userlib
+# inventory, the deep scan signatures (read in the background, or taken
+# from the on-disk cache when the userlib is unchanged), the class index
+# and the vendorlib index. On network-mounted workspaces every avoided
+# listdir counts.
+
+import os
+import re
+import json
+
+MPR_SUFFIX = '.mpr'
+BACKUP_SUFFIX = '.bak'
+# Seconds an analysis waits for the deep scan before it goes on with the JARs read so far
+DEEP_SCAN_TIMEOUT = 300.0
+_UNSET = object()
+
+
+def is_mpr(name):
+    return name.endswith(MPR_SUFFIX) and not name.endswith(BACKUP_SUFFIX)
+
+
+class ProjectContext:
+    """One Mendix project. Expensive lookups are done on first use and cached."""
+
+    def __init__(self, root, listing=None):
+        self.root = os.path.abspath(root)
+        self.userlib_path = os.path.join(self.root, 'userlib')
+        self.vendorlib_path = os.path.join(self.root, 'vendorlib')
+        self._listing = listing
+        self._version = _UNSET
+        self._connection = None
+        self._inventory = None
+        self._vendor_index = None
+        self._signatures = None
+        self._signature_read = None
+        # Reads a deep scan timeout left running; they may still hold a JAR open
+        self._abandoned_reads = []
+        self._class_index = None
+        # Deep scan settings (the manager sets them from --deep-scan-timeout and --no-cache)
+        self.deep_scan_timeout = DEEP_SCAN_TIMEOUT
+        self.use_cache = True
+        # Backup retention after a cleanup (retention.RetentionPolicy); None leaves older backups alone
+        self.retention = None
+        self.unscanned = []
+
+    def __repr__(self):
+        return f"ProjectContext({self.root!r})"
+
+    @classmethod
+    def discover(cls, start_path):
+        """Walks up from start_path to the first folder holding an .mpr. Returns None if there is none."""
+        curr = os.path.abspath(start_path)
+        while True:
+            try:
+                listing = os.listdir(curr)
+            except OSError:
+                listing = []
+            if any(is_mpr(f) for f in listing):
+                # Keep the listing: the .mpr lookup and version detection reuse it
+                return cls(curr, listing)
+            parent = os.path.dirname(curr)
+            if parent == curr:
+                return None
+            curr = parent
+
+    @classmethod
+    def resolve(cls, script_file):
+        """Finds the project from the working directory, else from the script location."""
+        ctx = cls.discover(os.getcwd())
+        if ctx is None:
+            # If in 'src/engines' or 'src/core', go up 2 levels to find project root
+            script_dir = os.path.dirname(os.path.abspath(script_file))
+            ctx = cls.discover(os.path.dirname(os.path.dirname(script_dir)))
+        return ctx
+
+    @classmethod
+    def of(cls, project):
+        """Accepts a ProjectContext or a project root path."""
+        return project if isinstance(project, cls) else cls(project)
+
+    @property
+    def listing(self):
+        """Names in the project root (listed once)."""
+        if self._listing is None:
+            self._listing = os.listdir(self.root)
+        return self._listing
+
+    @property
+    def mpr_path(self):
+        mpr_files = [f for f in self.listing if is_mpr(f)]
+        return os.path.join(self.root, mpr_files[0]) if mpr_files else None
+
+    def connect(self):
+        """Returns the shared read-only SQLite connection to the .mpr."""
+        if self._connection is None:
+            import sqlite3
+            if not self.mpr_path:
+                raise FileNotFoundError("No .mpr file in the project root")
+            self._connection = sqlite3.connect(f"file:{self.mpr_path}?mode=ro", uri=True)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @property
+    def version(self):
+        """Studio Pro version from the .mpr metadata, else settings.json (cached, may be None)."""
+        if self._version is _UNSET:
+            self._version = self._read_mpr_version() or self._read_settings_version()
+        return self._version
+
+    def _read_mpr_version(self):
+        if not self.mpr_path:
+            return None
+        try:
+            row = self.connect().execute("SELECT * FROM _MetaData LIMIT 1").fetchone()
+        except Exception:
+            return None
+        if not row:
+            return None
+        return str(row[0] if re.match(r'^\d+\.', str(row[0])) else row[1])
+
+    def _read_settings_version(self):
+        if 'settings.json' not in self.listing:
+            return None
+        try:
+            with open(os.path.join(self.root, 'settings.json'), 'r') as f:
+                data = json.load(f)
+            return data.get('MendixVersion') or data.get('modelerVersion')
+        except Exception:
+            return None
+
+    def inventory(self):
+        """The userlib inventory, scanned once until invalidate() is called."""
+        if self._inventory is None:
+            import inventory
+            self._inventory = inventory.UserlibInventory.scan(self.userlib_path)
+        return self._inventory
+
+    def start_deep_scan(self):
+        """Starts reading the JAR signatures in the background (or takes them from the cache)."""
+        if self._signatures is not None or self._signature_read is not None:
+            return
+        if not os.path.isdir(self.userlib_path):
+            return
+        import deepscan
+        records = self.inventory().jar_records()
+        if self.use_cache:
+            import scancache
+            self._signatures = scancache.load(records)
+            if self._signatures is not None:
+                return
+        self._signature_read = deepscan.SignatureRead(self.userlib_path, records)
+
+    def signatures(self):
+        """Class signatures of the userlib JARs (deep scan), read once. When the scan does not
+        finish within deep_scan_timeout, the JARs read so far are used and the rest is listed in
+        `unscanned` (they are then judged by name only)."""
+        if self._signatures is None:
+            self.start_deep_scan()
+        if self._signature_read is not None:
+            import utils
+            import profiling
+            timeout = self.deep_scan_timeout
+            with profiling.phase("Signature read"):
+                signatures, self.unscanned = self._signature_read.result(timeout)
+            if self.unscanned:
+                self._abandoned_reads.append(self._signature_read)
+            self._signature_read = None
+            self._signatures = signatures
+            if self.unscanned:
+                utils.log_warning(f"Deep scan timed out after {timeout:g}s; {len(self.unscanned)} JARs "
+                                  f"were not scanned and are judged by name only.")
+            elif self.use_cache:
+                import scancache
+                scancache.save(self.inventory().jar_records(), signatures)
+        return self._signatures
+
+    def metadata(self):
+        """Declared identity and version of each userlib JAR ({file name: JarMetadata}), from the signature pass."""
+        return {sig.file: sig.metadata for sig in self.signatures() if sig.metadata is not None}
+
+    def class_index(self):
+        """Class index over the userlib and vendorlib JARs, built once from the signatures."""
+        if self._class_index is None:
+            import classindex
+            self._class_index = classindex.build_index(self.signatures(), self.vendorlib_path)
+        return self._class_index
+
+    def vendor_index(self):
+        """The vendorlib index (from vendorlib-sbom.json when current), built once."""
+        if self._vendor_index is None:
+            import vendorlib
+            self._vendor_index = vendorlib.VendorIndex.load(self.vendorlib_path)
+        return self._vendor_index
+
+    def seed(self, inventory=None, signatures=None, vendor_index=None, class_index=None):
+        """Supplies already known state (e.g. kept up to date by watch mode) instead of reading it."""
+        if inventory is not None:
+            self._inventory = inventory
+        if signatures is not None:
+            self._signatures = signatures
+        if vendor_index is not None:
+            self._vendor_index = vendor_index
+        if class_index is not None:
+            self._class_index = class_index
+        return self
+
+    def cached(self):
+        """The expensive artifacts already held ({'inventory', 'signatures', 'vendor_index', 'class_index'})."""
+        held = {
+            'inventory': self._inventory,
+            'signatures': self._signatures,
+            'vendor_index': self._vendor_index,
+            'class_index': self._class_index,
+        }
+        return {name: value for name, value in held.items() if value is not None}
+
+    def wait_for_reads(self):
+        """Waits until no background deep scan read holds a userlib JAR open: the reads a timeout left
+        running, or a scan still in progress (whose result is then dropped). Call before moving files;
+        Windows refuses to move a file another thread has open."""
+        reads = self._abandoned_reads + ([self._signature_read] if self._signature_read is not None else [])
+        for read in reads:
+            read.close()
+        self._abandoned_reads = []
+        self._signature_read = None
+
+    def invalidate(self):
+        """Forgets cached folder contents after files were moved in or out."""
+        self._inventory = None
+        self._signatures = None
+        self._signature_read = None
+        self._class_index = None
+        self._listing = None
+        self.unscanned = []
@@ -0,0 +1,209 @@
+# Author: Erik van Gorsel
+# Protected-library matcher
+#
+# Rules come from the bundled config/ProtectedLibs.txt and an optional
+# ProtectedLibs.txt in the project root. All literal rules (contains,
+# prefix, exact) are compiled into one Aho-Corasick automaton, so a file
+# name is checked against every rule in a single pass over its characters.
+# Glob rules share one combined regular expression and Maven coordinates
+# are a dictionary lookup on the JAR's base name.
+
+import os
+import re
+import hashlib
+import fnmatch
+from collections import deque
+
+import utils
+import profiling
+
+RULE_KINDS = ("contains", "prefix", "exact", "glob", "maven")
+PROTECTION_FILE = "ProtectedLibs.txt"
+
+
+def protection_files(project_root=None):
+    """{label: path} of the ProtectedLibs.txt files that apply to a project: built-in and project."""
+    paths = {"config/" + PROTECTION_FILE: os.path.join(utils.CONFIG_DIR, PROTECTION_FILE)}
+    if project_root:
+        paths["project/" + PROTECTION_FILE] = os.path.join(project_root, PROTECTION_FILE)
+    return paths
+
+
+def rule_digests(project_root=None):
+    """{label: digest} of the rule files a verdict depends on besides the JARs: the built-in and
+    project ProtectedLibs.txt and LibNameRules.txt. A missing file digests as '-'."""
+    paths = protection_files(project_root)
+    paths["config/" + utils.NAME_RULES_FILE] = os.path.join(utils.CONFIG_DIR, utils.NAME_RULES_FILE)
+    digests = {}
+    for label, path in sorted(paths.items()):
+        try:
+            with open(path, "rb") as fp:
+                digests[label] = hashlib.blake2b(fp.read(), digest_size=20).hexdigest()
+        except OSError:
+            digests[label] = "-"
+    return digests
+
+
+class ProtectionRule:
+    """A single protection rule and where it was defined."""
+    __slots__ = ("kind", "pattern", "source", "order")
+
+    def __init__(self, kind, pattern, source, order=0):
+        self.kind = kind
+        self.pattern = pattern
+        self.source = source
+        self.order = order
+
+    def __str__(self):
+        return f"{self.kind} '{self.pattern}' ({self.source})"
+
+    def __repr__(self):
+        return f"ProtectionRule({self.kind!r}, {self.pattern!r}, {self.source!r})"
+
+
+def parse_rules(path, source):
+    """Reads a protection rules file. A line without a kind is a 'contains' rule."""
+    rules = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            kind, sep, pattern = line.partition(":")
+            kind = kind.strip().lower()
+            if not sep or kind not in RULE_KINDS:
+                # Bare patterns (and Maven coordinates without a kind) are substrings
+                kind, pattern = "contains", line
+            pattern = pattern.strip()
+            if not pattern:
+                raise ValueError(f"{path}:{line_no}: empty pattern")
+            if kind == "maven" and pattern.count(":") != 1:
+                raise ValueError(f"{path}:{line_no}: expected groupId:artifactId, got '{pattern}'")
+            rules.append(ProtectionRule(kind, pattern, source))
+    return rules
+
+
+class _Automaton:
+    """Aho-Corasick automaton over lower-cased literal patterns."""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        for text, payload in patterns:
+            state = 0
+            for ch in text:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append(payload)
+
+        # Breadth-first construction of failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                if self.fail[nxt] == nxt:
+                    self.fail[nxt] = 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter_matches(self, text):
+        """Yields (end_index, payload) for every pattern occurrence in text."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for payload in out[state]:
+                yield i, payload
+
+
+class ProtectionMatcher:
+    """Compiled set of protection rules. match() reports the rule that protects a file."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        for order, rule in enumerate(self.rules):
+            rule.order = order
+
+        literals = [(r.pattern.lower(), r) for r in self.rules if r.kind in ("contains", "prefix", "exact")]
+        self._automaton = _Automaton(literals) if literals else None
+
+        globs = [r for r in self.rules if r.kind == "glob"]
+        self._glob_rules = globs
+        self._glob_re = None
+        if globs:
+            combined = "|".join(f"(?P<g{i}>{fnmatch.translate(r.pattern.lower())})" for i, r in enumerate(globs))
+            self._glob_re = re.compile(combined)
+
+        self._maven = {}
+        for r in self.rules:
+            if r.kind == "maven":
+                group, artifact = (p.strip().lower() for p in r.pattern.split(":"))
+                for key in (artifact, f"{group}.{artifact}"):
+                    self._maven.setdefault(key, r)
+
+    @classmethod
+    def load(cls, project_root=None):
+        """Loads the built-in rules plus the project's own ProtectedLibs.txt, if present."""
+        rules = []
+        if project_root:
+            project_file = os.path.join(project_root, PROTECTION_FILE)
+            if os.path.exists(project_file):
+                rules.extend(parse_rules(project_file, "project"))
+        rules.extend(parse_rules(os.path.join(utils.CONFIG_DIR, PROTECTION_FILE), "built-in"))
+        return cls(rules)
+
+    def match(self, filename):
+        """Returns the ProtectionRule that protects filename, or None."""
+        name = filename.lower()
+        best = None
+
+        if self._automaton:
+            for end, rule in self._automaton.iter_matches(name):
+                if best is not None and rule.order >= best.order:
+                    continue
+                start = end - len(rule.pattern) + 1
+                if rule.kind == "contains":
+                    best = rule
+                elif start == 0 and (rule.kind == "prefix" or end == len(name) - 1):
+                    best = rule
+
+        if self._glob_re:
+            m = self._glob_re.match(name)
+            if m:
+                rule = self._glob_rules[int(m.lastgroup[1:])]
+                if best is None or rule.order < best.order:
+                    best = rule
+
+        if self._maven:
+            rule = self._maven.get(utils.get_jar_details(filename)[0].lower())
+            if rule and (best is None or rule.order < best.order):
+                best = rule
+
+        return best
+
+    @profiling.timed("Protection filter")
+    def partition(self, files):
+        """Splits files into (removable set, {protected file: rule})."""
+        removable = set()
+        protected = {}
+        for f in files:
+            rule = self.match(f)
+            if rule is None:
+                removable.add(f)
+            else:
+                protected[f] = rule
+        return removable, protected
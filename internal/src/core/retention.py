@@ -0,0 +1,180 @@
+# Author: Erik van Gorsel
+# Backup retention and compaction
+#
+# Keeps userlib/userlib_backup/ from growing forever. A policy combines:
+#   - keep-last N:      the N most recent backups stay as they are; older
+#                       ones are compacted into one consolidated archive in
+#                       which every file appears once (latest copy wins);
+#   - max-age DAYS:     backups older than this are deleted;
+#   - max-size BYTES:   the oldest backups are deleted until the folder fits
+#                       the budget (the most recent backup is always kept).
+# The policy runs after a cleanup when one of its flags is given, and on
+# demand with --prune (which keeps the last 5 unless told otherwise).
+
+import os
+import re
+import time
+import shutil
+import zipfile
+from datetime import datetime
+
+import utils
+import backup
+
+DEFAULT_KEEP_LAST = 5
+COMPACTED_SUFFIX = backup.COMPACTED_SUFFIX
+TIMESTAMP_RE = re.compile(r'userlib_backup_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2})')
+SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*$', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+class RetentionPolicy:
+    """Retention settings. None disables a limit."""
+
+    def __init__(self, keep_last=DEFAULT_KEEP_LAST, max_age_days=None, max_total_bytes=None):
+        self.keep_last = keep_last
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+
+
+def parse_size(text):
+    """Parses '1048576', '500MB' or '2G' into bytes."""
+    match = SIZE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def backup_time(backup_folder, name):
+    """Creation time of a backup, from its name or else its modification time."""
+    match = TIMESTAMP_RE.match(name)
+    if match:
+        return datetime.strptime(match.group(1), "%Y-%m-%d_%H-%M").timestamp()
+    return os.path.getmtime(os.path.join(backup_folder, name))
+
+
+def folder_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
+
+
+def delete_backup(backup_folder, name):
+    path = os.path.join(backup_folder, name)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+def _iter_backup_files(backup_folder, name, zip_cache):
+    """Yields (file name, opener) for every file in a backup."""
+    path = os.path.join(backup_folder, name)
+    if os.path.isdir(path):
+        for f in sorted(os.listdir(path)):
+            if f != backup.MANIFEST_NAME:
+                yield f, lambda p=os.path.join(path, f): open(p, 'rb')
+    elif name.endswith(backup.RUN_SUFFIX):
+        for e in backup.read_run(backup_folder, name)['files']:
+            yield e['name'], lambda p=backup.object_path(backup_folder, e['sha256']): open(p, 'rb')
+    else:
+        zf = zip_cache.setdefault(name, zipfile.ZipFile(path, 'r'))
+        for info in zf.infolist():
+            if info.filename != backup.MANIFEST_NAME and not info.is_dir():
+                yield info.filename, lambda i=info, z=zf: z.open(i)
+
+
+def compact_backups(backup_folder, names):
+    """Merges backups (oldest first) into one STORED archive. Returns its name."""
+    latest = {}
+    zip_cache = {}
+    try:
+        for name in names:
+            for file_name, opener in _iter_backup_files(backup_folder, name, zip_cache):
+                # Later backups overwrite earlier copies: one entry per file
+                latest[file_name] = opener
+
+        stem = backup._backup_stem(names[-1])
+        if stem.endswith(COMPACTED_SUFFIX):
+            stem = stem[:-len(COMPACTED_SUFFIX)]
+        target_name = stem + COMPACTED_SUFFIX + '.zip'
+        target_path = os.path.join(backup_folder, target_name)
+        tmp_path = target_path + '.tmp'
+
+        # The archive takes the place of the newest merged backup in the order
+        sequence = max((backup.read_sequence(backup_folder, n) or 0 for n in names), default=0)
+        manifest = [
+            "Mendix Userlib Cleanup Manifest (compacted)",
+            f"Merged backups: {len(names)}",
+        ] + ([f"Sequence: {sequence}"] if sequence else []) + [f" * {n}" for n in names] + ["\n--- Files ---"] + [f" - {f}" for f in sorted(latest)]
+
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as out:
+            out.writestr(backup.MANIFEST_NAME, "\n".join(manifest))
+            for file_name in sorted(latest):
+                with latest[file_name]() as src, out.open(file_name, 'w', force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, backup.HASH_CHUNK)
+    finally:
+        for zf in zip_cache.values():
+            zf.close()
+
+    for name in names:
+        if name != target_name:
+            delete_backup(backup_folder, name)
+    os.replace(tmp_path, target_path)
+    return target_name
+
+
+def apply_policy(userlib_path, policy):
+    """Applies the retention policy. Returns a dict with the deleted and compacted backups."""
+    import catalog
+    backup_folder = backup.get_backup_folder(userlib_path)
+    report = {'deleted': [], 'compacted': [], 'compacted_into': None, 'freed_bytes': 0}
+    if not os.path.exists(backup_folder):
+        return report
+
+    size_before = folder_size(backup_folder)
+    backups = backup.list_backups(backup_folder)
+
+    # 1. Max age
+    if policy.max_age_days is not None and backups:
+        cutoff = time.time() - policy.max_age_days * 86400
+        for name in backups[:-1]:
+            if backup_time(backup_folder, name) < cutoff:
+                delete_backup(backup_folder, name)
+                report['deleted'].append(name)
+        backups = backup.list_backups(backup_folder)
+
+    # 2. Keep last N, compact the rest
+    if policy.keep_last is not None and len(backups) > policy.keep_last:
+        older = backups[:len(backups) - max(policy.keep_last, 0)]
+        if len(older) > 1 or not older[0].endswith(COMPACTED_SUFFIX + '.zip'):
+            report['compacted_into'] = compact_backups(backup_folder, older)
+            report['compacted'] = older
+        backups = backup.list_backups(backup_folder)
+
+    # 3. Size budget: drop the oldest backups first
+    if policy.max_total_bytes is not None:
+        backup.collect_garbage(backup_folder)
+        while len(backups) > 1 and folder_size(backup_folder) > policy.max_total_bytes:
+            oldest = backups.pop(0)
+            delete_backup(backup_folder, oldest)
+            backup.collect_garbage(backup_folder)
+            report['deleted'].append(oldest)
+
+    backup.collect_garbage(backup_folder)
+    report['freed_bytes'] = max(size_before - folder_size(backup_folder), 0)
+    catalog.BackupCatalog.open(userlib_path)
+    return report
+
+
+def print_report(report, verbose=True):
+    if report['compacted_into']:
+        utils.log_success(f"Compacted {len(report['compacted'])} older backups into {report['compacted_into']}")
+    for name in report['deleted']:
+        utils.log_success(f"Deleted backup {name}")
+    if report['compacted_into'] or report['deleted']:
+        utils.log_success(f"Backup folder reduced by {report['freed_bytes'] / (1024 * 1024):.1f} MB")
+    elif verbose:
+        utils.log_info("Backups are within the retention policy. Nothing to do.")
@@ -0,0 +1,193 @@
+# Author: Erik van Gorsel
+# Engine routing table
+#
+# config/MxVersions.txt is compiled into sorted, non-overlapping version
+# intervals that each point to a cleanup engine; a version is routed with
+# one bisect lookup. The compiled table is serialized to
+# config/MxVersions.routing.json at build time, so a normal start only
+# hashes the text file instead of parsing it. Running this module directly
+# (re)builds that file.
+
+import os
+import re
+import sys
+import json
+import hashlib
+from bisect import bisect_right
+
+SOURCE_FILE = "MxVersions.txt"
+COMPILED_FILE = "MxVersions.routing.json"
+FORMAT_VERSION = 1
+
+RANGE_RE = re.compile(r'Range:\s*([\d\.\-]+)\s+to\s+([\d\.\-]+)(?:\s*=>\s*(\w+))?', re.IGNORECASE)
+OLDER_RE = re.compile(r'^Older:\s*(\w+)\s*$', re.IGNORECASE)
+VERSION_RE = re.compile(r'(\d+\.\d+\.\d+)')
+MAJOR_RE = re.compile(r'^\d+$')
+
+_TABLES = {}
+
+
+def version_key(v):
+    """Returns a (major, minor, patch) tuple for the first version number in v, or None.
+    A bare major version ("10", as typed at the version prompt) counts as major.0.0."""
+    text = str(v or "").strip()
+    if MAJOR_RE.match(text):
+        return (int(text), 0, 0)
+    match = re.search(r'(\d+)\.(\d+)(?:\.(\d+))?', text)
+    if not match:
+        return None
+    return (int(match.group(1)), int(match.group(2)), int(match.group(3) or 0))
+
+
+class RoutingTable:
+    """Sorted version intervals mapped to engine module names."""
+
+    def __init__(self, intervals, explicit=None, older=None, source_sha1=None):
+        self.intervals = sorted(intervals)
+        self.starts = [start for start, _, _ in self.intervals]
+        self.explicit = dict(explicit or {})
+        self.older = older
+        self.source_sha1 = source_sha1
+
+        for prev, cur in zip(self.intervals, self.intervals[1:]):
+            if cur[0] <= prev[1]:
+                raise ValueError(f"Overlapping version ranges: {prev[:2]} and {cur[:2]}")
+
+    def _find(self, key):
+        """Returns (interval index, inside) for the interval at or below key."""
+        idx = bisect_right(self.starts, key) - 1
+        if idx < 0:
+            return None, False
+        return idx, key <= self.intervals[idx][1]
+
+    def lookup(self, version):
+        """Returns the engine name for a version, or None."""
+        key = version_key(version)
+        if key is None:
+            return None
+        if key in self.explicit:
+            return self.explicit[key]
+        idx, _ = self._find(key)
+        if idx is None:
+            return self.older
+        # Inside a range, or in the gap above it: newer patches of the same series
+        return self.intervals[idx][2]
+
+    def contains(self, version):
+        """True if the version is listed explicitly or falls inside a listed range."""
+        key = version_key(version)
+        if key is None:
+            return False
+        if key in self.explicit:
+            return True
+        return self._find(key)[1]
+
+    def engines(self):
+        """All engine names referenced by the table."""
+        names = {engine for _, _, engine in self.intervals}
+        names.update(self.explicit.values())
+        if self.older:
+            names.add(self.older)
+        return sorted(names)
+
+    def to_dict(self):
+        return {
+            'format': FORMAT_VERSION,
+            'source_sha1': self.source_sha1,
+            'older': self.older,
+            'intervals': [[list(start), list(end), engine] for start, end, engine in self.intervals],
+            'explicit': [[list(key), engine] for key, engine in sorted(self.explicit.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        intervals = [(tuple(start), tuple(end), engine) for start, end, engine in data['intervals']]
+        explicit = {tuple(key): engine for key, engine in data['explicit']}
+        return cls(intervals, explicit, data.get('older'), data.get('source_sha1'))
+
+
+def parse_source(text, source_sha1=None):
+    """Parses the MxVersions.txt format into a RoutingTable."""
+    intervals = []
+    explicit = {}
+    older = None
+    last_engine = None
+
+    for line_no, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        older_match = OLDER_RE.match(line)
+        if older_match:
+            older = older_match.group(1)
+            continue
+
+        range_match = RANGE_RE.search(line)
+        if range_match:
+            start, end = version_key(range_match.group(1)), version_key(range_match.group(2))
+            engine = range_match.group(3) or last_engine
+            if start is None or end is None or start > end or not engine:
+                print(f"Note: Skipping invalid range format (line {line_no}): {line}")
+                continue
+            intervals.append((start, end, engine))
+            last_engine = engine
+            continue
+
+        versions, _, engine = line.partition("=>")
+        engine = engine.strip() or None
+        for match in VERSION_RE.finditer(versions):
+            key = version_key(match.group(1))
+            # Versions listed without an engine are routed by their range
+            if engine:
+                explicit[key] = engine
+
+    return RoutingTable(intervals, explicit, older, source_sha1)
+
+
+def _read_source(config_dir):
+    with open(os.path.join(config_dir, SOURCE_FILE), 'rb') as f:
+        data = f.read()
+    return data, hashlib.sha1(data).hexdigest()
+
+
+def compile_table(config_dir):
+    """Parses MxVersions.txt and writes the precompiled routing table next to it."""
+    data, sha1 = _read_source(config_dir)
+    table = parse_source(data.decode('utf-8'), sha1)
+    with open(os.path.join(config_dir, COMPILED_FILE), 'w') as f:
+        json.dump(table.to_dict(), f, indent=1)
+    return table
+
+
+def load_table(config_dir):
+    """Returns the routing table, using the precompiled form when it matches the source."""
+    if config_dir in _TABLES:
+        return _TABLES[config_dir]
+
+    data, sha1 = _read_source(config_dir)
+    table = None
+    compiled_path = os.path.join(config_dir, COMPILED_FILE)
+    if os.path.exists(compiled_path):
+        try:
+            with open(compiled_path, 'r') as f:
+                compiled = json.load(f)
+            if compiled.get('format') == FORMAT_VERSION and compiled.get('source_sha1') == sha1:
+                table = RoutingTable.from_dict(compiled)
+        except (OSError, ValueError, KeyError, TypeError):
+            table = None
+
+    if table is None:
+        # Missing or stale precompiled table: fall back to parsing the text
+        table = parse_source(data.decode('utf-8'), sha1)
+
+    _TABLES[config_dir] = table
+    return table
+
+
+if __name__ == "__main__":
+    target_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "config")
+    target_dir = os.path.abspath(target_dir)
+    compiled = compile_table(target_dir)
+    print(f"Compiled {len(compiled.intervals)} ranges and {len(compiled.explicit)} explicit versions "
+          f"into {os.path.join(target_dir, COMPILED_FILE)}")
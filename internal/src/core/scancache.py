@@ -0,0 +1,147 @@
+# Author: Erik van Gorsel
+# Deep scan result cache
+#
+# Reading the central directory of every userlib JAR is the most expensive
+# part of an analysis, yet between two runs the userlib rarely changes. The
+# signatures of a complete deep scan are stored in the user's cache folder
+# under a digest of the userlib listing (name, size and mtime of every JAR),
+# so an unchanged userlib skips the scan. Any change to the listing, or to
+# the code that reads a signature, yields another digest and therefore a
+# fresh scan; the oldest entries are pruned.
+#
+# Location: %LOCALAPPDATA%\mx-cleanuserlib, $XDG_CACHE_HOME/mx-cleanuserlib
+# or ~/.cache/mx-cleanuserlib. MX_CLEANUSERLIB_CACHE overrides it.
+
+import os
+import json
+import hashlib
+
+import utils
+import jarmeta
+import deepscan
+import profiling
+
+CACHE_ENV = "MX_CLEANUSERLIB_CACHE"
+CACHE_FOLDER = "mx-cleanuserlib"
+# Bumped whenever the stored format or the meaning of a signature changes
+CACHE_FORMAT = 2
+MAX_ENTRIES = 32
+# The modules that turn a JAR into a stored signature; their source is part of the key
+SIGNATURE_MODULES = ("deepscan", "jarmeta", "zipdir", "scancache")
+
+
+def cache_dir():
+    override = os.environ.get(CACHE_ENV)
+    if override:
+        return override
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, CACHE_FOLDER)
+
+
+def listing_digest(records):
+    """Digest of the JAR records' names, sizes and modification times, and of the signature code."""
+    import gitcheck
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"format={CACHE_FORMAT}\ncode={gitcheck.module_digest(SIGNATURE_MODULES)}\n".encode("utf-8"))
+    for rec in sorted(records, key=lambda r: r.name):
+        h.update(f"{rec.name}\0{rec.size}\0{rec.mtime!r}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _entry_path(digest):
+    return os.path.join(cache_dir(), f"deepscan-{digest}.json")
+
+
+def signature_row(sig):
+    """The JSON form of a signature's content, without the file name (see signature_from_row)."""
+    meta = sig.metadata
+    return [
+        sorted(sig.classes),
+        list(sig.coordinates) if sig.coordinates else None,
+        [meta.group, meta.artifact, meta.version, meta.title] if meta is not None else None,
+    ]
+
+
+def signature_from_row(row, record):
+    """Rebuilds the signature of the JAR `record` from a signature_row()."""
+    classes, coordinates, meta = row
+    metadata = jarmeta.JarMetadata(*meta) if meta is not None else None
+    return deepscan.JarSignature(
+        record.name, deepscan.get_class_entries(classes), jarmeta.version_key(record, metadata), record.mtime,
+        tuple(coordinates) if coordinates else None, metadata,
+    )
+
+
+def _to_row(sig):
+    return [sig.file] + signature_row(sig)
+
+
+def _from_row(row, records):
+    return signature_from_row(row[1:], records[row[0]])
+
+
+@profiling.timed("Deep scan cache")
+def load(records):
+    """Returns the cached signatures for exactly these JAR records, or None."""
+    path = _entry_path(listing_digest(records))
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            document = json.load(fp)
+            profiling.count(profiling.BYTES_READ, fp.tell())
+        if document.get("format") != CACHE_FORMAT:
+            return None
+        by_name = {r.name: r for r in records}
+        signatures = [_from_row(row, by_name) for row in document["signatures"]]
+        unreadable = document["unreadable"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    for name in unreadable:
+        utils.log_warning(f"Deep scan skipped unreadable archive: {name}")
+    try:
+        os.utime(path)  # Keeps entries in use away from pruning
+    except OSError:
+        pass
+    return signatures
+
+
+def save(records, signatures):
+    """Stores the signatures of a complete deep scan. Failures only cost the next run its shortcut."""
+    folder = cache_dir()
+    path = _entry_path(listing_digest(records))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    scanned = {s.file for s in signatures}
+    document = {
+        "format": CACHE_FORMAT,
+        "signatures": [_to_row(s) for s in signatures],
+        "unreadable": [r.name for r in records if r.name not in scanned],
+    }
+    try:
+        os.makedirs(folder, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(document, fp, separators=(",", ":"))
+            profiling.count(profiling.BYTES_WRITTEN, fp.tell())
+        os.replace(tmp_path, path)
+        prune(folder)
+    except OSError as e:
+        utils.log_warning(f"Could not write the deep scan cache ({e}).")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def prune(folder, keep=MAX_ENTRIES, prefix="deepscan-"):
+    """Deletes all but the `keep` most recently used cache entries whose name starts with `prefix`."""
+    entries = []
+    with os.scandir(folder) as it:
+        for entry in it:
+            if entry.name.startswith(prefix) and entry.name.endswith(".json"):
+                entries.append((entry.stat().st_mtime, entry.path))
+    entries.sort(reverse=True)
+    for _, path in entries[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
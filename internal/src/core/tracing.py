@@ -0,0 +1,95 @@
+# Author: Erik van Gorsel
+# Decision trace (--trace out.jsonl)
+#
+# Records why files were selected, as one JSON object per line: the
+# vendorlib matches, the older versions in a library group, the deep scan
+# findings, the sidecars of redundant JARs and the protected hits, plus the
+# final selection. Each event names the file, the stage, the rule and the
+# related file, with the milliseconds since the trace started. Stage events
+# carry their duration and read events the time one JAR took, so slow
+# stages can be traced to the files that made them slow. Lines are written
+# as the decisions are made (line-buffered), never collected first. Like
+# profiling, everything is a cheap no-op until enable() is called.
+#
+#   {"event":"superseded","file":"guava-30.0-jre.jar","stage":"version_groups",
+#    "rule":"older version of com.google.guava:guava","related":"guava-31.1-jre.jar","elapsed_ms":41.7}
+
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+ENABLED = False
+
+# Event types
+RUN = "run"                             # Project, engine and Studio Pro version of the traced run
+STAGE = "stage"                         # A pipeline stage finished (duration_ms)
+READ = "read"                           # One userlib JAR was fingerprinted (duration_ms)
+VENDORLIB_MATCH = "vendorlib_match"     # Provided by vendorlib (rule: managed artifact)
+SUPERSEDED = "superseded"               # Older version in its library group (related: the kept JAR)
+DUPLICATE_CLASSES = "duplicate_classes" # Same class set as another JAR
+CONTAINED_CLASSES = "contained_classes" # Class set contained in a larger JAR
+SIDECAR = "sidecar"                     # Metadata file of a redundant JAR
+PROTECTED = "protected"                 # Redundant, but kept by a protection rule
+SELECTED = "selected"                   # Final decision: the file is removed (rule: its reason)
+
+_lock = threading.Lock()
+_local = threading.local()
+_sink = None
+_started = None
+
+
+def enable(path):
+    """Starts writing events to `path` (JSON Lines). Raises OSError when it cannot be created."""
+    global ENABLED, _sink, _started
+    if ENABLED:
+        return
+    _sink = open(path, "w", encoding="utf-8", buffering=1)
+    _started = time.perf_counter()
+    ENABLED = True
+    atexit.register(close)
+
+
+def close():
+    global ENABLED, _sink
+    with _lock:
+        ENABLED = False
+        if _sink is not None:
+            _sink.close()
+            _sink = None
+
+
+def emit(event, file=None, rule=None, related=None, stage=None, **fields):
+    """Writes one event. `stage` defaults to the stage running in this thread (see in_stage)."""
+    if not ENABLED:
+        return
+    record = {
+        'event': event,
+        'file': file,
+        'stage': stage or getattr(_local, 'stage', None),
+        'rule': rule,
+        'related': related,
+        'elapsed_ms': round((time.perf_counter() - _started) * 1000, 3),
+    }
+    record.update(fields)
+    line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+    with _lock:
+        if _sink is not None:
+            _sink.write(line)
+
+
+@contextmanager
+def in_stage(name):
+    """Attributes the events of a block to a stage and records its duration as a STAGE event."""
+    if not ENABLED:
+        yield
+        return
+    previous = getattr(_local, 'stage', None)
+    _local.stage = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.stage = previous
+        emit(STAGE, stage=name, duration_ms=round((time.perf_counter() - start) * 1000, 3))
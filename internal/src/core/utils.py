@@ -2,9 +2,11 @@ import os
 import re
 import sys
 import shutil
-import subprocess
 from datetime import datetime
-import zipfile
+from functools import lru_cache
+
+import naming
+import profiling
 
 # ANSI escape codes disabled per user request
 COLOR_RESET = ""
@@ -37,13 +39,57 @@ def log_step(current, total, msg):
 def log_divider():
     print(f"{COLOR_CYAN}------------------------------------------------------------{COLOR_RESET}")
 
+def get_arg_value(flag, default=None, argv=None):
+    """Returns the value of '--flag value' or '--flag=value' from the command line."""
+    argv = sys.argv if argv is None else argv
+    for i, arg in enumerate(argv):
+        if arg.startswith(flag + "="):
+            return arg.split("=", 1)[1]
+        if arg == flag and i + 1 < len(argv) and not argv[i + 1].startswith("--"):
+            return argv[i + 1]
+    return default
+
+def get_arg_values(flag, argv=None):
+    """Returns all plain arguments that follow '--flag' up to the next option."""
+    argv = sys.argv if argv is None else argv
+    if flag not in argv:
+        return []
+    values = []
+    for arg in argv[argv.index(flag) + 1:]:
+        if arg.startswith("--"):
+            break
+        values.append(arg)
+    return values
+
+# Maven qualifier order; unknown qualifiers (e.g. 'jre', 'jdk8') sort after these, alphabetically
+QUALIFIER_ORDER = {'alpha': 0, 'a': 0, 'beta': 1, 'b': 1, 'milestone': 2, 'm': 2, 'rc': 3, 'cr': 3,
+                   'snapshot': 4, '': 5, 'ga': 5, 'final': 5, 'release': 5, 'sp': 6}
+VERSION_TOKEN_RE = re.compile(r'\d+|[a-z]+')
+
 class SimpleVersion:
-    """A minimal version parser to replace the 'packaging' library dependency."""
+    """A minimal Maven-style version parser to replace the 'packaging' library dependency.
+    All numeric parts count (1.2.3.4), trailing zeros do not (1.0 == 1.0.0) and qualifiers are
+    kept: 2.0-beta1 < 2.0-rc1 < 2.0-SNAPSHOT < 2.0 < 2.0-sp1."""
     def __init__(self, version_str):
         self.version_str = str(version_str)
-        # Extract only digits and dots
-        clean_v = re.search(r'(\d+\.\d+(\.\d+)?)', self.version_str)
-        self.parts = tuple(map(int, clean_v.group(1).split('.'))) if clean_v else (0, 0, 0)
+        tokens = VERSION_TOKEN_RE.findall(self.version_str.lower())
+        numbers = []
+        while tokens and tokens[0].isdigit():
+            numbers.append(int(tokens.pop(0)))
+        while numbers and numbers[-1] == 0:
+            numbers.pop()
+        qualifiers = []
+        for token in tokens:
+            if token.isdigit():
+                if qualifiers and qualifiers[-1][2] is None:
+                    qualifiers[-1] = qualifiers[-1][:2] + (int(token),)
+                else:
+                    qualifiers.append((QUALIFIER_ORDER[''], '', int(token)))
+            else:
+                rank = QUALIFIER_ORDER.get(token)
+                qualifiers.append((len(QUALIFIER_ORDER), token, None) if rank is None else (rank, '', None))
+        self.parts = (tuple(numbers), tuple((rank, name, num or 0) for rank, name, num in qualifiers)
+                      or ((QUALIFIER_ORDER[''], '', 0),))
 
     def __lt__(self, other): return self.parts < other.parts
     def __le__(self, other): return self.parts <= other.parts
@@ -55,76 +101,137 @@ class SimpleVersion:
 def parse_version(v):
     return SimpleVersion(v)
 
-# Libraries that should NEVER be removed
-PROTECTED_LIBS = [
-    "bcprov", "bcpkix", "bcpg", "dom4j", 
-    "jaxb-api", "activation", "javax.activation", 
-    "javax.annotation", "javax.xml.bind",
-    "checker-qual", "error_prone_annotations", "failureaccess", "listenablefuture"
-]
-
+# Bundled configuration: internal/config, or the 'config' folder of the PyInstaller bundle
+if hasattr(sys, '_MEIPASS'):
+    CONFIG_DIR = os.path.join(sys._MEIPASS, "config")
+else:
+    CONFIG_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "config"))
+
+NAME_RULES_FILE = "LibNameRules.txt"
+_NAME_RULES = None
+
+# Bounded memo for name parsing; large userlibs hold a few thousand distinct names
+NAME_CACHE_SIZE = 8192
+JAR_VERSION_RE = re.compile(r'^(.*?)-(\d.*)$')
+
+# Libraries that should NEVER be removed: see config/ProtectedLibs.txt (loaded by protection.py)
+_PROTECTION_MATCHERS = {}
+
+def get_name_rules():
+    """Returns the compiled normalization rules from config/LibNameRules.txt (loaded once)."""
+    global _NAME_RULES
+    if _NAME_RULES is None:
+        rules_path = os.path.join(CONFIG_DIR, NAME_RULES_FILE)
+        try:
+            _NAME_RULES = naming.NameRules.load(rules_path)
+        except (OSError, ValueError) as e:
+            log_warning(f"Could not load library name rules ({e}); only metadata suffixes are stripped.")
+            _NAME_RULES = naming.NameRules()
+    return _NAME_RULES
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
 def normalize_lib_name(name):
     """Normalizes library names by removing package prefixes and module suffixes."""
-    prefixes = [
-        r"^org\.apache\.(poi|commons|xmlbeans|httpcomponents)\.",
-        r"^com\.google\.guava\.",
-        r"^com\.fasterxml\.jackson\.",
-        r"^net\.sf\.",
-        r"^javax\.",
-        r"^com\.springsource\."
-    ]
-    
-    normalized = name.lower()
-    for p in prefixes:
-        normalized = re.sub(p, "", normalized)
-    
-    normalized = re.sub(r"\.(VideoConferenceModule|OQLModule|ExcelImporter|XLSReport|CommunityCommons|GoogleAuth|JWT|Deeplink)\.(RequiredLib|Required)$", "", normalized, flags=re.IGNORECASE)
-    normalized = re.sub(r"\.RequiredLib$", "", normalized, flags=re.IGNORECASE)
-    normalized = re.sub(r"\.Required$", "", normalized, flags=re.IGNORECASE)
-    
-    return normalized
+    return get_name_rules().normalize(name)
 
+@lru_cache(maxsize=NAME_CACHE_SIZE)
 def get_jar_details(filename):
     """Splits a JAR filename into a base name and a version string."""
-    temp_name = re.sub(r"\.(VideoConferenceModule|OQLModule|ExcelImporter|XLSReport|CommunityCommons|GoogleAuth|JWT|Deeplink)\.(RequiredLib|Required)$", "", filename, flags=re.IGNORECASE)
-    temp_name = re.sub(r"\.(RequiredLib|Required)$", "", temp_name, flags=re.IGNORECASE)
+    temp_name = get_name_rules().strip_suffix(filename)
     temp_name = temp_name.replace(".jar", "")
 
-    match = re.search(r'^(.*?)-(\d.*)$', temp_name)
+    match = JAR_VERSION_RE.search(temp_name)
     if match:
         return match.group(1), match.group(2)
     return temp_name, "0.0.0"
 
-def get_exe_tool_findings(userlib_path):
-    """Runs mendix-userlib-cleaner.exe and parses output."""
-    # The exe is in the same 'internal' folder as this utility script
-    internal_dir = os.path.dirname(os.path.abspath(__file__))
-    exe_path = os.path.join(internal_dir, 'mendix-userlib-cleaner.exe')
-    
-    if not os.path.exists(exe_path):
-        return []
-    
+def protection_stamp(project_root=None):
+    """(mtime, size) of every ProtectedLibs.txt that applies to a project; differs once one is edited."""
+    import protection
+    stamp = []
+    for label, path in sorted(protection.protection_files(project_root).items()):
+        try:
+            st = os.stat(path)
+            stamp.append((label, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append((label, None, None))
+    return tuple(stamp)
+
+def get_protection_matcher(project_root=None):
+    """Returns the compiled protection rules (built-in + project) for a project, cached per root as long
+    as its ProtectedLibs.txt files are unchanged: the daemon and watch mode pick up edits to them."""
+    import protection
+    key = os.path.abspath(project_root) if project_root else None
+    stamp = protection_stamp(project_root)
+    cached = _PROTECTION_MATCHERS.get(key)
+    if cached is None or cached[0] != stamp:
+        cached = _PROTECTION_MATCHERS[key] = (stamp, protection.ProtectionMatcher.load(project_root))
+    return cached[1]
+
+def print_protected(protected):
+    """Prints the protected files together with the rule that protected each one."""
+    if protected:
+        print("\nProtected libraries (critical / required):")
+        for f in sorted(protected):
+            print(f"  - {f}  [{protected[f]}]")
+
+@profiling.timed("Deep scan")
+def get_deep_scan_findings(userlib_path, records=None, ctx=None):
+    """Runs the native signature-based deep scan and returns {redundant JAR name: reason}.
+    With a ProjectContext, its cached signatures are used (and shared with the class index)."""
+    import deepscan
+    try:
+        if ctx is not None:
+            return deepscan.scan_userlib(ctx.userlib_path, signatures=ctx.signatures())
+        return deepscan.scan_userlib(userlib_path, records)
+    except Exception as e:
+        log_warning(f"Deep scan failed: {e}")
+        return {}
+
+@profiling.timed("Class index")
+def get_class_overlaps(ctx, removed=(), previous=None, involving=()):
+    """Builds the userlib + vendorlib class index and returns the overlaps between the JARs that stay.
+    With the `previous` overlaps, only the pairs with a JAR in `involving` are computed again."""
     try:
-        result = subprocess.run([exe_path, "--target", userlib_path], capture_output=True, text=True)
-        combined = result.stdout + "\n" + result.stderr
-        findings = []
-        for line in combined.splitlines():
-            if "Would remove file" in line:
-                match = re.search(r'Would remove file.*:\s+(.*)$', line)
-                if match:
-                    filename = os.path.basename(match.group(1).strip())
-                    if filename.endswith('.jar'):
-                        findings.append(filename)
-        return list(set(findings))
+        if previous is not None:
+            return ctx.class_index().update_overlaps(previous, exclude=removed, involving=involving)
+        return ctx.class_index().overlaps(exclude=removed)
     except Exception as e:
-        print(f"Warning: Could not run .exe tool: {e}")
+        log_warning(f"Class overlap analysis failed: {e}")
         return []
 
-def create_backup_manifest(to_move, timestamp):
-    """Creates a simple text manifest explaining why files were removed."""
+def print_class_overlaps(overlaps, limit=10):
+    """Prints JAR pairs that still ship the same classes or split a package after cleanup."""
+    if not overlaps:
+        return
+    print("\nClass overlaps between remaining JARs (possible LinkageError):")
+    for o in overlaps[:limit]:
+        print(f"  - {o}")
+    if len(overlaps) > limit:
+        print(f"  ... and {len(overlaps) - limit} more JAR pairs")
+
+def new_cleanup_result(engine_name):
+    """Returns the empty result structure that every engine's analyze() fills in."""
+    return {
+        'engine': engine_name,
+        'to_remove': set(),
+        'reasons': {},
+        'protected': {},
+        'overlaps': [],
+        'total_scanned': 0,
+        'jar_count': 0,
+        'error': None,
+    }
+
+def create_backup_manifest(to_move, timestamp, sequence=None):
+    """Creates a simple text manifest explaining why files were removed. `sequence` orders the backups."""
     manifest = [
         f"Mendix Userlib Cleanup Manifest",
         f"Timestamp: {timestamp}",
+    ]
+    if sequence is not None:
+        manifest.append(f"Sequence: {sequence}")
+    manifest += [
         f"Total items removed: {len(to_move)}",
         "\n--- Removed Files ---"
     ]
@@ -132,9 +239,10 @@ def create_backup_manifest(to_move, timestamp):
         manifest.append(f" - {f}")
     return "\n".join(manifest)
 
-def handle_backup_and_cleanup(to_move, userlib_path, total_scanned=0, engine_name="Unknown"):
-    """Centralized backup, compression, and removal logic with clear feedback."""
-    check_mode = '--check' in sys.argv
+def handle_backup_and_cleanup(to_move, userlib_path, total_scanned=0, engine_name="Unknown", backup_mode=None, ctx=None):
+    """Centralized backup, compression, and removal logic with clear feedback. `ctx` is the engine's ProjectContext."""
+    check_mode = '--check' in sys.argv or any(a.startswith('--check=') for a in sys.argv)
+    backup_mode = (backup_mode or get_arg_value('--backup', 'zip')).lower()
 
     if not to_move:
         log_divider()
@@ -146,6 +254,9 @@ def handle_backup_and_cleanup(to_move, userlib_path, total_scanned=0, engine_nam
         log_error(f"Cleanup check failed: Found {len(to_move)} redundant files.")
         sys.exit(1)
 
+    # Imported only past the check-mode exit: --check never touches backups
+    import backup
+
     log_subheader("Redundant libraries detected")
     print(f"A total of {COLOR_BOLD}*{len(to_move)} redundant libraries*{COLOR_RESET} were found, including:")
     
@@ -158,13 +269,25 @@ def handle_backup_and_cleanup(to_move, userlib_path, total_scanned=0, engine_nam
     print(f"  • Redundant files detected:   {len(to_move)}")
     print(f"  • Protected files:           (multiple, see above)")
 
+    if backup_mode not in backup.BACKUP_MODES:
+        log_error(f"Unknown backup mode '{backup_mode}'. Use --backup=zip, --backup=move or --backup=store.")
+        sys.exit(1)
+
     log_divider()
     log_warning(f"The cleanup will remove {len(to_move)} files from /userlib.")
-    print(f"    A backup ZIP will be created automatically in:")
-    print(f"       userlib_backup/<timestamp>.zip")
+    if backup_mode == 'move':
+        print(f"    The files will be moved (not copied) into:")
+        print(f"       userlib_backup/userlib_backup_<timestamp>/")
+    elif backup_mode == 'store':
+        print(f"    The files will be kept once per unique content in:")
+        print(f"       userlib_backup/objects/ (run manifest: userlib_backup_<timestamp>.json)")
+    else:
+        print(f"    A backup ZIP will be created automatically in:")
+        print(f"       userlib_backup/<timestamp>.zip")
     
     print(f"\nType {COLOR_BOLD}\"PROCEED\"{COLOR_RESET} to confirm and continue.")
-    confirm = input(f"→ ").strip().upper()
+    with profiling.phase("Waiting for confirmation"):
+        confirm = input(f"→ ").strip().upper()
 
     if confirm == 'CANCEL':
         log_info("Operation cancelled. No changes were made.")
@@ -173,71 +296,86 @@ def handle_backup_and_cleanup(to_move, userlib_path, total_scanned=0, engine_nam
         log_error("Invalid input. Operation cancelled for safety.")
         sys.exit(1)
 
+    perform_cleanup(to_move, userlib_path, backup_mode, ctx=ctx)
+
+def perform_cleanup(to_move, userlib_path, backup_mode='zip', ctx=None):
+    """Backs up and removes the confirmed files, then refreshes the catalog, applies the retention
+    policy and checks project health. Used after the PROCEED prompt and by --apply. Returns True on success."""
+    import backup
+    import catalog
+
     log_subheader("Performing cleanup...")
 
-    backup_folder = os.path.join(userlib_path, 'userlib_backup')
-    if not os.path.exists(backup_folder):
-        os.makedirs(backup_folder)
-        
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-    zip_filename = f"userlib_backup_{timestamp}.zip"
-    zip_path = os.path.join(backup_folder, zip_filename)
     
     try:
-        manifest_content = create_backup_manifest(to_move, timestamp)
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Add manifest
-            zip_file.writestr("cleanup_manifest.txt", manifest_content)
-            
-            # Add files and remove them
-            for f in to_move:
-                full_path = os.path.join(userlib_path, f)
-                if os.path.exists(full_path):
-                    zip_file.write(full_path, arcname=f)
-                    os.remove(full_path)
+        if ctx is not None:
+            with profiling.phase("Waiting for deep scan reads"):
+                ctx.wait_for_reads()
+        with profiling.phase("Backup & removal"):
+            backup_path = backup.create_backup(to_move, userlib_path, timestamp, mode=backup_mode)
+        if ctx is not None:
+            ctx.invalidate()
+        # Record the new backup's contents so single files can be restored later
+        with profiling.phase("Catalog refresh"):
+            catalog.BackupCatalog.open(userlib_path)
         
         num_files = len(to_move)
-        log_success("Backup archive created successfully")
+        if backup_mode == 'move':
+            log_success(f"Files moved to backup folder: {os.path.basename(backup_path)}")
+        elif backup_mode == 'store':
+            log_success(f"Files added to the backup store: {os.path.basename(backup_path)}")
+        else:
+            log_success("Backup archive created successfully")
         log_success(f"{num_files} redundant files removed from /userlib/")
         
+        # Retention: compact or prune old backups, only when asked for (--keep-last, --max-age, --max-backup-size)
+        policy = ctx.retention if ctx is not None else None
+        if policy is not None:
+            import retention
+            with profiling.phase("Retention policy"):
+                report = retention.apply_policy(userlib_path, policy)
+            retention.print_report(report, verbose=False)
+        
         # Simple post-cleanup health check
         print()
         log_step(5, 5, "Running post-cleanup project health check...")
-        validate_cleanup_result(project_root=os.path.dirname(userlib_path))
+        with profiling.phase("Health check"):
+            validate_cleanup_result(ctx or os.path.dirname(userlib_path))
         
         log_header("Cleanup Complete — Userlib successfully optimized!")
         print("\nThank you for using the Mendix Userlib Cleanup Utility.")
         print("Hope it saved you some time! 😊\n")
+        return True
     except Exception as e:
         log_error(f"Error during backup process: {e}")
+        return False
 
-def validate_cleanup_result(project_root):
+def validate_cleanup_result(project):
     """
     Verifies project health post-cleanup:
     1. Check if .mpr exists and is readable.
     2. Check for critical Mendix system artifacts.
+    Accepts a ProjectContext (reusing its .mpr connection) or a project root path.
     """
+    from project import ProjectContext
+    ctx = ProjectContext.of(project)
     # log_info("Scanning project health post-cleanup...")
     
     # 1. Database Check
-    mpr_files = [f for f in os.listdir(project_root) if f.endswith('.mpr') and not f.endswith('.bak')]
-    if not mpr_files:
+    if not ctx.mpr_path or not os.path.exists(ctx.mpr_path):
         log_error("CRITICAL: .mpr file missing after cleanup!")
         return False
         
-    mpr_path = os.path.join(project_root, mpr_files[0])
     try:
-        import sqlite3
-        conn = sqlite3.connect(f"file:{mpr_path}?mode=ro", uri=True)
-        conn.execute("SELECT name FROM sqlite_master LIMIT 1")
-        conn.close()
+        ctx.connect().execute("SELECT name FROM sqlite_master LIMIT 1")
     except Exception as e:
         log_error(f"CRITICAL: .mpr database is unreadable: {e}")
         return False
 
     # 2. System Artifact Check (Sanity check for userlib)
     # We just want to ensure we didn't wipe the directory entirely if it was supposed to have content
-    userlib = os.path.join(project_root, 'userlib')
+    userlib = ctx.userlib_path
     if os.path.exists(userlib):
         jars = [f for f in os.listdir(userlib) if f.endswith('.jar')]
         # This is just a warning, some projects might have empty userlibs
@@ -247,85 +385,73 @@ def validate_cleanup_result(project_root):
     log_success("Health check passed. Project structure is intact.")
     return True
 
-def revert_files(userlib_path, specific_zip=None):
-    """Universal revert logic."""
-    backup_path = os.path.join(userlib_path, 'userlib_backup')
+@profiling.timed("Revert")
+def revert_files(userlib_path, specific_zip=None, only=None):
+    """Universal revert logic. `only` restores just the files matching those names, globs or hashes."""
+    import backup
+    import catalog
+    backup_path = backup.get_backup_folder(userlib_path)
     if not os.path.exists(backup_path):
         print("Error: No backup directory found.")
         return
 
+    target = None
     if specific_zip:
-        zip_file = specific_zip if specific_zip.endswith('.zip') else specific_zip + '.zip'
-        target_zip = os.path.join(backup_path, zip_file)
-        if not os.path.exists(target_zip):
-            # Try searching just by filename if a full path wasn't provided correctly
-            target_zip = os.path.join(backup_path, os.path.basename(zip_file))
-            if not os.path.exists(target_zip):
-                print(f"Error: Could not find backup file: {zip_file}")
+        target = backup.find_backup(backup_path, specific_zip)
+        if not target:
+            print(f"Error: Could not find backup file: {specific_zip}")
+            return
+
+    # Selective revert: stream only the requested entries, keep the backups
+    if only:
+        try:
+            backup_catalog = catalog.BackupCatalog.open(userlib_path)
+            matches = backup_catalog.find(only, backup_name=target)
+            if not matches:
+                print(f"No backed-up files match: {', '.join(only)}")
                 return
-    else:
-        zips = [f for f in os.listdir(backup_path) if f.startswith('userlib_backup_') and f.endswith('.zip')]
-        if not zips:
-            print("No ZIP backup files found.")
+            for f in sorted(matches):
+                print(f"Restoring {f} from {matches[f][0]}")
+            restored = backup_catalog.restore(matches, userlib_path)
+            print(f"Restored {len(restored)} files.")
+        except Exception as e:
+            print(f"Error during revert: {e}")
+        return
+
+    if not target:
+        backups = backup.list_backups(backup_path)
+        if not backups:
+            print("No backup files found.")
             return
-        zips.sort()
-        target_zip = os.path.join(backup_path, zips[-1])
-        zip_file = zips[-1]
+        target = backups[-1]
 
-    print(f"Reverting from: {zip_file}")
+    print(f"Reverting from: {target}")
     
     try:
-        with zipfile.ZipFile(target_zip, 'r') as zip_ref:
-            zip_ref.extractall(userlib_path)
-            print(f"Restored {len(zip_ref.namelist())} files.")
-        os.remove(target_zip)
+        restored = backup.restore_backup(backup_path, target, userlib_path)
+        print(f"Restored {restored} files.")
+        catalog.BackupCatalog.open(userlib_path)
     except Exception as e:
         print(f"Error during revert: {e}")
 
 def get_vendorlib_jars(project_root):
-    """Lists JAR files currently managed in vendorlib."""
-    vendorlib_path = os.path.join(project_root, 'vendorlib')
-    if not os.path.exists(vendorlib_path):
-        return []
-    
-    vendor_jars = []
-    for root, dirs, files in os.walk(vendorlib_path):
-        for f in files:
-            if f.endswith('.jar'):
-                vendor_jars.append(f)
-    return vendor_jars
+    """Lists JAR files currently managed in vendorlib (see vendorlib.VendorIndex for coordinates)."""
+    import vendorlib
+    return [a.file for a in vendorlib.VendorIndex.load(os.path.join(project_root, 'vendorlib')).artifacts]
 
 def find_project_root(start_path):
     """Searches upward from start_path to find a folder containing an .mpr file."""
-    curr = os.path.abspath(start_path)
-    while True:
-        mpr_files = [f for f in os.listdir(curr) if f.endswith('.mpr') and not f.endswith('.bak')]
-        if mpr_files:
-            return curr
-        
-        parent = os.path.dirname(curr)
-        if parent == curr: 
-            break
-        curr = parent
-    return None
+    from project import ProjectContext
+    ctx = ProjectContext.discover(start_path)
+    return ctx.root if ctx else None
 
 def resolve_paths(script_file):
     """
     Standardized path resolution for all cleanup scripts.
     Returns (project_root, userlib_path)
     """
-    script_dir = os.path.dirname(os.path.abspath(script_file))
-    
-    # Context 1: Try current working directory
-    project_root = find_project_root(os.getcwd())
-    
-    # Context 2: Try script's location (assuming engines are in cleanup_suite/engines/)
-    if not project_root:
-        # If in 'src/engines' or 'src/core', go up 2 levels to find project root
-        project_root = find_project_root(os.path.dirname(os.path.dirname(script_dir)))
-
-    if not project_root:
+    from project import ProjectContext
+    ctx = ProjectContext.resolve(script_file)
+    if ctx is None:
         return None, None
-        
-    userlib_path = os.path.join(project_root, 'userlib')
-    return project_root, userlib_path
+    return ctx.root, ctx.userlib_path
@@ -0,0 +1,188 @@
+# Author: Erik van Gorsel
+# Vendorlib index (managed dependencies, Mendix 10+)
+#
+# Studio Pro 10+ writes vendorlib/vendorlib-sbom.json, a CycloneDX document
+# listing every managed artifact with its Maven coordinates. The index is
+# built from that file, so the vendorlib folder is not walked at all and a
+# userlib JAR is matched on its real groupId:artifactId (read from the
+# META-INF/maven/<group>/<artifact>/ path in its central directory).
+# When the SBOM is missing, unreadable or older than any vendorlib folder
+# or JAR, vendorlib is walked with os.scandir and matched on normalized
+# file names instead.
+
+import os
+import json
+from urllib.parse import unquote
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+import zipdir
+import deepscan
+import profiling
+
+SBOM_NAME = "vendorlib-sbom.json"
+# File systems such as FAT store modification times with 2 second precision
+MTIME_SLACK = 2.0
+
+
+class VendorArtifact:
+    """One managed dependency in vendorlib."""
+    __slots__ = ("group", "artifact", "version", "file")
+
+    def __init__(self, group, artifact, version, file=None):
+        self.group = group
+        self.artifact = artifact
+        self.version = version
+        self.file = file
+
+    @property
+    def coordinate(self):
+        return (self.group, self.artifact) if self.group else None
+
+    def __str__(self):
+        if self.group:
+            return f"{self.group}:{self.artifact}:{self.version}"
+        return self.file
+
+
+def parse_purl(purl):
+    """Splits 'pkg:maven/group/artifact@version?type=jar' into (group, artifact, version)."""
+    if not purl or not purl.startswith("pkg:maven/"):
+        return None, None, None
+    path = purl[len("pkg:maven/"):].split("?", 1)[0].split("#", 1)[0]
+    path, _, version = path.partition("@")
+    group, _, artifact = path.rpartition("/")
+    return unquote(group) or None, unquote(artifact) or None, unquote(version) or None
+
+
+def _iter_components(components):
+    for component in components or ():
+        yield component
+        # CycloneDX allows nested components (e.g. assemblies)
+        yield from _iter_components(component.get("components"))
+
+
+def read_sbom(path):
+    """Returns the VendorArtifacts listed in a CycloneDX SBOM."""
+    with open(path, "r", encoding="utf-8") as fp:
+        document = json.load(fp)
+    artifacts = []
+    for component in _iter_components(document.get("components")):
+        p_group, p_artifact, p_version = parse_purl(component.get("purl"))
+        artifact = component.get("name") or p_artifact
+        if not artifact:
+            continue
+        group = component.get("group") or p_group
+        version = component.get("version") or p_version or "0.0.0"
+        artifacts.append(VendorArtifact(group, artifact, version, f"{artifact}-{version}.jar"))
+    return artifacts
+
+
+def newest_change(vendorlib_path):
+    """Latest modification time of vendorlib's folders (files added or removed, at any depth) and JARs
+    (replaced in place). Only stats entries; no file is opened."""
+    newest = os.path.getmtime(vendorlib_path)
+    pending = [vendorlib_path]
+    while pending:
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif not entry.name.endswith(".jar"):
+                    continue
+                newest = max(newest, entry.stat().st_mtime)
+                profiling.count(profiling.FILES_STATED)
+    return newest
+
+
+def is_sbom_current(vendorlib_path, sbom_path):
+    """The SBOM is stale when a vendorlib JAR was added, removed or replaced after it was written."""
+    try:
+        return newest_change(vendorlib_path) <= os.path.getmtime(sbom_path) + MTIME_SLACK
+    except OSError:
+        return False
+
+
+def artifact_from_file(rel_path):
+    """A VendorArtifact without coordinates, described by its file name only."""
+    base_name, version = utils.get_jar_details(rel_path.rsplit("/", 1)[-1])
+    return VendorArtifact(None, base_name, version, rel_path)
+
+
+def scan_vendorlib(vendorlib_path):
+    """Walks vendorlib with os.scandir. Returns VendorArtifacts without coordinates."""
+    artifacts = []
+    pending = [vendorlib_path]
+    while pending:
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    pending.append(entry.path)
+                elif entry.name.endswith(".jar"):
+                    rel_path = os.path.relpath(entry.path, vendorlib_path).replace(os.sep, "/")
+                    artifacts.append(artifact_from_file(rel_path))
+                profiling.count(profiling.FILES_STATED)
+    return artifacts
+
+
+def read_coordinates(jar_path):
+    """Returns (group, artifact) of a JAR, or None (see deepscan.get_maven_coordinates)."""
+    try:
+        return deepscan.get_maven_coordinates(zipdir.read_entry_names(jar_path), os.path.basename(jar_path))
+    except (OSError, zipdir.ZipDirError):
+        return None
+
+
+class VendorIndex:
+    """Managed artifacts keyed by Maven coordinate and by normalized name."""
+
+    def __init__(self, artifacts, source):
+        self.artifacts = artifacts
+        self.source = source
+        self.by_coordinate = {}
+        self.by_name = {}
+        for a in artifacts:
+            if a.coordinate:
+                self.by_coordinate[a.coordinate] = a
+            self.by_name.setdefault(utils.normalize_lib_name(a.artifact), a)
+
+    def __len__(self):
+        return len(self.artifacts)
+
+    @classmethod
+    @profiling.timed("Vendorlib index")
+    def load(cls, vendorlib_path):
+        """Reads the SBOM when it is current, otherwise walks the folder."""
+        if not os.path.isdir(vendorlib_path):
+            return cls([], "none")
+        sbom_path = os.path.join(vendorlib_path, SBOM_NAME)
+        if os.path.exists(sbom_path):
+            if is_sbom_current(vendorlib_path, sbom_path):
+                try:
+                    return cls(read_sbom(sbom_path), "sbom")
+                except (OSError, ValueError, AttributeError) as e:
+                    utils.log_warning(f"Could not read {SBOM_NAME} ({e}); scanning vendorlib instead.")
+            else:
+                utils.log_warning(f"{SBOM_NAME} is older than the vendorlib files; scanning vendorlib instead.")
+        return cls(scan_vendorlib(vendorlib_path), "scan")
+
+    def match(self, records, userlib_path, signatures=None, max_workers=None):
+        """Yields (LibFile, VendorArtifact) for every userlib JAR that vendorlib already provides.
+        A JAR with known coordinates is matched on them only; others fall back to the normalized name.
+        Coordinates come from the deep scan signatures when given, else from the JARs themselves."""
+        records = list(records)
+        coordinates = [None] * len(records)
+        if self.by_coordinate and signatures is not None:
+            by_file = {sig.file: sig.coordinates for sig in signatures}
+            coordinates = [by_file.get(r.name) for r in records]
+        elif self.by_coordinate:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                coordinates = list(pool.map(lambda r: read_coordinates(os.path.join(userlib_path, r.name)), records))
+
+        for rec, coordinate in zip(records, coordinates):
+            if coordinate is not None:
+                artifact = self.by_coordinate.get(coordinate)
+            else:
+                artifact = self.by_name.get(rec.norm_name)
+            if artifact is not None:
+                yield rec, artifact
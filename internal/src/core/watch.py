@@ -0,0 +1,435 @@
+# Author: Erik van Gorsel
+# Watch mode
+#
+# Studio Pro drops JARs into userlib whenever a Marketplace module is
+# imported or updated. --watch keeps the analysis of the project up to date
+# while that happens: userlib (top level only, so backups are ignored),
+# vendorlib (recursively) and the project's ProtectedLibs.txt are watched
+# with inotify on Linux and with (size, mtime) snapshots elsewhere. A burst of events is debounced into one
+# batch; only the changed files are stat'ed and read, and untouched JARs
+# are never opened again. The engine then re-evaluates in memory only what
+# the change can reach (see pipeline.Delta): the version groups the changed
+# JARs left or joined, the deep scan findings among the JARs sharing a
+# class with them and the class overlaps of the JARs whose verdict changed.
+
+import os
+import io
+import sys
+import stat
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+import contextlib
+
+import utils
+import deepscan
+import inventory
+import vendorlib
+import pipeline
+import classindex
+import protection
+from project import ProjectContext
+
+DEBOUNCE_SECONDS = 0.25     # Quiet time that ends a burst
+MAX_BATCH_SECONDS = 0.75    # A burst that never goes quiet is still reported within a second
+POLL_INTERVAL = 0.5
+RESYNC = None               # Batch marker: events were lost, re-read the whole project
+INITIAL_LIST_LIMIT = 20
+
+# <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")    # wd, mask, cookie, len (followed by the name)
+
+
+class InotifyWatcher:
+    """Linux inotify through ctypes. `roots` is a list of (folder, recursive)."""
+
+    def __init__(self, roots):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches = {}
+        for path, recursive in roots:
+            self._add(path, recursive)
+
+    def _add(self, path, recursive):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        self._watches[wd] = (path, recursive)
+        if recursive:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        self._add(entry.path, True)
+
+    def wait(self, timeout):
+        """Returns the paths that changed within `timeout` seconds."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changed.append(RESYNC)
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            watch = self._watches.get(wd)
+            if watch is None or not name:
+                continue
+            folder, recursive = watch
+            path = os.path.join(folder, name)
+            if mask & IN_ISDIR:
+                if not recursive:
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        self._add(path, True)
+                    except OSError:
+                        pass
+            changed.append(path)
+        return changed
+
+    def drain(self):
+        """Returns every change queued so far without waiting."""
+        changed = []
+        while select.select([self._fd], [], [], 0)[0]:
+            changed.extend(self.wait(0))
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Fallback without inotify: compares (size, mtime) snapshots of the watched folders."""
+
+    def __init__(self, roots, interval=POLL_INTERVAL):
+        self._roots = roots
+        self._interval = interval
+        self._snapshot = self._take()
+        self._next_poll = time.monotonic() + interval
+
+    def _take(self):
+        snapshot = {}
+        for root, recursive in self._roots:
+            pending = [root]
+            while pending:
+                try:
+                    it = os.scandir(pending.pop())
+                except OSError:
+                    continue
+                with it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if recursive:
+                                    pending.append(entry.path)
+                                continue
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        snapshot[entry.path] = (st.st_size, st.st_mtime)
+        return snapshot
+
+    def wait(self, timeout):
+        """Returns the paths that changed within `timeout` seconds."""
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+        return self.drain()
+
+    def drain(self):
+        """Compares a fresh snapshot right away."""
+        self._next_poll = time.monotonic() + self._interval
+        old, self._snapshot = self._snapshot, self._take()
+        return [p for p in old.keys() | self._snapshot.keys() if old.get(p) != self._snapshot.get(p)]
+
+    def close(self):
+        pass
+
+
+def create_watcher(roots, polling=False):
+    """Uses inotify where available, else polling. Folders that do not exist are skipped."""
+    roots = [(path, recursive) for path, recursive in roots if os.path.isdir(path)]
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as e:
+            utils.log_warning(f"inotify is not available ({e}); polling every {POLL_INTERVAL}s instead.")
+    return PollingWatcher(roots)
+
+
+def collect_batch(watcher):
+    """Blocks until something changes, then gathers events until the folders are quiet."""
+    changed = set()
+    while not changed:
+        changed.update(watcher.wait(1.0))
+    started = time.monotonic()
+    while time.monotonic() - started < MAX_BATCH_SECONDS:
+        more = watcher.wait(DEBOUNCE_SECONDS)
+        if not more:
+            break
+        changed.update(more)
+    return changed
+
+
+class IncrementalProject:
+    """The analysis inputs of one project, updated file by file."""
+
+    def __init__(self, ctx):
+        self.root = ctx.root
+        self.userlib_path = ctx.userlib_path
+        self.vendorlib_path = ctx.vendorlib_path
+        self.resync(ctx)
+
+    def resync(self, ctx=None):
+        """Reads everything once (at start-up, or after the kernel dropped events)."""
+        ctx = ctx or ProjectContext(self.root)
+        self.records = dict(ctx.inventory().records)
+        self.signatures = {sig.file: sig for sig in ctx.signatures()}
+        self.vendor_index = ctx.vendor_index()
+        self.vendor_jars = set()
+        self.vendor_classes = {}
+        if os.path.isdir(self.vendorlib_path):
+            self.vendor_jars = {a.file for a in vendorlib.scan_vendorlib(self.vendorlib_path)}
+            self.vendor_classes = classindex.read_vendorlib_classes(self.vendorlib_path, sorted(self.vendor_jars))
+        self.class_index = classindex.build_index(list(self.signatures.values()), vendor_classes=self.vendor_classes)
+        self.jars_read = len(self.signatures) + len(self.vendor_jars)
+        self.artifacts = None
+        self.delta = None
+
+    def apply(self, changed):
+        """Updates the state for the changed paths. Returns (area, sign, name) tuples,
+        sign being '+' (added), '~' (modified), '-' (removed) or '?' (unreadable, e.g. still being copied)."""
+        self.jars_read = 0
+        changes = []
+        before = {}
+        vendor_seen = set()
+        vendor_prefix = self.vendorlib_path + os.sep
+        for path in sorted(p for p in changed if p is not RESYNC):
+            if os.path.dirname(path) == self.userlib_path:
+                name = os.path.basename(path)
+                old = self.signatures.get(name)
+                change = self._update_userlib(name)
+                if change:
+                    before.setdefault(name, old)
+                    changes.append(("userlib",) + change)
+            elif path.startswith(vendor_prefix):
+                for change in self._update_vendorlib(path, vendor_seen):
+                    changes.append(("vendorlib",) + change)
+        if vendor_seen:
+            self._reload_vendor_index()
+        self.delta = pipeline.Delta(before, vendor_seen)
+        return changes
+
+    def _update_userlib(self, name):
+        if not inventory.is_scannable(name):
+            return None
+        try:
+            st = os.stat(os.path.join(self.userlib_path, name))
+        except OSError:
+            st = None
+        old = self.records.get(name)
+        if st is None or not stat.S_ISREG(st.st_mode):
+            if old is None:
+                return None
+            del self.records[name]
+            self.signatures.pop(name, None)
+            self.class_index.remove_jar(name)
+            return "-", name
+        if old is not None and (old.size, old.mtime) == (st.st_size, st.st_mtime):
+            return None
+
+        record = inventory.LibFile(name, st.st_size, st.st_mtime)
+        self.records[name] = record
+        if not record.is_jar:
+            return ("~" if old else "+"), name
+        self.jars_read += 1
+        sig = deepscan.read_signature(self.userlib_path, record)
+        self.class_index.remove_jar(name)
+        if sig is None:
+            self.signatures.pop(name, None)
+            return "?", name
+        self.signatures[name] = sig
+        self.class_index.add_jar(name, sig.classes)
+        return ("~" if old else "+"), name
+
+    def _update_vendorlib(self, path, seen):
+        """`seen` collects the files handled in this batch (a new folder also reports its files)."""
+        rel_path = os.path.relpath(path, self.vendorlib_path).replace(os.sep, "/")
+        if rel_path == vendorlib.SBOM_NAME:
+            seen.add(rel_path)
+            return [("~", rel_path)]
+        if os.path.isdir(path):
+            # A folder was created or moved in: every JAR below it is new
+            present = {f"{rel_path}/{a.file}" for a in vendorlib.scan_vendorlib(path)}
+        elif rel_path.endswith(".jar") and os.path.isfile(path):
+            present = {rel_path}
+        else:
+            present = set()
+        present -= seen
+
+        changes = []
+        known = {f for f in self.vendor_jars if f == rel_path or f.startswith(rel_path + "/")}
+        for f in sorted(known - present - seen):
+            self.vendor_jars.discard(f)
+            self.vendor_classes.pop(f, None)
+            self.class_index.remove_jar(f"{classindex.VENDORLIB}/{f}")
+            seen.add(f)
+            changes.append(("-", f))
+        if present:
+            fresh = classindex.read_vendorlib_classes(self.vendorlib_path, sorted(present))
+            self.jars_read += len(present)
+            for f in sorted(present):
+                changes.append(("~" if f in self.vendor_jars else "+", f))
+                self.vendor_jars.add(f)
+                seen.add(f)
+                label = f"{classindex.VENDORLIB}/{f}"
+                self.class_index.remove_jar(label)
+                if f in fresh:
+                    self.vendor_classes[f] = fresh[f]
+                    self.class_index.add_jar(label, fresh[f])
+                else:
+                    self.vendor_classes.pop(f, None)
+        return changes
+
+    def _reload_vendor_index(self):
+        """Re-reads a current SBOM; otherwise indexes the known vendorlib files without walking the folder."""
+        sbom_path = os.path.join(self.vendorlib_path, vendorlib.SBOM_NAME)
+        if os.path.exists(sbom_path) and vendorlib.is_sbom_current(self.vendorlib_path, sbom_path):
+            self.vendor_index = vendorlib.VendorIndex.load(self.vendorlib_path)
+        else:
+            artifacts = [vendorlib.artifact_from_file(f) for f in sorted(self.vendor_jars)]
+            self.vendor_index = vendorlib.VendorIndex(artifacts, "scan")
+
+    def context(self):
+        """A ProjectContext seeded with the kept state, so the engine reads nothing from disk."""
+        return ProjectContext(self.root).seed(
+            inventory=inventory.UserlibInventory(self.userlib_path, list(self.records.values())),
+            signatures=list(self.signatures.values()),
+            vendor_index=self.vendor_index,
+            class_index=self.class_index,
+        )
+
+    def analyze(self, engine, delta=None):
+        """Runs the engine's analysis quietly over the kept state. With the Delta of the last apply(),
+        the previous analysis is brought up to date instead of repeated."""
+        ctx = self.context()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result, self.artifacts = engine.evaluate(ctx, self.artifacts if delta else None, delta)
+            return result
+        finally:
+            ctx.close()
+
+    def affected_groups(self):
+        """Names of the version groups the last apply() touched."""
+        if not self.delta:
+            return []
+        current = (self.signatures.get(name) for name in self.delta.jars())
+        return sorted(self.delta.groups({sig.file: sig.metadata for sig in current if sig is not None}))
+
+
+def affected_groups(changes):
+    """Normalized library names of the changed JARs, from their file names."""
+    return sorted({utils.normalize_lib_name(utils.get_jar_details(name.rsplit("/", 1)[-1])[0])
+                   for _, _, name in changes if name.endswith(".jar")})
+
+
+def print_batch(label, previous, result, elapsed, jars_read):
+    """Prints what one batch of changes did to the verdict."""
+    print(f"\n[{time.strftime('%H:%M:%S')}] {label}")
+    for name in sorted(result['to_remove'] - previous['to_remove']):
+        utils.log_warning(f"Now redundant: {name}")
+    for name in sorted(previous['to_remove'] - result['to_remove']):
+        utils.log_success(f"No longer redundant: {name}")
+    known_pairs = {(o.jar_a, o.jar_b) for o in previous['overlaps']}
+    for o in result['overlaps']:
+        if (o.jar_a, o.jar_b) not in known_pairs:
+            utils.log_warning(f"New class overlap: {o}")
+    print(f"    {len(result['to_remove'])} redundant file(s), {len(result['overlaps'])} class overlap(s)"
+          f" | analysed in {elapsed * 1000:.0f} ms, {jars_read} JAR(s) read")
+
+
+def run_watch(ctx, engine, polling=False):
+    """Re-evaluates the project whenever userlib, vendorlib or its ProtectedLibs.txt changes, until Ctrl+C.
+    Returns the exit code."""
+    utils.log_header("Mendix Userlib Cleanup (Watch Mode)")
+    if not os.path.isdir(ctx.userlib_path):
+        utils.log_error("userlib folder not found.")
+        return 1
+
+    started = time.perf_counter()
+    state = IncrementalProject(ctx)
+    result = state.analyze(engine)
+    if result['error']:
+        utils.log_error(result['error'])
+        return 1
+    utils.log_info(f"Initial analysis: {len(result['to_remove'])} redundant file(s) in {len(state.records)} files"
+                   f" ({(time.perf_counter() - started) * 1000:.0f} ms)")
+    redundant = sorted(result['to_remove'])
+    for name in redundant[:INITIAL_LIST_LIMIT]:
+        print(f"    - {name}")
+    if len(redundant) > INITIAL_LIST_LIMIT:
+        print(f"    ... and {len(redundant) - INITIAL_LIST_LIMIT} more")
+
+    # The project folder itself only for its ProtectedLibs.txt; apply() ignores every other path there
+    watcher = create_watcher([(ctx.userlib_path, False), (ctx.vendorlib_path, True), (ctx.root, False)], polling)
+    rules = utils.protection_stamp(ctx.root)
+    utils.log_info(f"Watching userlib, vendorlib and {protection.PROTECTION_FILE} ({type(watcher).__name__}). Press Ctrl+C to stop.")
+    try:
+        while True:
+            changed = collect_batch(watcher)
+            batch_start = time.perf_counter()
+            if RESYNC in changed:
+                state.resync()
+                label = "Event queue overflowed; re-read the project"
+                delta = None
+            else:
+                changes = state.apply(changed)
+                rules, rules_before = utils.protection_stamp(ctx.root), rules
+                if not changes and rules == rules_before:
+                    continue
+                label = "  ".join(f"{sign}{area}/{name}" for area, sign, name in changes) or "Protection rules changed"
+                groups = state.affected_groups()
+                if groups:
+                    label += f"\n    Affected groups: {', '.join(groups)}"
+                delta = state.delta
+            previous, result = result, state.analyze(engine, delta)
+            print_batch(label, previous, result, time.perf_counter() - batch_start, state.jars_read)
+    except KeyboardInterrupt:
+        print()
+        utils.log_info("Watch mode stopped.")
+        return 0
+    finally:
+        watcher.close()
@@ -0,0 +1,246 @@
+# Author: Erik van Gorsel
+# Minimal ZIP central directory reader.
+#
+# JAR analysis only needs the entry table of an archive, not its contents.
+# This module reads the End Of Central Directory record from the tail of
+# the file and parses the central directory in one read, without building
+# the full zipfile.ZipInfo objects or touching any compressed data.
+# read_mapped_entries() memory-maps the archive to pull out a few small
+# entries (manifest, pom.properties) as well, touching only their pages.
+
+import os
+import mmap
+import zlib
+import struct
+
+import profiling
+
+EOCD_SIGNATURE = b"PK\x05\x06"
+EOCD64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+EOCD64_SIGNATURE = b"PK\x06\x06"
+CENTRAL_SIGNATURE = b"PK\x01\x02"
+
+EOCD_STRUCT = struct.Struct("<4s4H2LH")
+EOCD64_LOCATOR_STRUCT = struct.Struct("<4sLQL")
+EOCD64_STRUCT = struct.Struct("<4sQ2H2L4Q")
+CENTRAL_STRUCT = struct.Struct("<4s4B4HL2L5H2L")
+LOCAL_HEADER_STRUCT = struct.Struct("<4s5H3L2H")
+LOCAL_SIGNATURE = b"PK\x03\x04"
+
+# EOCD record (22 bytes) plus the largest possible archive comment
+MAX_TAIL = EOCD_STRUCT.size + 0xFFFF
+ZIP64_EXTRA_ID = 0x0001
+# Metadata entries (manifest, pom.properties) are a few KB; anything far larger is not metadata
+MAX_MAPPED_ENTRY = 1024 * 1024
+UTF8_FLAG = 0x800
+
+
+class ZipDirError(Exception):
+    """Raised when a file is not a readable ZIP archive."""
+
+
+class CentralEntry:
+    """A single record from the central directory."""
+    __slots__ = ("name", "crc", "compressed_size", "file_size", "header_offset", "compress_type", "flags")
+
+    def __init__(self, name, crc, compressed_size, file_size, header_offset, compress_type, flags):
+        self.name = name
+        self.crc = crc
+        self.compressed_size = compressed_size
+        self.file_size = file_size
+        self.header_offset = header_offset
+        self.compress_type = compress_type
+        self.flags = flags
+
+    def __repr__(self):
+        return f"CentralEntry({self.name!r}, size={self.file_size})"
+
+
+def _locate_directory(fp, file_size):
+    """Returns (cd_offset, cd_size, entry_count, concat) for an open archive (a file or an mmap)."""
+    # Almost no JAR carries an archive comment, so the record usually ends the file exactly;
+    # only otherwise is the longest possible tail scanned
+    for tail_size in (min(file_size, EOCD_STRUCT.size), min(file_size, MAX_TAIL)):
+        fp.seek(file_size - tail_size)
+        tail = fp.read(tail_size)
+        profiling.count(profiling.BYTES_READ, len(tail))
+        pos = tail.rfind(EOCD_SIGNATURE)
+        if pos >= 0 and len(tail) - pos >= EOCD_STRUCT.size:
+            break
+    else:
+        raise ZipDirError("End of central directory record not found")
+
+    _, _, _, _, count, cd_size, cd_offset, _ = EOCD_STRUCT.unpack_from(tail, pos)
+    eocd_pos = file_size - tail_size + pos
+
+    # ZIP64 archives park the real values in a separate record
+    if count == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        loc_pos = eocd_pos - EOCD64_LOCATOR_STRUCT.size
+        locator = b""
+        if loc_pos >= 0:
+            fp.seek(loc_pos)
+            locator = fp.read(EOCD64_LOCATOR_STRUCT.size)
+        if len(locator) == EOCD64_LOCATOR_STRUCT.size and locator[:4] == EOCD64_LOCATOR_SIGNATURE:
+            _, _, eocd64_offset, _ = EOCD64_LOCATOR_STRUCT.unpack(locator)
+            fp.seek(eocd64_offset)
+            record = fp.read(EOCD64_STRUCT.size)
+            profiling.count(profiling.BYTES_READ, len(record))
+            if len(record) == EOCD64_STRUCT.size and record[:4] == EOCD64_SIGNATURE:
+                fields = EOCD64_STRUCT.unpack(record)
+                count, cd_size, cd_offset = fields[7], fields[8], fields[9]
+                eocd_pos = eocd64_offset
+
+    # Archives with prepended data (e.g. self-extracting stubs) shift every offset
+    concat = eocd_pos - cd_size - cd_offset
+    if concat < 0:
+        raise ZipDirError("Central directory offset is out of range")
+    return cd_offset + concat, cd_size, count, concat
+
+
+def _apply_zip64_extra(extra, file_size, compressed_size, header_offset):
+    """Replaces 0xFFFFFFFF placeholders with the values from the ZIP64 extra field."""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, size = struct.unpack_from("<HH", extra, pos)
+        pos += 4
+        if tag == ZIP64_EXTRA_ID:
+            values = extra[pos:pos + size]
+            idx = 0
+            if file_size == 0xFFFFFFFF and idx + 8 <= len(values):
+                file_size = struct.unpack_from("<Q", values, idx)[0]
+                idx += 8
+            if compressed_size == 0xFFFFFFFF and idx + 8 <= len(values):
+                compressed_size = struct.unpack_from("<Q", values, idx)[0]
+                idx += 8
+            if header_offset == 0xFFFFFFFF and idx + 8 <= len(values):
+                header_offset = struct.unpack_from("<Q", values, idx)[0]
+            break
+        pos += size
+    return file_size, compressed_size, header_offset
+
+
+def parse_central_directory(data, concat=0):
+    """Yields CentralEntry records from a raw central directory block."""
+    pos = 0
+    size = len(data)
+    while pos + CENTRAL_STRUCT.size <= size:
+        fields = CENTRAL_STRUCT.unpack_from(data, pos)
+        if fields[0] != CENTRAL_SIGNATURE:
+            raise ZipDirError("Bad central directory entry signature")
+        flags, compress = fields[5], fields[6]
+        crc, compressed_size, file_size = fields[9], fields[10], fields[11]
+        name_len, extra_len, comment_len = fields[12], fields[13], fields[14]
+        header_offset = fields[18]
+
+        pos += CENTRAL_STRUCT.size
+        raw_name = data[pos:pos + name_len]
+        pos += name_len
+        if 0xFFFFFFFF in (file_size, compressed_size, header_offset):
+            file_size, compressed_size, header_offset = _apply_zip64_extra(
+                data[pos:pos + extra_len], file_size, compressed_size, header_offset
+            )
+        pos += extra_len + comment_len
+
+        try:
+            # Nearly all entry names are ASCII, which every encoding (and the fast C decoder) agrees on
+            name = raw_name.decode("ascii")
+        except UnicodeDecodeError:
+            name = raw_name.decode("utf-8" if flags & UTF8_FLAG else "cp437", errors="replace")
+        yield CentralEntry(name, crc, compressed_size, file_size, header_offset + concat, compress, flags)
+
+
+def read_central_directory(path):
+    """Returns the list of CentralEntry records of the archive at `path`."""
+    with open(path, "rb") as fp:
+        file_size = os.fstat(fp.fileno()).st_size
+        cd_offset, cd_size, _, concat = _locate_directory(fp, file_size)
+        fp.seek(cd_offset)
+        data = fp.read(cd_size)
+    profiling.count(profiling.BYTES_READ, len(data))
+    if len(data) != cd_size:
+        raise ZipDirError("Truncated central directory")
+    return list(parse_central_directory(data, concat))
+
+
+def read_entry_names(path):
+    """Returns only the entry names of the archive at `path`."""
+    return [entry.name for entry in read_central_directory(path)]
+
+
+def read_mapped_entries(path, wanted, max_size=MAX_MAPPED_ENTRY):
+    """Memory-maps the archive. Returns (entry names, {name: content}) for the entries accepted by
+    wanted(name). Only the tail, the central directory and those entries are paged in; entries
+    larger than max_size or with an unsupported compression method are left out."""
+    with open(path, "rb") as fp:
+        file_size = os.fstat(fp.fileno()).st_size
+        if file_size < EOCD_STRUCT.size:
+            raise ZipDirError("File is too small to be a ZIP archive")
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            cd_offset, cd_size, _, concat = _locate_directory(mm, file_size)
+            if cd_offset + cd_size > file_size:
+                raise ZipDirError("Truncated central directory")
+            entries = list(parse_central_directory(mm[cd_offset:cd_offset + cd_size], concat))
+            profiling.count(profiling.BYTES_READ, cd_size)
+
+            contents = {}
+            for entry in entries:
+                if entry.file_size > max_size or entry.compress_type not in (0, 8) or not wanted(entry.name):
+                    continue
+                start = read_local_data_offset(mm, entry.header_offset)
+                data = mm[start:start + entry.compressed_size]
+                profiling.count(profiling.BYTES_READ, len(data))
+                try:
+                    contents[entry.name] = zlib.decompress(data, -15) if entry.compress_type == 8 else data
+                except zlib.error:
+                    continue
+    return [entry.name for entry in entries], contents
+
+
+COPY_CHUNK = 1024 * 1024
+
+
+def read_local_data_offset(fp, header_offset):
+    """Returns the offset of an entry's data, past its local file header."""
+    fp.seek(header_offset)
+    header = fp.read(LOCAL_HEADER_STRUCT.size)
+    if len(header) != LOCAL_HEADER_STRUCT.size or header[:4] != LOCAL_SIGNATURE:
+        raise ZipDirError("Bad local file header")
+    fields = LOCAL_HEADER_STRUCT.unpack(header)
+    name_len, extra_len = fields[9], fields[10]
+    return header_offset + LOCAL_HEADER_STRUCT.size + name_len + extra_len
+
+
+def extract_entry(archive_path, header_offset, compressed_size, compress_type, crc, target_path):
+    """Streams one entry straight from its offset into target_path, verifying its CRC."""
+    if compress_type == 0:
+        decompressor = None
+    elif compress_type == 8:
+        decompressor = zlib.decompressobj(-15)
+    else:
+        raise ZipDirError(f"Unsupported compression method {compress_type}")
+
+    tmp_path = target_path + ".restoring"
+    actual_crc = 0
+    with open(archive_path, "rb") as src, open(tmp_path, "wb") as dst:
+        src.seek(read_local_data_offset(src, header_offset))
+        remaining = compressed_size
+        while remaining > 0:
+            chunk = src.read(min(COPY_CHUNK, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            actual_crc = zlib.crc32(chunk, actual_crc)
+            dst.write(chunk)
+        if decompressor:
+            tail = decompressor.flush()
+            actual_crc = zlib.crc32(tail, actual_crc)
+            dst.write(tail)
+        profiling.count(profiling.BYTES_READ, compressed_size - remaining)
+        profiling.count(profiling.BYTES_WRITTEN, dst.tell())
+
+    if remaining > 0 or actual_crc != crc:
+        os.remove(tmp_path)
+        raise ZipDirError(f"CRC mismatch while extracting {os.path.basename(target_path)}")
+    os.replace(tmp_path, target_path)
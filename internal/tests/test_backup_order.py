@@ -0,0 +1,77 @@
+# Author: Erik van Gorsel
+# Backup order under same-minute cleanups
+#
+# Several cleanups within one minute share a timestamp; retention then
+# compacts the older ones. --revert must still restore the newest backup,
+# and a name freed by compaction must not be handed out again.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_backup_order.py
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import utils
+import backup
+import retention
+
+TIMESTAMP = "2026-10-17_13-23"
+
+
+class SameMinuteCleanupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.userlib = tempfile.mkdtemp(prefix="userlib-")
+        self.backup_folder = backup.get_backup_folder(self.userlib)
+
+    def tearDown(self):
+        shutil.rmtree(self.userlib, ignore_errors=True)
+
+    def cleanup(self, file_name, mode):
+        """One cleanup run, as utils.perform_cleanup does it: backup, then the retention policy."""
+        with open(os.path.join(self.userlib, file_name), "w", encoding="utf-8") as f:
+            f.write(file_name)
+        backup.create_backup({file_name}, self.userlib, TIMESTAMP, mode=mode)
+        retention.apply_policy(self.userlib, retention.RetentionPolicy(keep_last=2))
+
+    def test_revert_picks_newest(self):
+        for run, mode in enumerate(("zip", "move", "store", "zip", "store", "zip", "move")):
+            self.cleanup(f"lib-{run}.jar", mode)
+
+        names = backup.list_backups(self.backup_folder)
+        self.assertTrue(any(n.endswith(retention.COMPACTED_SUFFIX + ".zip") for n in names))
+        self.assertEqual(len(names), len(set(map(backup._backup_stem, names))))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            utils.revert_files(self.userlib)
+        self.assertTrue(os.path.exists(os.path.join(self.userlib, "lib-6.jar")))
+        self.assertFalse(os.path.exists(os.path.join(self.userlib, "lib-5.jar")))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            utils.revert_files(self.userlib)
+        self.assertTrue(os.path.exists(os.path.join(self.userlib, "lib-5.jar")))
+        self.assertFalse(os.path.exists(os.path.join(self.userlib, "lib-4.jar")))
+
+    def test_compacted_name_is_taken(self):
+        for run in range(4):
+            self.cleanup(f"lib-{run}.jar", "zip")
+        stems = [backup._backup_stem(n) for n in backup.list_backups(self.backup_folder)]
+        self.assertNotIn(f"{backup.BACKUP_PREFIX}{TIMESTAMP}", stems)
+        self.assertEqual(stems[-1], f"{backup.BACKUP_PREFIX}{TIMESTAMP}_4")
+        self.assertEqual(backup.new_backup_name(self.backup_folder, TIMESTAMP), f"{backup.BACKUP_PREFIX}{TIMESTAMP}_5")
+
+
+if __name__ == "__main__":
+    unittest.main()
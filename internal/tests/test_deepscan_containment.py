@@ -0,0 +1,64 @@
+# Author: Erik van Gorsel
+# Deep scan containment rule
+#
+# A fat or shaded JAR bundles unrelocated copies of its dependencies. The
+# library it contains is still referenced by other modules under its own
+# file name, so containment only makes a JAR redundant when the larger JAR
+# is a build of the same library.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_deepscan_containment.py
+
+import os
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import deepscan
+
+LANG3 = frozenset(f"org/apache/commons/lang3/C{i}.class" for i in range(20))
+GUAVA = frozenset(f"com/google/common/C{i}.class" for i in range(20))
+
+
+def signature(file, classes, coordinates=None):
+    return deepscan.JarSignature(file, classes, "1.0", 0.0, coordinates)
+
+
+class ContainmentTest(unittest.TestCase):
+
+    def test_fat_jar_keeps_bundled_library(self):
+        found = deepscan.find_redundant([
+            signature("commons-lang3-3.12.0.jar", LANG3, ("org.apache.commons", "commons-lang3")),
+            signature("reporting-all-2.0.jar", LANG3 | GUAVA, ("com.example", "reporting")),
+            signature("guava-31.1-jre.jar", GUAVA),
+        ])
+        self.assertEqual(found, {})
+
+    def test_larger_build_of_same_library(self):
+        found = deepscan.find_redundant([
+            signature("commons-lang3-3.11.jar", LANG3, ("org.apache.commons", "commons-lang3")),
+            signature("commons-lang3-3.12.0.jar", LANG3 | {"org/apache/commons/lang3/New.class"},
+                      ("org.apache.commons", "commons-lang3")),
+        ])
+        self.assertEqual(found, {"commons-lang3-3.11.jar": "classes contained in commons-lang3-3.12.0.jar"})
+
+    def test_same_name_without_metadata(self):
+        found = deepscan.find_redundant([
+            signature("guava-30.0-jre.jar", GUAVA),
+            signature("guava-31.1-jre.jar", GUAVA | {"com/google/common/New.class"}),
+        ])
+        self.assertEqual(list(found), ["guava-30.0-jre.jar"])
+
+    def test_identical_class_sets_still_duplicates(self):
+        found = deepscan.find_redundant([signature("lang3-copy.jar", LANG3), signature("commons-lang3-3.12.0.jar", LANG3)])
+        self.assertEqual(len(found), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# Author: Erik van Gorsel
+# Maven identity of shaded JARs
+#
+# A shaded JAR carries the pom.properties of every library bundled in it.
+# Only the artifactId that names the file may give the JAR its identity,
+# the longest one when several do, and the metadata reader and the
+# coordinate lookup must agree on it.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_jar_identity.py
+
+import os
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import jarmeta
+import deepscan
+
+
+def pom_entries(*coordinates):
+    """pom.properties entries as they appear in a JAR, one per (group, artifact)."""
+    return {f"{jarmeta.MAVEN_PREFIX}{g}/{a}{jarmeta.POM_PROPERTIES}":
+            f"groupId={g}\nartifactId={a}\nversion=5.2.3\n".encode() for g, a in coordinates}
+
+
+class ShadedIdentityTest(unittest.TestCase):
+
+    def identity(self, file_name, *coordinates):
+        contents = pom_entries(*coordinates)
+        meta = jarmeta.from_entries(contents, file_name)
+        coordinates = deepscan.get_maven_coordinates(contents, file_name)
+        self.assertEqual((meta.group, meta.artifact) if meta.artifact else None, coordinates)
+        return coordinates
+
+    def test_single_pom(self):
+        self.assertEqual(self.identity("renamed.jar", ("org.apache.poi", "poi")), ("org.apache.poi", "poi"))
+
+    def test_longest_artifact_wins(self):
+        poms = (("org.apache.poi", "poi"), ("org.apache.poi", "poi-ooxml"), ("org.apache.xmlbeans", "xmlbeans"))
+        self.assertEqual(self.identity("poi-ooxml-5.2.3.jar", *poms), ("org.apache.poi", "poi-ooxml"))
+        self.assertEqual(self.identity("poi-5.2.3.jar", *poms), ("org.apache.poi", "poi"))
+
+    def test_prefix_without_separator_does_not_match(self):
+        self.assertIsNone(self.identity("poi-ooxml-lite-5.2.3.jar", ("a", "poi-ooxml-l"), ("b", "xmlbeans")))
+
+    def test_unnamed_or_ambiguous(self):
+        self.assertIsNone(self.identity("bundle-all.jar", ("a", "poi"), ("b", "xmlbeans")))
+        self.assertIsNone(self.identity("poi-5.2.3.jar", ("a", "poi"), ("b", "poi")))
+        self.assertIsNone(self.identity(None, ("a", "poi"), ("b", "xmlbeans")))
+
+
+if __name__ == "__main__":
+    unittest.main()
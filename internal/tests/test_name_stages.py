@@ -0,0 +1,87 @@
+# Author: Erik van Gorsel
+# Name-based first passes of the finding stages
+#
+# The vendorlib matches and version groups are first found by file name
+# while the deep scan reads, and decided again from the declared identity
+# once it is in. The outcome must be what a single pass over the signatures
+# gives: VendorIndex.match with the signatures, and version grouping over
+# every JAR vendorlib does not manage.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_name_stages.py
+
+import os
+import sys
+import random
+import unittest
+from types import SimpleNamespace
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import jarmeta
+import deepscan
+import pipeline
+import inventory
+import vendorlib
+
+FAMILIES = ("guava", "poi", "poi-ooxml", "commons-io", "jackson-core", "xmlbeans")
+GROUPS = ("org.example", "org.other")
+
+
+def random_project(rng, size=40):
+    """(inventory, signatures, vendor index) of a random userlib: versions of a few libraries, some
+    renamed, some declaring coordinates or a version, and a vendorlib SBOM providing some of them."""
+    records, signatures = [], []
+    for i in range(size):
+        family = rng.choice(FAMILIES)
+        name = f"{family}-{rng.randint(1, 4)}.{rng.randint(0, 9)}.{i}.jar"
+        if rng.random() < 0.1:
+            name = f"renamed-{i}.jar"
+        records.append(inventory.LibFile(name, 1, 0.0))
+        meta = jarmeta.JarMetadata()
+        coordinates = None
+        if rng.random() < 0.5:
+            coordinates = (rng.choice(GROUPS), rng.choice(FAMILIES))
+            meta = jarmeta.JarMetadata(*coordinates, version=f"{rng.randint(1, 4)}.{rng.randint(0, 9)}")
+        elif rng.random() < 0.3:
+            meta = jarmeta.JarMetadata(version=f"{rng.randint(1, 4)}.0")
+        signatures.append(deepscan.JarSignature(name, frozenset({f"c/{i}.class"}), None, 0.0, coordinates, meta))
+    artifacts = [vendorlib.VendorArtifact(rng.choice(GROUPS), family, "9.9", f"{family}.jar")
+                 for family in FAMILIES if rng.random() < 0.5]
+    source = "sbom" if rng.random() < 0.7 else "folder"
+    if source == "folder":
+        artifacts = [vendorlib.VendorArtifact(None, a.artifact, a.version, a.file) for a in artifacts]
+    return inventory.UserlibInventory("userlib", records), signatures, vendorlib.VendorIndex(artifacts, source)
+
+
+class NameStagesTest(unittest.TestCase):
+
+    def test_same_as_single_pass(self):
+        rng = random.Random(7)
+        ctx = SimpleNamespace(userlib_path="userlib")
+        for _ in range(200):
+            inv, signatures, index = random_project(rng)
+            metadata = {sig.file: sig.metadata for sig in signatures}
+            known = {'inventory': inv, 'signatures': signatures, 'metadata': metadata, 'vendor_index': index}
+            for engine in ("clean_userlib_mx10", "clean_userlib_mx9"):
+                stages = pipeline.ENGINES[engine].stages
+                artifacts = pipeline.run_stages(stages, ctx, ("version_groups",), known=dict(known), max_workers=2)
+
+                managed = {}
+                if "vendor_matches" in stages:
+                    managed = {rec.name: a for rec, a in index.match(inv.jar_records(), "userlib", signatures)}
+                    self.assertEqual(artifacts['vendor_matches'], managed)
+                remaining = [rec for rec in inv.jar_records() if rec.name not in managed]
+                expected = {}
+                for group in jarmeta.group_by_identity(remaining, metadata).values():
+                    expected.update((old.name, kept.name) for old, kept in jarmeta.superseded(group, metadata).items())
+                self.assertEqual(artifacts['version_groups'], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# Author: Erik van Gorsel
+# Plan verification against crafted remove entries
+#
+# --apply removes the files a plan lists. An edited plan must not be able
+# to name anything outside userlib, even when its fingerprints match, and
+# a library protected after the plan was made must not be removed by it.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_plan_verify.py
+
+import io
+import os
+import copy
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core"),
+             os.path.join(TESTS_DIR, "..", "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import plan
+import utils
+import protection
+import synthproject
+from project import ProjectContext
+
+
+class CraftedPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="plan-")
+        synthproject.generate_project(self.root, 20)
+        self.ctx = ProjectContext(self.root)
+        self.mpr_path = self.ctx.mpr_path
+        result = utils.new_cleanup_result("test")
+        self.removed = sorted(self.ctx.inventory().records)[0]
+        result['to_remove'] = {self.removed}
+        self.document = plan.build_plan(self.ctx, result)
+        self.plan_path = os.path.join(self.root, "plan.json")
+
+    def tearDown(self):
+        self.ctx.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def craft(self, name):
+        """A copy of the plan that also lists `name` for removal; its fingerprints still match the project."""
+        document = copy.deepcopy(self.document)
+        document['remove'].append({'file': name, 'size': 0, 'mtime': 0, 'reason': "redundant"})
+        return document
+
+    def test_untouched_plan_verifies(self):
+        self.assertEqual(plan.verify(self.ctx, self.document), [])
+
+    def test_rejects_paths_outside_userlib(self):
+        for name in ("../" + os.path.basename(self.mpr_path), "..\\settings.json", "sub/lib.jar", ".."):
+            with self.subTest(name=name):
+                problems = plan.verify(self.ctx, self.craft(name))
+                self.assertTrue(any(repr(name) in p and "not a file in userlib" in p for p in problems))
+
+    def test_rejects_names_without_fingerprint(self):
+        problems = plan.verify(self.ctx, self.craft("unlisted.jar"))
+        self.assertEqual(problems, ["'unlisted.jar' is not a file in userlib and cannot be removed"])
+
+    def test_apply_leaves_project_intact(self):
+        plan.write_plan(self.plan_path, self.craft("../" + os.path.basename(self.mpr_path)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(plan.apply_plan(self.ctx, self.plan_path), 1)
+        self.assertTrue(os.path.exists(self.mpr_path))
+
+    def test_protected_after_plan(self):
+        plan.write_plan(self.plan_path, self.document)
+        with open(os.path.join(self.root, protection.PROTECTION_FILE), "a", encoding="utf-8") as f:
+            f.write(f"\nexact:{self.removed}\n")
+        problems = plan.verify(self.ctx, self.document)
+        self.assertEqual(problems, [f"the rules in project/{protection.PROTECTION_FILE} changed"])
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(plan.apply_plan(self.ctx, self.plan_path), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.ctx.userlib_path, self.removed)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# Author: Erik van Gorsel
+# Protection rules edited while the daemon runs
+#
+# The daemon keeps projects warm between requests. A library added to the
+# project's ProtectedLibs.txt must be protected from the next request on,
+# although no file in userlib or vendorlib changed.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_protection_reload.py
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core"),
+             os.path.join(TESTS_DIR, "..", "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import api
+import utils
+import protection
+import synthproject
+
+
+class ProtectionReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="protection-")
+        synthproject.generate_project(self.root, 50)
+        self.rules_path = os.path.join(self.root, protection.PROTECTION_FILE)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def protect(self, name):
+        with open(self.rules_path, "a", encoding="utf-8") as f:
+            f.write(f"\nexact: {name}\n")
+
+    def test_matcher_follows_edits(self):
+        name = "some-library-1.0.jar"
+        self.assertIsNone(utils.get_protection_matcher(self.root).match(name))
+        self.protect(name)
+        self.assertIsNotNone(utils.get_protection_matcher(self.root).match(name))
+
+    def test_daemon_session_picks_up_rules(self):
+        session = api.Session(polling=True)
+        try:
+            first = session.analyze(self.root)
+            self.assertIsNone(first['error'])
+            name = first['to_remove'][0]
+            self.protect(name)
+            second = session.analyze(self.root)
+            self.assertNotIn(name, second['to_remove'])
+            self.assertIn(name, second['protected'])
+        finally:
+            session.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
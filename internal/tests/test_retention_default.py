@@ -0,0 +1,67 @@
+# Author: Erik van Gorsel
+# Retention after a cleanup
+#
+# Older backups are only compacted when the user asked for a retention
+# policy (--keep-last, --max-age, --max-backup-size); a plain cleanup
+# leaves every earlier backup as it was.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_retention_default.py
+
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core"),
+             os.path.join(TESTS_DIR, "..", "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import utils
+import backup
+import retention
+import synthproject
+from project import ProjectContext
+
+
+class CleanupRetentionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="retention-")
+        synthproject.generate_project(self.root, 20)
+        self.ctx = ProjectContext(self.root)
+        self.backup_folder = backup.get_backup_folder(self.ctx.userlib_path)
+
+    def tearDown(self):
+        self.ctx.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def cleanup_runs(self, runs):
+        """Removes one JAR per run through utils.perform_cleanup. Returns the backup names afterwards."""
+        for _ in range(runs):
+            name = sorted(self.ctx.inventory().jar_records(), key=lambda r: r.name)[0].name
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertTrue(utils.perform_cleanup({name}, self.ctx.userlib_path, 'zip', ctx=self.ctx))
+        return backup.list_backups(self.backup_folder)
+
+    def test_plain_cleanup_keeps_backups(self):
+        names = self.cleanup_runs(7)
+        self.assertEqual(len(names), 7)
+        self.assertFalse(any(retention.COMPACTED_SUFFIX in n for n in names))
+
+    def test_requested_policy_compacts(self):
+        self.ctx.retention = retention.RetentionPolicy(keep_last=2)
+        names = self.cleanup_runs(4)
+        self.assertEqual(len(names), 3)
+        self.assertTrue(names[0].endswith(retention.COMPACTED_SUFFIX + ".zip"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# Author: Erik van Gorsel
+# Engine routing of typed versions
+#
+# When the version cannot be detected, the user types it at a prompt. A
+# bare major version such as "10" must still select that series' engine.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_routing.py
+
+import os
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import routing
+import manager
+
+
+class VersionRoutingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = manager.load_routing_table()
+
+    def route(self, typed):
+        return self.table.lookup(manager.normalize_version(typed))
+
+    def test_version_key(self):
+        self.assertEqual(routing.version_key("10"), (10, 0, 0))
+        self.assertEqual(routing.version_key(" 9 "), (9, 0, 0))
+        self.assertEqual(routing.version_key("10.24"), (10, 24, 0))
+        self.assertEqual(routing.version_key("10.24.3"), (10, 24, 3))
+        self.assertIsNone(routing.version_key("latest"))
+
+    def test_bare_major_routes_to_its_series(self):
+        for typed, engine in (("11", "clean_userlib_mx11"), ("10", "clean_userlib_mx10"),
+                              ("9", "clean_userlib_mx9"), ("8", "clean_userlib_mx8"), ("7", "clean_userlib_mx7")):
+            with self.subTest(typed=typed):
+                self.assertEqual(self.route(typed), engine)
+
+    def test_full_versions_unchanged(self):
+        self.assertEqual(self.route("10.24.13 LTS"), "clean_userlib_mx10")
+        self.assertEqual(self.route("9.24.40"), "clean_userlib_mx9")
+
+
+if __name__ == "__main__":
+    unittest.main()
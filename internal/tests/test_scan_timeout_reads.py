@@ -0,0 +1,101 @@
+# Author: Erik van Gorsel
+# Deep scan reads left running by a timeout
+#
+# When the deep scan times out, the reads in progress keep a JAR open.
+# A cleanup moves those same JARs, which Windows refuses while another
+# thread has them open, so the cleanup must wait for them first.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_scan_timeout_reads.py
+
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import contextlib
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "engines"), os.path.join(SRC_DIR, "core"),
+             os.path.join(TESTS_DIR, "..", "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import utils
+import backup
+import deepscan
+import synthproject
+from project import ProjectContext
+
+READ_SECONDS = 0.2
+
+
+class SlowReads:
+    """Stands in for deepscan.read_signature: each read keeps its JAR 'open' for READ_SECONDS."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open = set()
+        self.read = deepscan.read_signature
+
+    def __call__(self, userlib_path, record):
+        with self.lock:
+            self.open.add(record.name)
+        try:
+            time.sleep(READ_SECONDS)
+            return self.read(userlib_path, record)
+        finally:
+            with self.lock:
+                self.open.discard(record.name)
+
+
+class TimedOutReadsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="timeout-")
+        synthproject.generate_project(self.root, 20)
+        self.ctx = ProjectContext(self.root)
+        self.ctx.use_cache = False
+        self.ctx.deep_scan_timeout = 0.01
+        self.reads = SlowReads()
+
+    def tearDown(self):
+        self.ctx.wait_for_reads()
+        self.ctx.close()
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_wait_for_reads(self):
+        with mock.patch.object(deepscan, "read_signature", self.reads):
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.ctx.signatures()
+            self.assertTrue(self.ctx.unscanned)
+            self.assertTrue(self.reads.open)
+            self.ctx.wait_for_reads()
+            self.assertEqual(self.reads.open, set())
+
+    def test_cleanup_moves_no_open_jar(self):
+        moved_while_open = []
+        create_backup = backup.create_backup
+
+        def checked_backup(to_move, *args, **kwargs):
+            moved_while_open.extend(sorted(set(to_move) & self.reads.open))
+            return create_backup(to_move, *args, **kwargs)
+
+        with mock.patch.object(deepscan, "read_signature", self.reads):
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.ctx.signatures()
+            to_move = set(self.reads.open)
+            self.assertTrue(to_move)
+            with mock.patch.object(backup, "create_backup", checked_backup), contextlib.redirect_stdout(io.StringIO()):
+                self.assertTrue(utils.perform_cleanup(to_move, self.ctx.userlib_path, 'zip', ctx=self.ctx))
+        self.assertEqual(moved_while_open, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
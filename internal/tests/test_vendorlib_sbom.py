@@ -0,0 +1,75 @@
+# Author: Erik van Gorsel
+# SBOM staleness below the vendorlib root
+#
+# Adding a JAR to a subfolder or overwriting one in place does not change
+# the modification time of the vendorlib folder itself. The SBOM must
+# still count as stale, or the index misses the new artifact.
+#
+# Usage:
+#   python -m pytest internal/tests
+#   python internal/tests/test_vendorlib_sbom.py
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(TESTS_DIR, "..", "src")
+for path in (os.path.join(SRC_DIR, "core"), os.path.join(TESTS_DIR, "..", "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import vendorlib
+import synthproject
+
+
+class SbomStalenessTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="vendorlib-")
+        synthproject.generate_project(self.root, 50)
+        self.vendorlib = os.path.join(self.root, "vendorlib")
+        self.sbom = os.path.join(self.vendorlib, vendorlib.SBOM_NAME)
+        self.folder = os.path.join(self.vendorlib, "managed")
+        self.jar = next(os.path.join(self.folder, f) for f in sorted(os.listdir(self.folder)) if f.endswith(".jar"))
+        # Everything was written well before now, the SBOM last
+        self.past = time.time() - 100
+        for root, dirs, files in os.walk(self.vendorlib):
+            for f in files:
+                os.utime(os.path.join(root, f), (self.past, self.past))
+            os.utime(root, (self.past, self.past))
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def reset_folders(self):
+        """Puts the folder times back, as if only the files below had changed."""
+        for path in (self.folder, self.vendorlib):
+            os.utime(path, (self.past, self.past))
+
+    def test_untouched_sbom_is_current(self):
+        self.assertTrue(vendorlib.is_sbom_current(self.vendorlib, self.sbom))
+        self.assertEqual(vendorlib.VendorIndex.load(self.vendorlib).source, "sbom")
+
+    def test_jar_added_to_subfolder(self):
+        shutil.copy(self.jar, os.path.join(self.folder, "extra-lib-1.0.jar"))
+        os.utime(self.vendorlib, (self.past, self.past))
+        self.assertFalse(vendorlib.is_sbom_current(self.vendorlib, self.sbom))
+
+    def test_jar_overwritten_in_place(self):
+        with open(self.jar, "ab") as f:
+            f.write(b"\0")
+        self.reset_folders()
+        self.assertFalse(vendorlib.is_sbom_current(self.vendorlib, self.sbom))
+
+    def test_jar_removed_from_subfolder(self):
+        os.remove(self.jar)
+        os.utime(self.vendorlib, (self.past, self.past))
+        self.assertFalse(vendorlib.is_sbom_current(self.vendorlib, self.sbom))
+
+
+if __name__ == "__main__":
+    unittest.main()